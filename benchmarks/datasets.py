@@ -0,0 +1,142 @@
+"""
+Synthetic Planet API responses scaled up from `examples/opportunities-example.json`.
+
+Every generated record is derived from one of the example opportunities, so the
+datasets keep their shape and value distribution at any size. Generation is
+seeded and therefore reproducible between runs.
+"""
+
+import json
+import math
+import random
+from datetime import datetime, timedelta
+from functools import cache
+from pathlib import Path
+from typing import Any, Literal
+
+EXAMPLE = Path(__file__).parent.parent / "examples" / "opportunities-example.json"
+
+type GeometryKind = Literal["point", "polygon"]
+
+GEOMETRIES: tuple[GeometryKind, ...] = ("point", "polygon")
+
+# the number of vertices of a "large" polygon AOI
+POLYGON_VERTICES = 1000
+
+PRODUCT_ID = "INT-003001:Assured Tasking"
+
+
+@cache
+def example_features() -> list[dict[str, Any]]:
+    return json.loads(EXAMPLE.read_text())["features"]
+
+
+def geometry(kind: GeometryKind) -> dict[str, Any]:
+    """The AOI of the example, either as is or as a large polygon around it."""
+    lon, lat = example_features()[0]["geometry"]["coordinates"]
+    if kind == "point":
+        return {"type": "Point", "coordinates": [lon, lat]}
+    ring = [
+        [
+            round(lon + 0.5 * math.cos(2 * math.pi * i / POLYGON_VERTICES), 6),
+            round(lat + 0.3 * math.sin(2 * math.pi * i / POLYGON_VERTICES), 6),
+        ]
+        for i in range(POLYGON_VERTICES)
+    ]
+    return {"type": "Polygon", "coordinates": [[*ring, ring[0]]]}
+
+
+def _window(rng: random.Random, index: int) -> tuple[datetime, datetime, dict]:
+    features = example_features()
+    properties = features[index % len(features)]["properties"]
+    start, end = (
+        datetime.fromisoformat(value) for value in properties["datetime"].split("/")
+    )
+    # spread the copies of each example window over the following days
+    shift = timedelta(days=index // len(features), seconds=rng.randrange(3600))
+    return start + shift, end + shift, properties
+
+
+def imaging_windows(size: int, seed: int = 0) -> list[dict[str, Any]]:
+    """Imaging windows as returned by an imaging window search of the Planet API."""
+    rng = random.Random(seed)
+    windows = []
+    for index in range(size):
+        start, end, properties = _window(rng, index)
+        windows.append(
+            {
+                "id": f"iw-{index:08d}",
+                "start_time": start.isoformat(),
+                "end_time": end.isoformat(),
+                "off_nadir_angle_min": properties["off_nadir_angle"]["minimum"],
+                "off_nadir_angle_max": properties["off_nadir_angle"]["maximum"],
+                "satellite_type": properties["satellite_type"],
+                "cloud_forecast": [{"prediction": round(rng.random(), 3)}],
+            }
+        )
+    return windows
+
+
+def planet_orders(
+    size: int, kind: GeometryKind = "point", seed: int = 0
+) -> list[dict[str, Any]]:
+    """Orders as returned by the orders endpoint of the Planet API."""
+    rng = random.Random(seed)
+    aoi = geometry(kind)
+    statuses = ["RECEIVED", "PENDING", "IN_PROGRESS", "FULFILLED", "CANCELLED"]
+    orders = []
+    for index in range(size):
+        start, end, _ = _window(rng, index)
+        orders.append(
+            {
+                "id": f"order-{index:08d}",
+                "pl_number": PRODUCT_ID.split(":")[0],
+                "product": PRODUCT_ID,
+                "name": f"benchmark order {index}",
+                "geometry": aoi,
+                "original_geometry": aoi,
+                "start_time": start.isoformat(),
+                "end_time": end.isoformat(),
+                "imaging_window": f"iw-{index:08d}",
+                "created_time": (start - timedelta(days=1)).isoformat(),
+                "status": statuses[index % len(statuses)],
+            }
+        )
+    return orders
+
+
+def opportunity_payloads(
+    size: int, kind: GeometryKind = "point", seed: int = 0
+) -> list[dict[str, Any]]:
+    """Bodies of opportunity search requests."""
+    rng = random.Random(seed)
+    aoi = geometry(kind)
+    payloads = []
+    for index in range(size):
+        start, _, _ = _window(rng, index)
+        payloads.append(
+            {
+                "datetime": f"{start.isoformat()}/{(start + timedelta(days=7)).isoformat()}",
+                "geometry": aoi,
+                "limit": 10,
+            }
+        )
+    return payloads
+
+
+def order_payloads(
+    size: int, kind: GeometryKind = "point", seed: int = 0
+) -> list[dict[str, Any]]:
+    """Bodies of create order requests for the Planet product."""
+    aoi = geometry(kind)
+    return [
+        {
+            "datetime": f"{window['start_time']}/{window['end_time']}",
+            "geometry": aoi,
+            "order_parameters": {
+                "imaging_window_id": window["id"],
+                "name": f"benchmark order {window['id']}",
+            },
+        }
+        for window in imaging_windows(size, seed)
+    ]
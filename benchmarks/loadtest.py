@@ -0,0 +1,479 @@
+"""
+End-to-end load test of an application under a mix of requests.
+
+Sends catalog reads, order polling, opportunity searches, and order creation at a
+target rate, either to an application in this process through its ASGI interface
+or to a server over HTTP, and reports throughput, latency percentiles, error
+rates, and event loop lag:
+
+    python -m benchmarks.loadtest planet --rate 50 --duration 30
+    python -m benchmarks.loadtest mock --mix catalog=1,search=1 --output run.json
+
+The `planet` target talks to a fake Planet API started by the load test, which
+answers with imaging windows and orders generated by `benchmarks.datasets`.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from collections.abc import AsyncIterator, Awaitable, Callable, Sequence
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+from urllib.parse import quote
+
+import httpx
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from benchmarks import datasets
+
+DEFAULT_MIX = "catalog=4,poll=4,search=1,order=1"
+
+# the lag monitor's sleep interval, shorter sleeps resolve lag more finely
+LAG_INTERVAL = 0.01
+
+
+class FakePlanetHandler(BaseHTTPRequestHandler):
+    """Answers the requests `planet.client.Client` makes to the Planet API."""
+
+    server: "FakePlanet"
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        if re.fullmatch(r"/tasking/v2/imaging-windows/search/[^/]+", self.path):
+            self._send(200, self.server.search_result)
+        elif match := re.fullmatch(r"/tasking/v2/orders/([^/]+)", self.path):
+            self._send(200, self.server.order(match.group(1)))
+        elif self.path == "/tasking/v2/products":
+            pl_number, product = datasets.PRODUCT_ID.split(":")
+            self._send(200, [{"pl_number": pl_number, "product": product}])
+        else:
+            self._send(404, {"detail": "Not found"})
+
+    def do_POST(self) -> None:
+        self.rfile.read(int(self.headers.get("content-length", 0)))
+        if self.path == "/tasking/v2/imaging-windows/search":
+            location = f"/tasking/v2/imaging-windows/search/{uuid.uuid4()}"
+            self._send(202, {}, {"Location": location})
+        elif self.path == "/tasking/v2/orders/":
+            self._send(201, self.server.order(str(uuid.uuid4())))
+        else:
+            self._send(404, {"detail": "Not found"})
+
+    def _send(
+        self, status: int, body: Any, headers: dict[str, str] | None = None
+    ) -> None:
+        time.sleep(self.server.latency)
+        content = body if isinstance(body, bytes) else json.dumps(body).encode()
+        self.send_response(status)
+        for name, value in {
+            "Content-Type": "application/json",
+            **(headers or {}),
+        }.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+class FakePlanet(ThreadingHTTPServer):
+    """
+    A fake Planet API served from a background thread.
+
+    Args:
+        port (int): The port to listen on, 0 for any free port.
+        latency (float): Seconds to wait before answering each request.
+        imaging_windows (int): The number of imaging windows found per search.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self, port: int = 0, latency: float = 0.0, imaging_windows: int = 10
+    ) -> None:
+        super().__init__(("127.0.0.1", port), FakePlanetHandler)
+        self.latency = latency
+        self.search_result = json.dumps(
+            {
+                "status": "DONE",
+                "imaging_windows": datasets.imaging_windows(imaging_windows),
+            }
+        ).encode()
+        self._order = datasets.planet_orders(1)[0]
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def order(self, order_id: str) -> dict[str, Any]:
+        return {**self._order, "id": order_id}
+
+    def start(self) -> None:
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+
+@dataclass
+class Target:
+    """An application under test and the requests it understands."""
+
+    app: ASGIApp | None
+    product_id: str
+    order_parameters: dict[str, Any]
+    order_ids: list[str] = field(default_factory=list)
+
+    @property
+    def product_path(self) -> str:
+        return f"/products/{quote(self.product_id, safe=':')}"
+
+
+def planet_target(upstream: str | None, load: bool = True) -> Target:
+    """Point the Planet application at the fake Planet API at `upstream`."""
+    app: ASGIApp | None = None
+    if load:
+        if upstream is not None:
+            os.environ["API_DOMAIN"] = upstream
+            os.environ["API_BASE_URL"] = f"{upstream}/tasking/v2"
+        os.environ.setdefault(
+            "ORDERS_DB_PATH", str(Path(tempfile.mkdtemp(), "orders.sqlite3"))
+        )
+        from planet.application import app as planet_app
+
+        app = planet_app
+    order = datasets.order_payloads(1)[0]
+    return Target(app, datasets.PRODUCT_ID, order["order_parameters"])
+
+
+def mock_target(load: bool = True) -> Target:
+    """The development application of `tests/application.py`."""
+    app: ASGIApp | None = None
+    if load:
+        from tests.application import app as mock_app
+
+        app = mock_app
+    return Target(app, "test-satellite-provider", {})
+
+
+@asynccontextmanager
+async def lifespan(app: ASGIApp) -> AsyncIterator[ASGIApp]:
+    """
+    Run the lifespan of `app` and return an application that passes its state to
+    requests, which `httpx.ASGITransport` does not do by itself.
+    """
+    router = getattr(app, "router", None)
+    if router is None:
+        yield app
+        return
+    async with router.lifespan_context(app) as state:
+        state = dict(state or {})
+
+        async def with_state(scope: Scope, receive: Receive, send: Send) -> None:
+            await app({**scope, "state": dict(state)}, receive, send)
+
+        yield with_state
+
+
+async def catalog(client: httpx.AsyncClient, target: Target, rng: random.Random):
+    path = rng.choice(["/", "/conformance", "/products", target.product_path])
+    return await client.get(path)
+
+
+async def poll(client: httpx.AsyncClient, target: Target, rng: random.Random):
+    if not target.order_ids or rng.random() < 0.2:
+        return await client.get("/orders")
+    return await client.get(f"/orders/{rng.choice(target.order_ids)}")
+
+
+async def search(client: httpx.AsyncClient, target: Target, rng: random.Random):
+    payload = datasets.opportunity_payloads(1, seed=rng.randrange(1000))[0]
+    return await client.post(f"{target.product_path}/opportunities", json=payload)
+
+
+async def order(client: httpx.AsyncClient, target: Target, rng: random.Random):
+    payload = {
+        **datasets.opportunity_payloads(1, seed=rng.randrange(1000))[0],
+        "order_parameters": target.order_parameters,
+    }
+    payload.pop("limit")
+    response = await client.post(f"{target.product_path}/orders", json=payload)
+    if response.status_code == 201:
+        target.order_ids.append(response.json()["id"])
+    return response
+
+
+type Operation = Callable[
+    [httpx.AsyncClient, Target, random.Random], Awaitable[httpx.Response]
+]
+
+WORKLOADS: dict[str, Operation] = {
+    "catalog": catalog,
+    "poll": poll,
+    "search": search,
+    "order": order,
+}
+
+
+def parse_mix(value: str) -> dict[str, float]:
+    """Parse relative operation weights such as `catalog=4,search=1`."""
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in WORKLOADS:
+            raise argparse.ArgumentTypeError(f"unknown operation {name!r}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+@dataclass
+class Sample:
+    operation: str
+    latency: float
+    status: int | None
+
+
+def percentiles(values: Sequence[float]) -> dict[str, float]:
+    """Nearest rank percentiles of `values`, in milliseconds."""
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def rank(p: float) -> float:
+        return ordered[max(0, int(round(p / 100 * len(ordered))) - 1)] * 1000
+
+    return {
+        "p50": rank(50),
+        "p95": rank(95),
+        "p99": rank(99),
+        "max": ordered[-1] * 1000,
+        "mean": sum(ordered) / len(ordered) * 1000,
+    }
+
+
+def _summary(samples: list[Sample], elapsed: float) -> dict[str, Any]:
+    errors = sum(1 for s in samples if s.status is None or s.status >= 500)
+    return {
+        "requests": len(samples),
+        "throughput": len(samples) / elapsed if elapsed else 0.0,
+        "errors": errors,
+        "error_rate": errors / len(samples) if samples else 0.0,
+        "latency_ms": percentiles([s.latency for s in samples]),
+    }
+
+
+def report(
+    samples: list[Sample], lags: list[float], elapsed: float, config: dict[str, Any]
+) -> dict[str, Any]:
+    """Summarize a run, overall and per operation, as JSON serializable dict."""
+    by_operation: dict[str, list[Sample]] = defaultdict(list)
+    statuses: dict[str, int] = defaultdict(int)
+    for sample in samples:
+        by_operation[sample.operation].append(sample)
+        statuses[str(sample.status or "error")] += 1
+    return {
+        "config": config,
+        "elapsed": elapsed,
+        **_summary(samples, elapsed),
+        "status_codes": dict(statuses),
+        "loop_lag_ms": percentiles(lags),
+        "operations": {
+            name: _summary(op_samples, elapsed)
+            for name, op_samples in sorted(by_operation.items())
+        },
+    }
+
+
+async def monitor_lag(lags: list[float], stop: asyncio.Event) -> None:
+    """Record how late the event loop wakes up a task sleeping `LAG_INTERVAL`."""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(LAG_INTERVAL)
+        lags.append(max(0.0, loop.time() - start - LAG_INTERVAL))
+
+
+async def run(
+    client: httpx.AsyncClient,
+    target: Target,
+    mix: dict[str, float],
+    rate: float,
+    duration: float,
+    concurrency: int = 256,
+    seed: int = 0,
+) -> tuple[list[Sample], list[float], float]:
+    """
+    Start requests at `rate` per second for `duration` seconds, picking
+    operations by their weight in `mix`, and wait for all of them to finish.
+
+    Requests are started on schedule whether earlier ones finished or not, and
+    their latency is counted from the scheduled start. A slow server therefore
+    shows up as high latency rather than as a lower request rate.
+    """
+    rng = random.Random(seed)
+    names, weights = list(mix), list(mix.values())
+    slots = asyncio.Semaphore(concurrency)
+    samples: list[Sample] = []
+    lags: list[float] = []
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+
+    async def send(name: str, scheduled: float) -> None:
+        status = None
+        try:
+            async with slots:
+                response = await WORKLOADS[name](client, target, rng)
+                status = response.status_code
+        except httpx.HTTPError:
+            pass
+        finally:
+            samples.append(Sample(name, loop.time() - scheduled, status))
+
+    monitor = asyncio.create_task(monitor_lag(lags, stop))
+    tasks = []
+    start = loop.time()
+    for index in range(int(rate * duration)):
+        scheduled = start + index / rate
+        await asyncio.sleep(max(0.0, scheduled - loop.time()))
+        name = rng.choices(names, weights)[0]
+        tasks.append(asyncio.create_task(send(name, scheduled)))
+    await asyncio.gather(*tasks)
+    elapsed = loop.time() - start
+    stop.set()
+    await monitor
+    return samples, lags, elapsed
+
+
+def _print_report(result: dict[str, Any], baseline: dict[str, Any] | None) -> None:
+    def line(name: str, summary: dict[str, Any]) -> str:
+        latency = summary["latency_ms"]
+        return (
+            f"{name:10} {summary['requests']:7} {summary['throughput']:8.1f}/s "
+            f"{summary['error_rate']:6.1%} "
+            + " ".join(
+                f"{key}={latency.get(key, 0):.1f}"
+                for key in ("p50", "p95", "p99", "max")
+            )
+        )
+
+    print(line("all", result))
+    for name, summary in result["operations"].items():
+        print(line(name, summary))
+    lag = result["loop_lag_ms"]
+    print(
+        f"loop lag   p50={lag.get('p50', 0):.1f} p99={lag.get('p99', 0):.1f} max={lag.get('max', 0):.1f}"
+    )
+    if baseline is None:
+        return
+    print("\ncompared with the baseline:")
+    for key in ("p50", "p95", "p99", "max"):
+        before, after = baseline["latency_ms"].get(key), result["latency_ms"].get(key)
+        if before and after:
+            print(
+                f"  {key:4} {before:8.1f}ms -> {after:8.1f}ms ({after / before:.2f}x)"
+            )
+    print(
+        f"  throughput {baseline['throughput']:.1f}/s -> {result['throughput']:.1f}/s"
+    )
+
+
+async def _main(args: argparse.Namespace) -> dict[str, Any]:
+    upstream = None
+    if args.target == "planet" and (args.url is None or args.upstream_port):
+        upstream = FakePlanet(args.upstream_port, args.upstream_latency, args.windows)
+        upstream.start()
+
+    load = args.url is None
+    if args.target == "planet":
+        target = planet_target(upstream.url if upstream else None, load)
+    else:
+        target = mock_target(load)
+
+    config = {
+        key: value
+        for key, value in vars(args).items()
+        if key not in ("output", "baseline")
+    }
+    try:
+        async with _client(target, args.url) as client:
+            samples, lags, elapsed = await run(
+                client, target, args.mix, args.rate, args.duration, args.concurrency
+            )
+    finally:
+        if upstream is not None:
+            upstream.shutdown()
+    return report(samples, lags, elapsed, config)
+
+
+@asynccontextmanager
+async def _client(target: Target, url: str | None) -> AsyncIterator[httpx.AsyncClient]:
+    headers = {"Authorization": "Bearer loadtest"}
+    if url is not None:
+        async with httpx.AsyncClient(
+            base_url=url, headers=headers, timeout=60
+        ) as client:
+            yield client
+        return
+    assert target.app is not None
+    async with lifespan(target.app) as app:
+        # errors are counted as 500 responses rather than ending the run
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://loadtest", headers=headers, timeout=60
+        ) as client:
+            yield client
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("target", choices=["planet", "mock"])
+    parser.add_argument(
+        "--url", help="load a server at this URL instead of the app in this process"
+    )
+    parser.add_argument("--rate", type=float, default=20, help="requests per second")
+    parser.add_argument("--duration", type=float, default=10, help="seconds")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX))
+    parser.add_argument(
+        "--concurrency", type=int, default=256, help="the most requests in flight"
+    )
+    parser.add_argument(
+        "--upstream-port",
+        type=int,
+        default=0,
+        help="serve the fake Planet API on this port, for a server run with "
+        "API_DOMAIN=http://127.0.0.1:<port>",
+    )
+    parser.add_argument(
+        "--upstream-latency",
+        type=float,
+        default=0.05,
+        help="seconds the fake Planet API takes to answer",
+    )
+    parser.add_argument(
+        "--windows", type=int, default=10, help="imaging windows found per search"
+    )
+    parser.add_argument("--output", type=Path, help="save the report as JSON")
+    parser.add_argument("--baseline", type=Path, help="a report to compare with")
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(_main(args))
+    if args.output is not None:
+        args.output.write_text(json.dumps(result, indent=2))
+    baseline = json.loads(args.baseline.read_text()) if args.baseline else None
+    _print_report(result, baseline)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
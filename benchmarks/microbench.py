@@ -0,0 +1,352 @@
+"""
+Microbenchmarks of conversions, model validation and serialization.
+
+Times each case on synthetic datasets of increasing size, saves the results as
+JSON and compares them with a baseline saved earlier:
+
+    python -m benchmarks.microbench --save-baseline      # on main
+    python -m benchmarks.microbench                      # on a branch
+
+Exits with status 1 if any case got slower than the baseline by more than the
+tolerance.
+"""
+
+import argparse
+import gc
+import json
+import platform
+import statistics
+import sys
+import time
+from collections.abc import Callable, Sequence
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+from pydantic import TypeAdapter
+
+from benchmarks import datasets
+from benchmarks.datasets import GEOMETRIES, POLYGON_VERTICES, GeometryKind
+from planet.conversions import (
+    CreateOrderTemplate,
+    planet_iw_to_stapi_opportunity,
+    planet_order_to_stapi_order,
+)
+from planet.models import (
+    PlanetOpportunityProperties,
+    PlanetOrderParameters,
+    PlanetProductConstraints,
+)
+from stapi_fastapi.fields import ALL_FIELDS
+from stapi_fastapi.formats import chunked, write_feature_collection
+from stapi_fastapi.geometry import GeometryReducer
+from stapi_fastapi.models.opportunity import OpportunityCollection, OpportunityPayload
+from stapi_fastapi.models.order import OrderCollection, OrderPayload
+from stapi_fastapi.models.product import Product
+from stapi_fastapi.models.shared import Link
+from stapi_fastapi.responses import GeoJSONResponse
+from stapi_fastapi.types.datetime_interval import DatetimeInterval
+
+HERE = Path(__file__).parent
+BASELINE = HERE / "baseline.json"
+RESULTS = HERE / "results"
+
+DEFAULT_SIZES = (10, 100, 1_000, 10_000, 100_000)
+CREATE_HREF = "http://localhost/products/INT-003001:Assured%20Tasking/orders"
+
+type Case = Callable[[int, GeometryKind], Callable[[], object]]
+
+
+@dataclass
+class Result:
+    name: str
+    geometry: str
+    size: int
+    best: float
+    median: float
+
+    @property
+    def key(self) -> tuple[str, str, int]:
+        return self.name, self.geometry, self.size
+
+    @property
+    def per_item_us(self) -> float:
+        return self.median / self.size * 1_000_000
+
+
+def _product() -> Product:
+    return Product(
+        id=datasets.PRODUCT_ID,
+        license="proprietary",
+        constraints=PlanetProductConstraints,
+        opportunity_properties=PlanetOpportunityProperties,
+        order_parameters=PlanetOrderParameters,
+        create_order=None,  # type: ignore[arg-type]
+    )
+
+
+def _search(kind: GeometryKind) -> OpportunityPayload:
+    return OpportunityPayload.model_validate(datasets.opportunity_payloads(1, kind)[0])
+
+
+def _opportunities(size: int, kind: GeometryKind) -> list:
+    product, search = _product(), _search(kind)
+    template = CreateOrderTemplate.for_search(search, CREATE_HREF)
+    return [
+        planet_iw_to_stapi_opportunity(iw, product, search, template)
+        for iw in datasets.imaging_windows(size)
+    ]
+
+
+def _render(model: Any) -> object:
+    # what FastAPI does with a returned response model
+    return GeoJSONResponse(model.model_dump(mode="json", by_alias=True)).body
+
+
+def convert_imaging_windows(size: int, kind: GeometryKind) -> Callable[[], object]:
+    product, search = _product(), _search(kind)
+    windows = datasets.imaging_windows(size)
+
+    def convert() -> object:
+        # the template is built once per search
+        template = CreateOrderTemplate.for_search(search, CREATE_HREF)
+        return [
+            planet_iw_to_stapi_opportunity(iw, product, search, template)
+            for iw in windows
+        ]
+
+    return convert
+
+
+def convert_orders(size: int, kind: GeometryKind) -> Callable[[], object]:
+    orders = datasets.planet_orders(size, kind)
+    return lambda: [planet_order_to_stapi_order(order) for order in orders]
+
+
+def parse_datetime_intervals(size: int, kind: GeometryKind) -> Callable[[], object]:
+    adapter: TypeAdapter = TypeAdapter(DatetimeInterval)
+    values = [
+        f"{window['start_time']}/{window['end_time']}"
+        for window in datasets.imaging_windows(size)
+    ]
+    return lambda: [adapter.validate_python(value) for value in values]
+
+
+def validate_opportunity_payloads(
+    size: int, kind: GeometryKind
+) -> Callable[[], object]:
+    payloads = datasets.opportunity_payloads(size, kind)
+    return lambda: [OpportunityPayload.model_validate(body) for body in payloads]
+
+
+def validate_order_payloads(size: int, kind: GeometryKind) -> Callable[[], object]:
+    model = OrderPayload[PlanetOrderParameters]
+    payloads = datasets.order_payloads(size, kind)
+    return lambda: [model.model_validate(body) for body in payloads]
+
+
+def serialize_opportunity_collection(
+    size: int, kind: GeometryKind
+) -> Callable[[], object]:
+    collection = OpportunityCollection(features=_opportunities(size, kind))
+    return lambda: _render(collection)
+
+
+def stream_opportunity_collection(
+    size: int, kind: GeometryKind
+) -> Callable[[], object]:
+    features = _opportunities(size, kind)
+    return lambda: list(
+        chunked(write_feature_collection(features, [], {"id": None}, ALL_FIELDS))
+    )
+
+
+def stream_reduced_opportunity_collection(
+    size: int, kind: GeometryKind
+) -> Callable[[], object]:
+    features = _opportunities(size, kind)
+
+    def stream() -> object:
+        reducer = GeometryReducer(precision=6, tolerance=1e-5)
+        reduced = map(reducer.feature, features)
+        return list(
+            chunked(write_feature_collection(reduced, [], {"id": None}, ALL_FIELDS))
+        )
+
+    return stream
+
+
+def serialize_order_collection(size: int, kind: GeometryKind) -> Callable[[], object]:
+    collection = OrderCollection(
+        features=[
+            planet_order_to_stapi_order(order)
+            for order in datasets.planet_orders(size, kind)
+        ]
+    )
+    return lambda: _render(collection)
+
+
+def serialize_links(size: int, kind: GeometryKind) -> Callable[[], object]:
+    links = [
+        link for opportunity in _opportunities(size, kind) for link in opportunity.links
+    ]
+    adapter: TypeAdapter = TypeAdapter(list[Link])
+    return lambda: adapter.dump_json(links)
+
+
+# cases, and whether their cost depends on the geometry
+CASES: dict[str, tuple[Case, bool]] = {
+    "convert.imaging_windows": (convert_imaging_windows, True),
+    "convert.orders": (convert_orders, True),
+    "parse.datetime_interval": (parse_datetime_intervals, False),
+    "validate.opportunity_payload": (validate_opportunity_payloads, True),
+    "validate.order_payload": (validate_order_payloads, True),
+    "serialize.opportunity_collection": (serialize_opportunity_collection, True),
+    "stream.opportunity_collection": (stream_opportunity_collection, True),
+    "stream.reduced_opportunity_collection": (
+        stream_reduced_opportunity_collection,
+        True,
+    ),
+    "serialize.order_collection": (serialize_order_collection, True),
+    "serialize.links": (serialize_links, True),
+}
+
+
+def measure(function: Callable[[], object], repeat: int) -> tuple[float, float]:
+    """Return the best and median wall time of `repeat` calls of `function`."""
+    timings = []
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - start)
+    finally:
+        gc.enable()
+    return min(timings), statistics.median(timings)
+
+
+def run(
+    cases: Sequence[str],
+    sizes: Sequence[int],
+    repeat: int = 3,
+    max_vertices: int = 1_000_000,
+    progress: Callable[[Result], None] | None = None,
+) -> list[Result]:
+    """
+    Run `cases` at every size. Polygon datasets whose vertices would exceed
+    `max_vertices` in total are skipped to bound memory use.
+    """
+    results = []
+    for name in cases:
+        case, by_geometry = CASES[name]
+        for kind in GEOMETRIES if by_geometry else GEOMETRIES[:1]:
+            for size in sizes:
+                if kind == "polygon" and size * POLYGON_VERTICES > max_vertices:
+                    continue
+                best, median = measure(case(size, kind), repeat)
+                result = Result(name, kind if by_geometry else "-", size, best, median)
+                results.append(result)
+                if progress is not None:
+                    progress(result)
+    return results
+
+
+def compare(
+    results: list[Result], baseline: list[Result], tolerance: float
+) -> list[tuple[Result, float]]:
+    """Return the results slower than their baseline by more than `tolerance`."""
+    previous = {result.key: result for result in baseline}
+    regressions = []
+    for result in results:
+        if result.key in previous:
+            ratio = result.median / previous[result.key].median
+            if ratio > 1 + tolerance:
+                regressions.append((result, ratio))
+    return regressions
+
+
+def save(results: list[Result], path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(
+        json.dumps(
+            {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "machine": platform.machine(),
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "results": [asdict(result) for result in results],
+            },
+            indent=2,
+        )
+    )
+
+
+def load(path: Path) -> list[Result]:
+    return [Result(**result) for result in json.loads(path.read_text())["results"]]
+
+
+def _line(result: Result) -> str:
+    return (
+        f"{result.name:34} {result.geometry:8} {result.size:>8} "
+        f"{result.median * 1000:10.2f}ms {result.per_item_us:10.2f}us/item"
+    )
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "cases", nargs="*", help=f"the cases to run, default all of {', '.join(CASES)}"
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--max-vertices",
+        type=int,
+        default=1_000_000,
+        help="skip polygon datasets with more vertices in total",
+    )
+    parser.add_argument(
+        "--output", type=Path, help="where to save the results, default results/"
+    )
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="save the results as baseline"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.15,
+        help="the slowdown relative to the baseline reported as a regression",
+    )
+    args = parser.parse_args(argv)
+    if unknown := set(args.cases) - set(CASES):
+        parser.error(f"unknown cases: {', '.join(sorted(unknown))}")
+
+    results = run(
+        args.cases or list(CASES),
+        args.sizes,
+        args.repeat,
+        args.max_vertices,
+        progress=lambda result: print(_line(result), flush=True),
+    )
+    output = args.output or RESULTS / f"{time.strftime('%Y%m%dT%H%M%S')}.json"
+    save(results, output)
+    print(f"\nresults saved to {output}")
+    if args.save_baseline:
+        save(results, args.baseline)
+        print(f"baseline saved to {args.baseline}")
+        return 0
+    if not args.baseline.exists():
+        print(f"no baseline at {args.baseline}, nothing to compare")
+        return 0
+
+    regressions = compare(results, load(args.baseline), args.tolerance)
+    for result, ratio in regressions:
+        print(f"regression: {_line(result)} {ratio:.2f}x baseline", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,9 +2,9 @@ from fastapi import FastAPI
 
 from planet.backends import (
     create_order,
+    document_create_order_links,
     get_order,
-    mock_get_order_statuses,
-    mock_get_orders,
+    order_store,
     search_opportunities,
 )
 from planet.models import (
@@ -13,12 +13,22 @@ from planet.models import (
     PlanetProductConstraints,
     provider_planet,
 )
-from planet.settings import Settings
+from planet.settings import get_settings
 from stapi_fastapi import Product
+from stapi_fastapi.compression import install_compression
+from stapi_fastapi.log import install_logging
+from stapi_fastapi.loop_monitor import install_loop_monitor
+from stapi_fastapi.metrics import REGISTRY, install_metrics
 from stapi_fastapi.models.conformance import CORE, OPPORTUNITIES
+from stapi_fastapi.openapi import install_openapi_cache
+from stapi_fastapi.profiler import install_profiler
 from stapi_fastapi.routers.root_router import RootRouter
+from stapi_fastapi.timing import ServerTimingMiddleware
+from stapi_fastapi.tracing import install_tracing
 
-pl_number = {"production": "INT-003001", "staging": "INT-004004"}[Settings().env]
+install_logging(get_settings().loglevel.value)
+
+pl_number = {"production": "INT-003001", "staging": "INT-004004"}[get_settings().env]
 
 product_test_planet_sync_opportunity = Product(
     id=f"{pl_number}:Assured Tasking",
@@ -39,14 +49,34 @@ product_test_planet_sync_opportunity = Product(
 # PlanetRootRouter
 # get_products=get_products,
 root_router = RootRouter(
-    get_orders=mock_get_orders,
+    get_orders=order_store.get_orders,
     get_order=get_order,
-    get_order_statuses=mock_get_order_statuses,
+    get_order_statuses=order_store.get_order_statuses,
     # get_opportunity_search_records=None,
     # get_opportunity_search_record=None,
     conformances=[CORE, OPPORTUNITIES],  # , ASYNC_OPPORTUNITIES
+    # shares the secret of PAGINATION_SECRET with the order store, so that
+    # every worker accepts the tokens of the others
+    paginator=order_store.paginator,
 )
 root_router.add_product(product_test_planet_sync_opportunity)
+document_create_order_links(root_router, product_test_planet_sync_opportunity)
 
 app: FastAPI = FastAPI()
 app.include_router(root_router, prefix="")
+app.add_middleware(ServerTimingMiddleware, enabled=get_settings().server_timing)
+REGISTRY.directory = get_settings().metrics_dir
+install_metrics(app)
+if get_settings().tracing:
+    # recent traces are only served to holders of the token
+    traces_token = get_settings().traces_token
+    install_tracing(
+        app, path="/debug/traces" if traces_token else None, token=traces_token
+    )
+if threshold := get_settings().loop_block_threshold:
+    install_loop_monitor(app, threshold=threshold)
+if token := get_settings().profiler_token:
+    install_profiler(app, token, get_settings().profiles_dir)
+install_openapi_cache(app, root_router, background=True)
+if get_settings().compression:
+    install_compression(app)
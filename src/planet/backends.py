@@ -1,11 +1,16 @@
 import logging
 
 from fastapi import Request
+from fastapi.routing import APIRoute
 from returns.maybe import Maybe, Nothing, Some
 from returns.result import Failure, ResultE, Success
+from starlette.concurrency import run_in_threadpool
 
 from stapi_fastapi import Link
+from stapi_fastapi.backends import SQLiteOrderStore
 from stapi_fastapi.constants import TYPE_JSON
+from stapi_fastapi.exceptions import ConstraintsException
+from stapi_fastapi.fields import requested_fields
 from stapi_fastapi.models.opportunity import (
     Opportunity,
     OpportunityPayload,
@@ -13,43 +18,32 @@ from stapi_fastapi.models.opportunity import (
 from stapi_fastapi.models.order import (
     Order,
     OrderPayload,
-    OrderStatus,
 )
-from stapi_fastapi.models.product import ProductsCollection
+from stapi_fastapi.models.product import Product, ProductsCollection
+from stapi_fastapi.pagination import Paginator
 from stapi_fastapi.routers.product_router import ProductRouter
-from stapi_fastapi.routers.route_names import CREATE_ORDER, LIST_PRODUCTS
+from stapi_fastapi.routers.root_router import RootRouter
+from stapi_fastapi.routers.route_names import (
+    CREATE_ORDER,
+    LIST_PRODUCTS,
+    SEARCH_OPPORTUNITIES,
+)
+from stapi_fastapi.timing import timed
 
 from . import conversions
 from .client import Client
+from .models import CreateOrderLinks
+from .settings import get_settings
 
 logger = logging.getLogger(__name__)
 
+settings = get_settings()
 
-async def mock_get_orders(
-    next: str | None, limit: int, request: Request
-) -> ResultE[tuple[list[Order], Maybe[str]]]:
-    """
-    Return orders from backend.  Handle pagination/limit if applicable
-    """
-    try:
-        start = 0
-        limit = min(limit, 100)
-
-        order_ids = [*request.state._orders_db._orders.keys()]
-
-        if next:
-            start = order_ids.index(next)
-        end = start + limit
-        ids = order_ids[start:end]
-        orders = [request.state._orders_db.get_order(order_id) for order_id in ids]
-
-        if end > 0 and end < len(order_ids):
-            return Success(
-                (orders, Some(request.state._orders_db._orders[order_ids[end]].id))
-            )
-        return Success((orders, Nothing))
-    except Exception as e:
-        return Failure(e)
+# orders are proxied to the Planet API; the local store keeps the orders created
+# through this API so that they can be listed and their statuses tracked
+order_store = SQLiteOrderStore(
+    settings.orders_db_path, paginator=Paginator(settings.pagination_secret)
+)
 
 
 async def get_order(order_id: str, request: Request) -> ResultE[Maybe[Order]]:
@@ -57,35 +51,12 @@ async def get_order(order_id: str, request: Request) -> ResultE[Maybe[Order]]:
     Show details for order with `order_id`.
     """
     try:
-        return Success(
-            Maybe.from_optional(
-                conversions.planet_order_to_stapi_order(
-                    Client(request).get_order(order_id)
-                )
-            )
-        )
-    except Exception as e:
-        return Failure(e)
-
-
-async def mock_get_order_statuses(
-    order_id: str, next: str | None, limit: int, request: Request
-) -> ResultE[Maybe[tuple[list[OrderStatus], Maybe[str]]]]:
-    try:
-        start = 0
-        limit = min(limit, 100)
-        statuses = request.state._orders_db.get_order_statuses(order_id)
-        if statuses is None:
-            return Success(Nothing)
-
-        if next:
-            start = int(next)
-        end = start + limit
-        stati = statuses[start:end]
-
-        if end > 0 and end < len(statuses):
-            return Success(Some((stati, Some(str(end)))))
-        return Success(Some((stati, Nothing)))
+        planet_order = await run_in_threadpool(Client(request).get_order, order_id)
+        with timed("convert"):
+            order = conversions.planet_order_to_stapi_order(planet_order)
+        with timed("store"):
+            await run_in_threadpool(order_store.sync_order, order)
+        return Success(Some(order))
     except Exception as e:
         return Failure(e)
 
@@ -101,7 +72,7 @@ async def get_products(self, request: Request, **router_args) -> ProductsCollect
     return ProductsCollection(
         products=[
             conversions.planet_product_to_stapi_product(planet_product, **router_args)
-            for planet_product in Client(request).get_products()
+            for planet_product in await run_in_threadpool(Client(request).get_products)
         ],
         links=links,
     )
@@ -111,16 +82,65 @@ async def create_order(
     product_router: ProductRouter, payload: OrderPayload, request: Request
 ) -> ResultE[Order]:
     try:
-        planet_payload = conversions.stapi_order_payload_to_planet_create_order_payload(
-            payload, product_router.product
+        with timed("convert"):
+            planet_payload = (
+                conversions.stapi_order_payload_to_planet_create_order_payload(
+                    payload, product_router.product
+                )
+            )
+        planet_order_response = await run_in_threadpool(
+            Client(request).create_order, planet_payload
         )
-        planet_order_response = Client(request).create_order(planet_payload)
-        stapi_order = conversions.planet_order_to_stapi_order(planet_order_response)
+        with timed("convert"):
+            stapi_order = conversions.planet_order_to_stapi_order(planet_order_response)
+        with timed("store"):
+            await run_in_threadpool(order_store.sync_order, stapi_order)
         return Success(stapi_order)
     except Exception as e:
         return Failure(e)
 
 
+# `create_order_links` is read by `search_opportunities` from the request rather
+# than declared by the route, which is shared with other backends, so it is
+# added to the OpenAPI document of the route with `document_create_order_links`
+CREATE_ORDER_LINKS_PARAMETER = {
+    "name": "create_order_links",
+    "in": "query",
+    "required": False,
+    "description": (
+        "`compact` for create-order links only holding the datetime and order "
+        "parameters of each opportunity, to be merged into the create-order link "
+        "of the search, or `expanded` for the whole create order request."
+    ),
+    "schema": {
+        "type": "string",
+        "enum": [x.value for x in CreateOrderLinks],
+        "default": CreateOrderLinks.compact.value,
+    },
+}
+
+
+def document_create_order_links(root_router: RootRouter, product: Product) -> None:
+    """Add `create_order_links` to the opportunity search route of `product`."""
+    product_router = root_router.get_product_router(product.id)
+    name = product_router.route_name(SEARCH_OPPORTUNITIES)
+    # the route is registered on the root router if product routes are collapsed
+    for route in [*product_router.routes, *root_router.routes]:
+        if isinstance(route, APIRoute) and route.name == name:
+            route.openapi_extra = {"parameters": [CREATE_ORDER_LINKS_PARAMETER]}
+
+
+def create_order_links(request: Request) -> CreateOrderLinks:
+    """Return the form of create-order links requested with `create_order_links`."""
+    value = request.query_params.get("create_order_links", CreateOrderLinks.compact)
+    try:
+        return CreateOrderLinks(value)
+    except ValueError:
+        raise ConstraintsException(
+            f"create_order_links must be one of {[x.value for x in CreateOrderLinks]}"
+        ) from None
+
+
 # TODO why does this return a list of Opportunities and not an OpportunityCollection?
 #      and what does the related "get_search_opportunities" do in comparison?
 async def search_opportunities(
@@ -131,19 +151,28 @@ async def search_opportunities(
     request: Request,
 ) -> ResultE[tuple[list[Opportunity], Maybe[str]]]:
     try:
-        iw_request = conversions.stapi_opportunity_payload_to_planet_iw_search(
-            product_router.product, search
+        links = create_order_links(request)
+        with timed("convert"):
+            iw_request = conversions.stapi_opportunity_payload_to_planet_iw_search(
+                product_router.product, search
+            )
+        imaging_windows = await run_in_threadpool(
+            Client(request).get_imaging_windows, iw_request
         )
-        imaging_windows = Client(request).get_imaging_windows(iw_request)
-        create_order_name = f"{product_router.root_router.name}:{product_router.product.id}:{CREATE_ORDER}"
-        create_href = str(request.url_for(create_order_name))
+        fields = requested_fields(request)
 
-        opportunities = [
-            conversions.planet_iw_to_stapi_opportunity(
-                iw, product_router.product, search, create_href
+        with timed("convert"):
+            template = conversions.CreateOrderTemplate.for_search(
+                search,
+                product_router.url_for(request, CREATE_ORDER),
+                links,
             )
-            for iw in imaging_windows
-        ]
+            opportunities = [
+                conversions.planet_iw_to_stapi_opportunity(
+                    iw, product_router.product, search, template, fields
+                )
+                for iw in imaging_windows
+            ]
         # return OpportunityCollection(features=opportunities)
         return Success((opportunities, Nothing))
     except Exception as e:
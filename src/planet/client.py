@@ -1,12 +1,62 @@
+import logging
+import threading
 import time
+from typing import TYPE_CHECKING
 
-import requests
 from fastapi import Request
 
-from .settings import Settings
+from stapi_fastapi.metrics import Counter, Histogram
+from stapi_fastapi.timing import timed
+from stapi_fastapi.tracing import inject
+
+from .settings import get_settings
+
+if TYPE_CHECKING:
+    import requests
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+UPSTREAM_DURATION = Histogram(
+    "planet_upstream_request_duration_seconds",
+    "Time spent in requests to the Planet API, by client method and status.",
+    ["method", "status"],
+)
+IMAGING_WINDOW_POLLS = Histogram(
+    "planet_imaging_window_polls",
+    "Number of polls until an imaging window search finished.",
+    buckets=(1, 2, 3, 5, 10, 20, 30, 60, 120),
+)
+IMAGING_WINDOW_SEARCHES = Counter(
+    "planet_imaging_window_searches_total",
+    "Imaging window searches by final status.",
+    ["status"],
+)
+
+
+def session() -> "requests.Session":
+    """
+    Return this thread's HTTP session, reusing connections to the Planet API.
+
+    `requests` is imported on first use rather than with this module, keeping it
+    out of worker startup.
+    """
+    if not hasattr(_local, "session"):
+        import requests
+
+        _local.session = requests.Session()
+    return _local.session
 
 
 class Client:
+    """
+    A client of the Planet API.
+
+    Requests are sent with a blocking HTTP client, so call its methods from a
+    worker thread, e.g. with `run_in_threadpool`, and not on the event loop.
+    """
+
     def __init__(self, request: Request):
         authorization = request.headers.get("authorization", "")
         self.token = authorization.replace("Bearer ", "").replace("api-key ", "")
@@ -14,22 +64,25 @@ class Client:
             "Content-Type": "application/json",
             "Authorization": f"api-key {self.token}",
         }
-        self.orders_url = f"{Settings().api_base_url}/orders/"
-        self.iw_search_url = f"{Settings().api_base_url}/imaging-windows/search"
-        self.products_url = f"{Settings().api_base_url}/products"
+        settings = get_settings()
+        self.api_domain = settings.api_domain
+        self.orders_url = f"{settings.api_base_url}/orders/"
+        self.iw_search_url = f"{settings.api_base_url}/imaging-windows/search"
+        self.products_url = f"{settings.api_base_url}/products"
 
     def get_order(self, order_id: str) -> dict:
         order_url = f"{self.orders_url}{order_id}"
-        response = requests.get(order_url, headers=self.headers, allow_redirects=False)
+        response = self._request("get_order", "GET", order_url, allow_redirects=False)
         response.raise_for_status()
         return response.json()
 
     # todo this is a sync wrapper around an async search, migrate to async
     def get_imaging_windows(self, payload: dict) -> dict:
-        r = requests.post(
+        r = self._request(
+            "search_imaging_windows",
+            "POST",
             self.iw_search_url,
             json=payload,
-            headers=self.headers,
             allow_redirects=False,
         )
         r.raise_for_status()
@@ -37,35 +90,67 @@ class Client:
             raise ValueError(
                 f"Header 'location' not found: {list(r.headers.keys())}, status {r.status_code}, body {r.text}"
             )
-        poll_url = f"{Settings().api_domain}{r.headers['location']}"
-
-        while True:
-            print("polling", poll_url)
-            r = requests.get(poll_url, headers=self.headers)
-            r.raise_for_status()
-            status = r.json()["status"]
-            if status == "DONE":
-                print("done polling")
-                return r.json()["imaging_windows"]
-            elif status == "FAILED":
-                raise ValueError(
-                    f"Retrieving Imaging Windows failed: {r.json()['error_code']} - {r.json()['error_message']}'"
-                )
-            time.sleep(1)
+        poll_url = f"{self.api_domain}{r.headers['location']}"
+
+        polls = 0
+        status = "ERROR"
+        try:
+            while True:
+                logger.debug("Polling imaging window search %s", poll_url)
+                polls += 1
+                r = self._request("poll_imaging_windows", "GET", poll_url)
+                r.raise_for_status()
+                status = r.json()["status"]
+                if status == "DONE":
+                    logger.debug("Imaging window search done after %d polls", polls)
+                    return r.json()["imaging_windows"]
+                elif status == "FAILED":
+                    raise ValueError(
+                        f"Retrieving Imaging Windows failed: {r.json()['error_code']} - {r.json()['error_message']}'"
+                    )
+                with timed("upstream.poll_wait"):
+                    time.sleep(1)
+        finally:
+            IMAGING_WINDOW_POLLS.observe(polls)
+            IMAGING_WINDOW_SEARCHES.inc(status=status)
 
     def get_products(self) -> dict:
-        r = requests.get(self.products_url, headers=self.headers)
+        r = self._request("get_products", "GET", self.products_url)
         r.raise_for_status()
         return r.json()
 
     def create_order(self, payload: dict) -> dict:
-        print("order payload", payload)
-        r = requests.post(
-            self.orders_url, json=payload, headers=self.headers, allow_redirects=False
+        logger.debug("Creating order", extra={"payload": payload})
+        r = self._request(
+            "create_order",
+            "POST",
+            self.orders_url,
+            json=payload,
+            allow_redirects=False,
         )
-        try:
-            r.raise_for_status()
-        except requests.HTTPError as e:
-            print(r.text)
-            raise e
+        if not r.ok:
+            logger.warning(
+                "Creating order failed with status %s",
+                r.status_code,
+                extra={"response": r.text},
+            )
+        r.raise_for_status()
         return r.json()
+
+    def _request(
+        self, name: str, method: str, url: str, **kwargs
+    ) -> "requests.Response":
+        """Send a request on behalf of the client method `name`, measuring it."""
+        start = time.perf_counter()
+        status: int | str = "error"
+        try:
+            with timed(f"upstream.{name}"):
+                # continue the trace of this request in the Planet API
+                headers = inject(dict(self.headers))
+                response = session().request(method, url, headers=headers, **kwargs)
+            status = response.status_code
+            return response
+        finally:
+            UPSTREAM_DURATION.observe(
+                time.perf_counter() - start, method=name, status=status
+            )
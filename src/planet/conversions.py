@@ -1,6 +1,9 @@
+from dataclasses import dataclass
 from datetime import datetime, timezone
+from typing import Any
 
 from planet.models import (
+    CreateOrderLinks,
     OffNadirAngleRange,
     PlanetOpportunityProperties,
     PlanetOrderParameters,
@@ -8,6 +11,7 @@ from planet.models import (
 )
 from stapi_fastapi import Link, Product
 from stapi_fastapi.constants import TYPE_JSON
+from stapi_fastapi.fields import ALL_FIELDS, Fields
 from stapi_fastapi.models.opportunity import (
     Opportunity,
     OpportunityPayload,
@@ -97,27 +101,75 @@ def stapi_opportunity_payload_to_planet_iw_search(
     }
 
 
-def planet_iw_to_stapi_order_payload(
-    iw: dict, product: Product, search: OpportunityPayload
-) -> OrderPayload:
-    """Creating an order so it can be put into a create-order link"""
+def order_name(start_time: str, coordinates: str) -> str:
+    return f"{start_time} at {coordinates}"
+
+
+@dataclass(frozen=True)
+class CreateOrderTemplate:
+    """
+    The create-order link shared by the opportunities of a search, built once per
+    search rather than once per imaging window.
+
+    Compact links only carry what the order of their imaging window changes in
+    the search: its datetime and order parameters, to be merged into the body of
+    the create-order link of the search. Expanded links carry the whole create
+    order request, the same as the merged body.
+    """
+
+    link: Link
+    search_body: dict[str, Any]
+    coordinates: str
+    expanded: bool = False
+
+    @classmethod
+    def for_search(
+        cls,
+        search: OpportunityPayload,
+        create_href: str,
+        links: CreateOrderLinks = CreateOrderLinks.compact,
+    ) -> "CreateOrderTemplate":
+        return cls(
+            link=Link(
+                href=create_href,
+                rel="self",
+                type=TYPE_JSON,
+                title="create-order",
+                method="POST",
+            ),
+            search_body=search.search_body(),
+            coordinates=str(search.geometry.model_dump()["coordinates"]),
+            expanded=links is CreateOrderLinks.expanded,
+        )
 
-    return OrderPayload(
-        datetime=(
-            datetime.fromisoformat(iw["start_time"]),
-            datetime.fromisoformat(iw["end_time"]),
-        ),
-        geometry=search.geometry,
-        order_parameters=PlanetOrderParameters(
-            imaging_window_id=iw["id"],
-            name=f"{iw['start_time']} at {str(search.geometry.model_dump()['coordinates'])}",
-        ),
-    )
+    def body(self, iw: dict) -> dict[str, Any]:
+        """The body of the create-order link of imaging window `iw`."""
+        start = datetime.fromisoformat(iw["start_time"]).isoformat()
+        end = datetime.fromisoformat(iw["end_time"]).isoformat()
+        body = {
+            "datetime": f"{start}/{end}",
+            "order_parameters": {
+                "imaging_window_id": iw["id"],
+                "name": order_name(start, self.coordinates),
+            },
+        }
+        return {**self.search_body, **body} if self.expanded else body
+
+    def create_order_link(self, iw: dict) -> Link:
+        return self.link.model_copy(update={"body": self.body(iw)})
 
 
 def planet_iw_to_stapi_opportunity(
-    iw: dict, product: Product, search: OpportunityPayload, create_href: str
+    iw: dict,
+    product: Product,
+    search: OpportunityPayload,
+    template: CreateOrderTemplate,
+    fields: Fields = ALL_FIELDS,
 ) -> Opportunity:
+    """
+    Convert an imaging window to an opportunity, without the links or geometry
+    if they are not among the requested `fields`.
+    """
     cloud_forecast = 0
     if "cloud_forecast" in iw and len(cf := iw["cloud_forecast"]) > 0:
         cloud_forecast = cf[0].get("prediction")
@@ -132,23 +184,14 @@ def planet_iw_to_stapi_opportunity(
         cloud_forecast=cloud_forecast,
     )
 
-    create_order_body = planet_iw_to_stapi_order_payload(iw, product, search)
-
-    links = [
-        Link(
-            href=create_href,
-            rel="self",
-            type=TYPE_JSON,
-            title="create-order",
-            method="POST",
-            body=create_order_body,
-        )
-    ]
+    links = []
+    if fields.includes("links"):
+        links.append(template.create_order_link(iw))
 
     return Opportunity(
         id=iw["id"],
         type="Feature",
-        geometry=search.geometry,
+        geometry=search.geometry if fields.includes("geometry") else None,
         properties=properties,
         links=links,
     )
@@ -175,7 +218,11 @@ def stapi_order_payload_to_planet_create_order_payload(
         "imaging_window": payload.order_parameters.imaging_window_id,  # TODO if assured
         # TODO how to cast order parameters to _our_ order parameters here?
         "geometry": payload.geometry.model_dump(exclude={"bbox"}),
-        "name": payload.order_parameters.name,
+        "name": payload.order_parameters.name
+        or order_name(
+            payload.datetime[0].isoformat(),
+            str(payload.geometry.model_dump()["coordinates"]),
+        ),
         # TODO: Add datetime if not assured
         # TODO: All the other things we might want to add
     }
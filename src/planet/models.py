@@ -1,4 +1,4 @@
-from enum import Enum
+from enum import Enum, StrEnum
 from typing import Self
 
 from pydantic import BaseModel, Field, model_validator
@@ -56,7 +56,18 @@ class PlanetOpportunityProperties(OpportunityProperties):
 
 class PlanetOrderParameters(OrderParameters):
     imaging_window_id: str
-    name: str
+    # named after the start of the order and its geometry if not given
+    name: str | None = None
+
+
+class CreateOrderLinks(StrEnum):
+    """How the create-order link of each opportunity is written."""
+
+    # only the datetime and order parameters of the opportunity, to be merged
+    # into the create-order link of the search
+    compact = "compact"
+    # the whole body of the create order request
+    expanded = "expanded"
 
 
 provider_planet = Provider(
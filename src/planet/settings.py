@@ -1,8 +1,10 @@
 from enum import Enum
-from logging import basicConfig
+from functools import cache
 
 from pydantic_settings import BaseSettings
 
+from stapi_fastapi.log import install_logging
+
 ENV = "production"
 API_DOMAINS = {
     "production": "https://api.planet.com",
@@ -21,13 +23,29 @@ class LogLevel(Enum):
 
 
 class Settings(BaseSettings):
-    loglevel: LogLevel = LogLevel.DEBUG
+    loglevel: LogLevel = LogLevel.INFO
     api_domain: str = API_DOMAIN
     api_base_url: str = API_DOMAIN + "/tasking/v2"
     env: str = ENV
+    orders_db_path: str = "orders.sqlite3"
+    pagination_secret: str | None = None
+    server_timing: bool = False
+    metrics_dir: str | None = None
+    tracing: bool = False
+    traces_token: str | None = None
+    profiler_token: str | None = None
+    profiles_dir: str = "profiles"
+    loop_block_threshold: float = 0.25
+    compression: bool = True
 
     @classmethod
     def load(cls) -> "Settings":
         settings = Settings()
-        basicConfig(level=settings.loglevel.value)
+        install_logging(settings.loglevel.value)
         return settings
+
+
+@cache
+def get_settings() -> Settings:
+    """Return the settings, read from the environment once per process."""
+    return Settings()
@@ -11,8 +11,9 @@ from stapi_fastapi.routers import RootRouter
 
 
 # TODO this gets products from the API instead of hard-coded, but we also need to create routers dynamically
-#   we could do this relatively easy by replacing the individual routers with a catch-all product router,
-#   but it appears the ProductRouters carry a lot of context beyond the pure routing
+#   with `collapse_product_routes=True` adding a product no longer registers any routes, so products
+#   could be added as they are discovered, but it appears the ProductRouters carry a lot of context
+#   beyond the pure routing
 class PlanetRootRouter(RootRouter):
     def __init__(self, get_products, *args, **kwargs):
         self._get_products = get_products
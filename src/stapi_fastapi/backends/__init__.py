@@ -1,5 +1,6 @@
 from .product_backend import (
     CreateOrder,
+    DeferOpportunitySearch,
     GetOpportunityCollection,
     SearchOpportunities,
     SearchOpportunitiesAsync,
@@ -11,9 +12,11 @@ from .root_backend import (
     GetOrders,
     GetOrderStatuses,
 )
+from .sqlite_order_store import SQLiteOrderStore
 
 __all__ = [
     "CreateOrder",
+    "DeferOpportunitySearch",
     "GetOpportunityCollection",
     "GetOpportunitySearchRecord",
     "GetOpportunitySearchRecords",
@@ -22,4 +25,5 @@ __all__ = [
     "GetOrderStatuses",
     "SearchOpportunities",
     "SearchOpportunitiesAsync",
+    "SQLiteOrderStore",
 ]
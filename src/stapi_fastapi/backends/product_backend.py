@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from asyncio import Future
 from collections.abc import Coroutine
 from typing import Any, Callable
 
@@ -64,6 +65,35 @@ Backends must validate search constraints and return
 returns.result.Failure[stapi_fastapi.exceptions.ConstraintsException] if not valid.
 """
 
+DeferOpportunitySearch = Callable[
+    [
+        ProductRouter,
+        OpportunityPayload,
+        Future[ResultE[tuple[list[Opportunity], Maybe[str]]]],
+        Request,
+    ],
+    Coroutine[Any, Any, ResultE[OpportunitySearchRecord]],
+]
+"""
+Type alias for an async function that turns a synchronous opportunity search still
+running after the wait preferred by the client into an asynchronous one.
+
+The router keeps the search running; the backend records it, and must store its
+result as an opportunity collection once the future is done.
+
+Args:
+    product_router (ProductRouter): The product router.
+    search (OpportunityPayload): The search parameters.
+    search_result (Future[ResultE[tuple[list[Opportunity], Maybe[str]]]]): The
+        running search, which completes with the result of `SearchOpportunities`.
+    request (Request): FastAPI's Request object.
+
+Returns:
+    - Should return returns.result.Success[OpportunitySearchRecord]
+    - Returning returns.result.Failure[Exception] will result in a 500, and the
+      search being cancelled.
+"""
+
 GetOpportunityCollection = Callable[
     [ProductRouter, str, Request],
     Coroutine[Any, Any, ResultE[Maybe[OpportunityCollection]]],
@@ -5,6 +5,7 @@ from fastapi import Request
 from returns.maybe import Maybe
 from returns.result import ResultE
 
+from stapi_fastapi.filters import OrderFilter
 from stapi_fastapi.models.opportunity import OpportunitySearchRecord
 from stapi_fastapi.models.order import (
     Order,
@@ -12,7 +13,7 @@ from stapi_fastapi.models.order import (
 )
 
 GetOrders = Callable[
-    [str | None, int, Request],
+    [str | None, int, OrderFilter, Request],
     Coroutine[Any, Any, ResultE[tuple[list[Order], Maybe[str]]]],
 ]
 """
@@ -21,6 +22,7 @@ Type alias for an async function that returns a list of existing Orders.
 Args:
     next (str | None): A pagination token.
     limit (int): The maximum number of orders to return in a page.
+    order_filter (OrderFilter): The orders to return; only those it `matches`.
     request (Request): FastAPI's Request object.
 
 Returns:
@@ -29,6 +31,11 @@ Returns:
     - Should return returns.result.Success[tuple[list[Order], returns.maybe.Some[str]]] if including a pagination token
     - Should return returns.result.Success[tuple[list[Order], returns.maybe.Nothing]] if not including a pagination token
     - Returning returns.result.Failure[Exception] will result in a 500.
+
+Note:
+    `stapi_fastapi.pagination.Paginator` can be used to issue and verify pagination
+    tokens. Returning returns.result.Failure[ValueError] for an invalid pagination
+    token will result in a 404.
 """
 
 GetOrder = Callable[[str, Request], Coroutine[Any, Any, ResultE[Maybe[Order]]]]
@@ -69,6 +76,11 @@ Returns:
     - Should return returns.result.Success[returns.maybe.Some[tuple[list[OrderStatus], returns.maybe.Nothing]]] if order is found and not including a pagination token.
     - Should return returns.result.Success[returns.maybe.Nothing] if the order is not found or if access is denied.
     - Returning returns.result.Failure[Exception] will result in a 500.
+
+Note:
+    `stapi_fastapi.pagination.Paginator` can be used to issue and verify pagination
+    tokens. Returning returns.result.Failure[ValueError] for an invalid pagination
+    token will result in a 404.
 """
 
 GetOpportunitySearchRecords = Callable[
@@ -87,6 +99,11 @@ Returns:
     - Should return returns.result.Success[tuple[list[OpportunitySearchRecord], returns.maybe.Some[str]]] if including a pagination token
     - Should return returns.result.Success[tuple[list[OpportunitySearchRecord], returns.maybe.Nothing]] if not including a pagination token
     - Returning returns.result.Failure[Exception] will result in a 500.
+
+Note:
+    `stapi_fastapi.pagination.Paginator` can be used to issue and verify pagination
+    tokens. Returning returns.result.Failure[ValueError] for an invalid pagination
+    token will result in a 404.
 """
 
 GetOpportunitySearchRecord = Callable[
@@ -0,0 +1,405 @@
+import itertools
+import math
+import sqlite3
+import threading
+from collections.abc import Collection, Iterator
+from datetime import datetime
+from os import PathLike
+from typing import Any
+
+from fastapi import Request
+from returns.maybe import Maybe, Nothing, Some
+from returns.result import Failure, ResultE, Success
+from starlette.concurrency import run_in_threadpool
+
+from stapi_fastapi.filters import ALL_ORDERS, OrderFilter
+from stapi_fastapi.geometry import bounds
+from stapi_fastapi.indexes import IntervalIndex, RTree
+from stapi_fastapi.indexes.interval import Interval
+from stapi_fastapi.models.order import Order, OrderStatus
+from stapi_fastapi.pagination import MAX_LIMIT, InvalidPaginationToken, Paginator
+from stapi_fastapi.routers.route_names import LIST_ORDERS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    product_id TEXT NOT NULL,
+    status_code TEXT NOT NULL,
+    created REAL NOT NULL,
+    min_x REAL NOT NULL,
+    min_y REAL NOT NULL,
+    max_x REAL NOT NULL,
+    max_y REAL NOT NULL,
+    body TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS orders_product_id ON orders (product_id, seq);
+CREATE INDEX IF NOT EXISTS orders_status_code ON orders (status_code, seq);
+CREATE INDEX IF NOT EXISTS orders_created ON orders (created, seq);
+CREATE INDEX IF NOT EXISTS orders_bbox ON orders (min_x, max_x, min_y, max_y);
+
+CREATE TABLE IF NOT EXISTS order_statuses (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    order_id TEXT NOT NULL,
+    body TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS order_statuses_order_id ON order_statuses (order_id, seq);
+"""
+
+UPSERT_ORDER = """
+INSERT INTO orders (
+    id, product_id, status_code, created, min_x, min_y, max_x, max_y, body
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET
+    product_id = excluded.product_id,
+    status_code = excluded.status_code,
+    created = excluded.created,
+    min_x = excluded.min_x,
+    min_y = excluded.min_y,
+    max_x = excluded.max_x,
+    max_y = excluded.max_y,
+    body = excluded.body
+"""
+
+# candidates of a spatial filter loaded from the database at a time
+CANDIDATE_BATCH = 256
+
+
+class SQLiteOrderStore:
+    """
+    A durable order store backed by an embedded SQLite database.
+
+    The bound methods `get_orders`, `get_order`, and `get_order_statuses`
+    implement the `GetOrders`, `GetOrder`, and `GetOrderStatuses` backend
+    contracts and can be passed to `RootRouter` directly. Orders are indexed on
+    product, status, creation time, and geometry bounding box, so listing the
+    orders filtered by product, status, or creation time reads the matching
+    orders only.
+
+    Orders filtered by geometry or datetime are looked up in an in-process
+    R-tree of their bounding boxes and index of their datetime intervals, loaded
+    on the first such request and then kept current with the orders written by
+    this process and those added by others since, and tested exactly against the
+    filter.
+
+    The database runs in WAL mode, so any number of processes, e.g. uvicorn
+    workers, can read it while one of them writes. Each thread opens its own
+    connection on first use, so a store can be created before workers fork.
+
+    Args:
+        path (str | PathLike): The path of the database file.
+        paginator (Paginator | None): Issues the pagination tokens. Pass a
+            paginator with a shared secret when running multiple processes.
+    """
+
+    def __init__(self, path: str | PathLike, paginator: Paginator | None = None):
+        self.path = path
+        self.paginator = paginator or Paginator()
+        self._local = threading.local()
+        self._spatial_index: RTree[int] | None = None
+        self._interval_index: IntervalIndex[int] | None = None
+        # the last order added to the indexes from the database
+        self._indexed_seq = 0
+        self._index_lock = threading.Lock()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def close(self) -> None:
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def put_order(self, order: Order) -> None:
+        seq = self._upsert_order(order)
+        self._index_order(seq, order)
+
+    def sync_order(self, order: Order) -> bool:
+        """
+        Store `order` and, if its status differs from the stored one, append the
+        status to its history, in one transaction so that concurrent writers of
+        the same order record each status change once.
+
+        Returns:
+            bool: Whether the status of the order changed.
+        """
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            row = self.connection.execute(
+                "SELECT status_code FROM orders WHERE id = ?", (order.id,)
+            ).fetchone()
+            seq = self._upsert_order(order)
+            changed = row is None or row[0] != order.properties.status.status_code
+            if changed:
+                self.connection.execute(
+                    "INSERT INTO order_statuses (order_id, body) VALUES (?, ?)",
+                    (order.id, order.properties.status.model_dump_json()),
+                )
+        self._index_order(seq, order)
+        return changed
+
+    def put_order_status(self, order_id: str, status: OrderStatus) -> None:
+        body = status.model_dump_json()
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            self.connection.execute(
+                "INSERT INTO order_statuses (order_id, body) VALUES (?, ?)",
+                (order_id, body),
+            )
+            # keep the indexed status of the order itself current
+            self.connection.execute(
+                "UPDATE orders SET status_code = ?, "
+                "body = json_set(body, '$.properties.status', json(?)) WHERE id = ?",
+                (status.status_code, body, order_id),
+            )
+
+    def load_order(self, order_id: str) -> Order | None:
+        row = self.connection.execute(
+            "SELECT body FROM orders WHERE id = ?", (order_id,)
+        ).fetchone()
+        return None if row is None else Order.model_validate_json(row[0])
+
+    def load_orders(
+        self, next: str | None, limit: int, order_filter: OrderFilter = ALL_ORDERS
+    ) -> tuple[list[Order], Maybe[str]]:
+        after = self._decode(next, LIST_ORDERS)
+        if order_filter.search_bbox is not None or order_filter.timestamps is not None:
+            return self._load_matching_orders(after, limit, order_filter)
+        conditions, params = _conditions(order_filter)
+        table = "orders"
+        if order_filter.created is not None and not (
+            order_filter.status or order_filter.product_id
+        ):
+            # read the orders created in range rather than walking all of them by seq
+            table = "orders INDEXED BY orders_created"
+        rows = self._page(
+            f"SELECT seq, body FROM {table} WHERE seq > ?{conditions} "
+            "ORDER BY seq LIMIT ?",
+            (after, *params),
+            limit,
+        )
+        return self._result(rows, limit, LIST_ORDERS, Order)
+
+    def load_order_statuses(
+        self, order_id: str, next: str | None, limit: int
+    ) -> tuple[list[OrderStatus], Maybe[str]] | None:
+        after = self._decode(next, order_id)
+        rows = self._page(
+            "SELECT seq, body FROM order_statuses WHERE order_id = ? AND seq > ? "
+            "ORDER BY seq LIMIT ?",
+            (order_id, after),
+            limit,
+        )
+        if not rows and not self._has_order(order_id):
+            return None
+        return self._result(rows, limit, order_id, OrderStatus)
+
+    async def get_orders(
+        self, next: str | None, limit: int, order_filter: OrderFilter, request: Request
+    ) -> ResultE[tuple[list[Order], Maybe[str]]]:
+        try:
+            return Success(
+                await run_in_threadpool(self.load_orders, next, limit, order_filter)
+            )
+        except Exception as e:
+            return Failure(e)
+
+    async def get_order(self, order_id: str, request: Request) -> ResultE[Maybe[Order]]:
+        try:
+            return Success(
+                Maybe.from_optional(await run_in_threadpool(self.load_order, order_id))
+            )
+        except Exception as e:
+            return Failure(e)
+
+    async def get_order_statuses(
+        self, order_id: str, next: str | None, limit: int, request: Request
+    ) -> ResultE[Maybe[tuple[list[OrderStatus], Maybe[str]]]]:
+        try:
+            return Success(
+                Maybe.from_optional(
+                    await run_in_threadpool(
+                        self.load_order_statuses, order_id, next, limit
+                    )
+                )
+            )
+        except Exception as e:
+            return Failure(e)
+
+    def _load_matching_orders(
+        self, after: int, limit: int, order_filter: OrderFilter
+    ) -> tuple[list[Order], Maybe[str]]:
+        limit = min(limit, MAX_LIMIT)
+        if limit <= 0:
+            return [], Nothing
+        candidates = sorted(
+            seq for seq in self._candidates(order_filter) if seq > after
+        )
+        # one extra order to learn whether another page follows
+        page = list(
+            itertools.islice(self._matching(candidates, order_filter), limit + 1)
+        )
+        orders = [order for _, order in page[:limit]]
+        if len(page) > limit:
+            return orders, Some(self.paginator.encode(page[limit - 1][0], LIST_ORDERS))
+        return orders, Nothing
+
+    def _matching(
+        self, candidates: list[int], order_filter: OrderFilter
+    ) -> Iterator[tuple[int, Order]]:
+        """Yield the candidate orders matching `order_filter` exactly."""
+        conditions, params = _conditions(order_filter)
+        for start in range(0, len(candidates), CANDIDATE_BATCH):
+            batch = candidates[start : start + CANDIDATE_BATCH]
+            rows = self.connection.execute(
+                f"SELECT seq, body FROM orders WHERE seq IN ({_placeholders(batch)})"
+                f"{conditions} ORDER BY seq",
+                (*batch, *params),
+            )
+            for seq, body in rows:
+                order = Order.model_validate_json(body)
+                if order_filter.matches(order):
+                    yield seq, order
+
+    def _candidates(self, order_filter: OrderFilter) -> set[int]:
+        """The orders within the bounding box and interval of `order_filter`."""
+        with self._index_lock:
+            spatial_index, interval_index = self._refresh_indexes()
+            candidates: set[int] | None = None
+            if order_filter.search_bbox is not None:
+                candidates = set(spatial_index.search(order_filter.search_bbox))
+            if order_filter.timestamps is not None:
+                overlapping = interval_index.overlapping(*order_filter.timestamps)
+                if candidates is None:
+                    candidates = set(overlapping)
+                else:
+                    candidates.intersection_update(overlapping)
+        return candidates or set()
+
+    def _refresh_indexes(self) -> tuple[RTree[int], IntervalIndex[int]]:
+        """Return the indexes, with the orders added since they were last read."""
+        rows = self.connection.execute(
+            "SELECT seq, min_x, min_y, max_x, max_y, "
+            "json_extract(body, '$.properties.search_parameters.datetime') "
+            "FROM orders WHERE seq > ? ORDER BY seq",
+            (self._indexed_seq,),
+        ).fetchall()
+        entries = [
+            (seq, (min_x, min_y, max_x, max_y), _interval(window))
+            for seq, min_x, min_y, max_x, max_y, window in rows
+        ]
+        if self._spatial_index is None or self._interval_index is None:
+            self._spatial_index = RTree((seq, bbox) for seq, bbox, _ in entries)
+            self._interval_index = IntervalIndex(
+                (seq, interval) for seq, _, interval in entries
+            )
+        else:
+            for seq, bbox, interval in entries:
+                self._spatial_index.insert(seq, bbox)
+                self._interval_index.insert(seq, interval)
+        if rows:
+            self._indexed_seq = rows[-1][0]
+        return self._spatial_index, self._interval_index
+
+    def _upsert_order(self, order: Order) -> int:
+        """Insert or replace `order`, returning its sequence number."""
+        (seq,) = self.connection.execute(
+            f"{UPSERT_ORDER} RETURNING seq",
+            (
+                order.id,
+                order.properties.product_id,
+                order.properties.status.status_code,
+                order.properties.created.timestamp(),
+                *bounds(order.geometry),
+                order.model_dump_json(),
+            ),
+        ).fetchone()
+        return seq
+
+    def _index_order(self, seq: int, order: Order) -> None:
+        """Update the in-process indexes with `order`, once they are loaded."""
+        if self._spatial_index is None or self._interval_index is None:
+            return
+        start, end = order.properties.search_parameters.datetime
+        with self._index_lock:
+            self._spatial_index.insert(seq, bounds(order.geometry))
+            self._interval_index.insert(seq, (start.timestamp(), end.timestamp()))
+
+    def _has_order(self, order_id: str) -> bool:
+        row = self.connection.execute(
+            "SELECT 1 FROM orders WHERE id = ? UNION ALL "
+            "SELECT 1 FROM order_statuses WHERE order_id = ? LIMIT 1",
+            (order_id, order_id),
+        ).fetchone()
+        return row is not None
+
+    def _decode(self, next: str | None, scope: str) -> int:
+        if not next:
+            return 0
+        after = self.paginator.decode(next, scope)
+        if not isinstance(after, int):
+            raise InvalidPaginationToken("Malformed pagination token")
+        return after
+
+    def _page(self, query: str, params: tuple, limit: int) -> list[tuple[int, str]]:
+        limit = min(limit, MAX_LIMIT)
+        if limit <= 0:
+            return []
+        # fetch one extra row to learn whether another page follows
+        return self.connection.execute(query, (*params, limit + 1)).fetchall()
+
+    def _result[T: (Order, OrderStatus)](
+        self, rows: list[tuple[int, str]], limit: int, scope: str, model: type[T]
+    ) -> tuple[list[T], Maybe[str]]:
+        limit = min(limit, MAX_LIMIT)
+        page = [model.model_validate_json(body) for _, body in rows[:limit]]
+        if len(rows) > limit:
+            return page, Some(self.paginator.encode(rows[limit - 1][0], scope))
+        return page, Nothing
+
+
+def _conditions(order_filter: OrderFilter) -> tuple[str, tuple[Any, ...]]:
+    """
+    The SQL conditions selecting the status, product, and creation time of
+    `order_filter` from the indexed columns of `orders`, and their parameters.
+    """
+    conditions: list[str] = []
+    params: list[Any] = []
+    for column, values in (
+        ("status_code", order_filter.status),
+        ("product_id", order_filter.product_id),
+    ):
+        if values is not None:
+            conditions.append(f"{column} IN ({_placeholders(values)})")
+            params.extend(sorted(values))
+    if order_filter.created_timestamps is not None:
+        start, end = order_filter.created_timestamps
+        if start > -math.inf:
+            conditions.append("created >= ?")
+            params.append(start)
+        if end < math.inf:
+            conditions.append("created <= ?")
+            params.append(end)
+    return "".join(f" AND {condition}" for condition in conditions), tuple(params)
+
+
+def _placeholders(values: Collection[Any]) -> str:
+    return ",".join("?" * len(values))
+
+
+def _interval(value: str) -> Interval:
+    """The timestamps of a serialized `DatetimeInterval`."""
+    start, end = value.split("/", 1)
+    return (
+        datetime.fromisoformat(start).timestamp(),
+        datetime.fromisoformat(end).timestamp(),
+    )
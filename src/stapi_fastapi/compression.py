@@ -0,0 +1,438 @@
+"""
+Negotiated response compression.
+
+`CompressionMiddleware` compresses responses with the encoding the request's
+`Accept-Encoding` header prefers: zstd and brotli when the `zstandard` and
+`brotli` packages are installed (or `compression.zstd` on Python 3.14), and
+gzip. Responses smaller than a minimum size, of media types that do not
+compress, or already encoded, such as the precompressed OpenAPI document, are
+sent as they are. Streamed responses are compressed chunk by chunk as they are
+sent, flushing each chunk so that clients can decode it right away.
+
+The minimum size and the compression levels are configured per route name or
+route name pattern with a `RouteCompression`. Catalog and schema responses are
+the same for every request, so by default their routes compress at the
+highest levels and keep the compressed bodies in an LRU cache keyed by a
+digest of the uncompressed body: each is compressed once instead of on every
+request. Bodies compressed above the default level of their encoding, or larger
+than `OFFLOAD_SIZE`, are compressed in the threadpool, off the event loop.
+"""
+
+import hashlib
+import zlib
+from collections import OrderedDict
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass, field
+from fnmatch import fnmatchcase
+from functools import lru_cache
+from typing import Protocol
+
+from fastapi import FastAPI
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from stapi_fastapi.metrics import CACHE_REQUESTS
+from stapi_fastapi.routers.route_names import (
+    CONFORMANCE,
+    GET_CONSTRAINTS,
+    GET_ORDER_PARAMETERS,
+    GET_PRODUCT,
+    LIST_PRODUCTS,
+    ROOT,
+)
+
+# bodies larger than this are compressed in the threadpool, off the event loop,
+# as are those compressed above the default level of their encoding
+OFFLOAD_SIZE = 256 * 1024
+
+COMPRESSIBLE_TYPES = frozenset(
+    {
+        "application/json",
+        "application/geo+json",
+        "application/geo+json-seq",
+        "application/x-ndjson",
+        "application/vnd.msgpack",
+        "application/vnd.apache.arrow.stream",
+        "application/javascript",
+        "application/xml",
+        "image/svg+xml",
+    }
+)
+
+
+class Compressor(Protocol):
+    def compress(self, data: bytes) -> bytes:
+        """Compress `data`, returning everything that can be decoded so far."""
+        ...
+
+    def finish(self) -> bytes: ...
+
+
+@dataclass(frozen=True)
+class Encoding:
+    """A content coding, compressing whole bodies or streams at a level."""
+
+    name: str
+    compress: Callable[[bytes, int], bytes]
+    compressor: Callable[[int], Compressor]
+    default_level: int
+    max_level: int
+
+
+class _GzipCompressor:
+    def __init__(self, level: int) -> None:
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(
+            zlib.Z_SYNC_FLUSH
+        )
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+# in order of preference
+ENCODINGS: dict[str, Encoding] = {}
+
+try:
+    from compression import zstd
+
+    class _ZstdCompressor:
+        def __init__(self, level: int) -> None:
+            self._compressor = zstd.ZstdCompressor(level)
+
+        def compress(self, data: bytes) -> bytes:
+            return self._compressor.compress(data, zstd.ZstdCompressor.FLUSH_BLOCK)
+
+        def finish(self) -> bytes:
+            return self._compressor.flush()
+
+    ENCODINGS["zstd"] = Encoding(
+        "zstd", lambda data, level: zstd.compress(data, level), _ZstdCompressor, 3, 19
+    )
+except ImportError:
+    try:
+        import zstandard
+
+        class _ZstandardCompressor:
+            def __init__(self, level: int) -> None:
+                self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+            def compress(self, data: bytes) -> bytes:
+                return self._compressor.compress(data) + self._compressor.flush(
+                    zstandard.COMPRESSOBJ_FLUSH_BLOCK
+                )
+
+            def finish(self) -> bytes:
+                return self._compressor.flush()
+
+        ENCODINGS["zstd"] = Encoding(
+            "zstd",
+            lambda data, level: zstandard.ZstdCompressor(level=level).compress(data),
+            _ZstandardCompressor,
+            3,
+            19,
+        )
+    except ImportError:
+        pass
+
+try:
+    import brotli
+
+    class _BrotliCompressor:
+        def __init__(self, level: int) -> None:
+            self._compressor = brotli.Compressor(quality=level)
+
+        def compress(self, data: bytes) -> bytes:
+            return self._compressor.process(data) + self._compressor.flush()
+
+        def finish(self) -> bytes:
+            return self._compressor.finish()
+
+    ENCODINGS["br"] = Encoding(
+        "br",
+        lambda data, level: brotli.compress(data, quality=level),
+        _BrotliCompressor,
+        4,
+        11,
+    )
+except ImportError:
+    pass
+
+ENCODINGS["gzip"] = Encoding(
+    "gzip",
+    lambda data, level: zlib.compress(data, level, wbits=31),
+    _GzipCompressor,
+    6,
+    9,
+)
+
+
+@lru_cache(maxsize=256)
+def negotiate_encoding(accept_encoding: str, available: tuple[str, ...]) -> str | None:
+    """
+    Return the encoding of `available`, in order of preference, with the highest
+    quality in the `Accept-Encoding` header `accept_encoding`, or None if none
+    is acceptable.
+    """
+    qualities: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, *params = (part.strip() for part in item.split(";"))
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding:
+            qualities[coding.lower()] = quality
+
+    wildcard = qualities.get("*", 0.0)
+    best, best_quality = None, 0.0
+    for coding in available:
+        quality = qualities.get(coding, wildcard)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+@dataclass(frozen=True)
+class RouteCompression:
+    """
+    How the responses of a route are compressed.
+
+    Args:
+        minimum_size (int): Responses smaller than this many bytes are not
+            compressed.
+        levels (Mapping[str, int]): Compression levels by encoding, for
+            encodings not listed their default level.
+        cache (bool): Whether to cache compressed bodies. Only worth it for
+            responses that are the same for many requests.
+    """
+
+    minimum_size: int = 1024
+    levels: Mapping[str, int] = field(default_factory=dict)
+    cache: bool = False
+
+    def level(self, encoding: Encoding) -> int:
+        return self.levels.get(encoding.name, encoding.default_level)
+
+
+CATALOG_COMPRESSION = RouteCompression(
+    minimum_size=256,
+    levels={name: encoding.max_level for name, encoding in ENCODINGS.items()},
+    cache=True,
+)
+
+DEFAULT_ROUTES: dict[str, RouteCompression] = {
+    f"*:{name}": CATALOG_COMPRESSION
+    for name in (
+        ROOT,
+        CONFORMANCE,
+        LIST_PRODUCTS,
+        GET_PRODUCT,
+        GET_CONSTRAINTS,
+        GET_ORDER_PARAMETERS,
+    )
+}
+
+
+def compressible(content_type: str | None) -> bool:
+    if not content_type:
+        return False
+    media_type = content_type.partition(";")[0].strip().lower()
+    return (
+        media_type in COMPRESSIBLE_TYPES
+        or media_type.startswith("text/")
+        or media_type.endswith(("+json", "+xml"))
+    )
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses with the encoding negotiated for each request.
+
+    Args:
+        app (ASGIApp): The application to wrap.
+        default (RouteCompression): How responses of routes not matched by
+            `routes` are compressed.
+        routes (Mapping[str, RouteCompression]): How responses are compressed
+            by route name, or `fnmatch` pattern of route names. The first
+            matching pattern applies.
+        cache_size (int): The number of compressed bodies cached.
+        max_cached_size (int): The size in bytes of the largest body cached.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        default: RouteCompression = RouteCompression(),
+        routes: Mapping[str, RouteCompression] = DEFAULT_ROUTES,
+        cache_size: int = 256,
+        max_cached_size: int = 1024 * 1024,
+    ) -> None:
+        self.app = app
+        self.default = default
+        self.routes = routes
+        self.cache_size = cache_size
+        self.max_cached_size = max_cached_size
+        self._route_compression: dict[str | None, RouteCompression] = {}
+        # keyed by a digest of the body, so that cached bodies are not retained
+        self._cache: OrderedDict[tuple[str, int, bytes], bytes] = OrderedDict()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept_encoding = Headers(scope=scope).get("accept-encoding", "")
+        name = negotiate_encoding(accept_encoding, tuple(ENCODINGS))
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressingResponder(self, scope, ENCODINGS[name], send)
+        await self.app(scope, receive, responder.send)
+
+    def route_compression(self, scope: Scope) -> RouteCompression:
+        name = getattr(scope.get("route"), "name", None)
+        compression = self._route_compression.get(name)
+        if compression is None:
+            compression = next(
+                (
+                    compression
+                    for pattern, compression in self.routes.items()
+                    if name is not None and fnmatchcase(name, pattern)
+                ),
+                self.default,
+            )
+            self._route_compression[name] = compression
+        return compression
+
+    async def compress(
+        self, encoding: Encoding, level: int, body: bytes, cache: bool
+    ) -> bytes:
+        """Compress a whole `body`, from the cache if `cache`."""
+        cache = cache and len(body) <= self.max_cached_size
+        if cache:
+            key = (encoding.name, level, hashlib.blake2b(body).digest())
+            if (compressed := self._cache.get(key)) is not None:
+                self._cache.move_to_end(key)
+                CACHE_REQUESTS.inc(cache="compression", result="hit")
+                return compressed
+            CACHE_REQUESTS.inc(cache="compression", result="miss")
+
+        if len(body) > OFFLOAD_SIZE or level > encoding.default_level:
+            compressed = await run_in_threadpool(encoding.compress, body, level)
+        else:
+            compressed = encoding.compress(body, level)
+
+        if cache:
+            self._cache[key] = compressed
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return compressed
+
+
+class _CompressingResponder:
+    """Compresses the response to one request as it is sent."""
+
+    def __init__(
+        self,
+        middleware: CompressionMiddleware,
+        scope: Scope,
+        encoding: Encoding,
+        send: Send,
+    ) -> None:
+        self.middleware = middleware
+        self.scope = scope
+        self.encoding = encoding
+        self._send = send
+        self.start: Message | None = None
+        self.compressor: Compressor | None = None
+        self.passthrough = False
+
+    async def send(self, message: Message) -> None:
+        if self.passthrough:
+            await self._send(message)
+        elif message["type"] == "http.response.start":
+            # held back until the first body shows whether to compress
+            self.start = message
+        elif message["type"] != "http.response.body":
+            await self._send(message)
+        elif self.compressor is not None:
+            body = self.compressor.compress(message.get("body", b""))
+            if not message.get("more_body", False):
+                body += self.compressor.finish()
+            await self._send({**message, "body": body})
+        else:
+            await self._send_first(message)
+
+    async def _send_first(self, message: Message) -> None:
+        assert self.start is not None
+        headers = MutableHeaders(scope=self.start)
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        compression = self.middleware.route_compression(self.scope)
+
+        if not self._compresses(headers, body, more_body, compression):
+            self.passthrough = True
+            await self._send(self.start)
+            await self._send(message)
+            return
+
+        level = compression.level(self.encoding)
+        headers["Content-Encoding"] = self.encoding.name
+        headers.add_vary_header("Accept-Encoding")
+        if (etag := headers.get("etag")) and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
+
+        if more_body:
+            del headers["Content-Length"]
+            self.compressor = self.encoding.compressor(level)
+            body = self.compressor.compress(body)
+        else:
+            body = await self.middleware.compress(
+                self.encoding, level, body, compression.cache
+            )
+            headers["Content-Length"] = str(len(body))
+        await self._send(self.start)
+        await self._send({**message, "body": body})
+
+    def _compresses(
+        self,
+        headers: MutableHeaders,
+        body: bytes,
+        more_body: bool,
+        compression: RouteCompression,
+    ) -> bool:
+        if (
+            self.start is None
+            or self.start["status"] < 200
+            or self.start["status"] in (204, 304)
+            or "content-encoding" in headers
+            or not compressible(headers.get("content-type"))
+        ):
+            return False
+        size = len(body) if not more_body else headers.get("content-length")
+        return size is None or int(size) >= compression.minimum_size
+
+
+def install_compression(
+    app: FastAPI,
+    default: RouteCompression = RouteCompression(),
+    routes: Mapping[str, RouteCompression] = DEFAULT_ROUTES,
+    cache_size: int = 256,
+) -> None:
+    """
+    Compress the responses of `app` with the encodings its clients accept.
+
+    Install it last, so that it compresses the responses of all other
+    middleware.
+    """
+    app.add_middleware(
+        CompressionMiddleware, default=default, routes=routes, cache_size=cache_size
+    )
@@ -0,0 +1,143 @@
+"""
+Sparse fieldsets of features, in the style of the STAC API fields extension.
+
+The `fields` query parameter of collection endpoints is a comma separated list
+of dotted paths of feature members, such as `id,properties.datetime,-links`.
+Paths prefixed with `-` are excluded, all others, optionally prefixed with `+`,
+are included. With only exclusions every other member is returned; with any
+inclusion only those members, and the feature's `type`, are. A path that is
+both included and excluded is excluded.
+
+Features are serialized with the selected members only. Backends can call
+`requested_fields(request)` to skip building members that will not be
+returned, such as the links of each opportunity.
+"""
+
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Any
+
+from fastapi import HTTPException, Query, Request, status
+
+# members of a feature returned whatever fields are requested
+ALWAYS_INCLUDED = frozenset({"type"})
+
+type FieldTree = dict[str, Any]
+
+
+def _tree(paths: frozenset[str]) -> FieldTree:
+    """Nest dotted `paths` as the include or exclude argument of pydantic."""
+    tree: FieldTree = {}
+    for path in sorted(paths, key=len):
+        node = tree
+        *parents, name = path.split(".")
+        for parent in parents:
+            child = node.setdefault(parent, {})
+            if child is True:
+                # a parent path selects all of it already
+                break
+            node = child
+        else:
+            node[name] = True
+    return tree
+
+
+@dataclass(frozen=True)
+class Fields:
+    """The dotted paths of the members of features to include and exclude."""
+
+    include: frozenset[str] = frozenset()
+    exclude: frozenset[str] = frozenset()
+
+    @cached_property
+    def include_tree(self) -> FieldTree | None:
+        """The `include` argument selecting the fields when serializing a model."""
+        return _tree(self.include | ALWAYS_INCLUDED) if self.include else None
+
+    @cached_property
+    def exclude_tree(self) -> FieldTree | None:
+        """The `exclude` argument selecting the fields when serializing a model."""
+        return _tree(self.exclude) or None
+
+    @classmethod
+    def parse(cls, value: str) -> "Fields":
+        """
+        Parse a `fields` parameter.
+
+        Raises:
+            ValueError: If a path is empty or has an empty segment.
+        """
+        include: set[str] = set()
+        exclude: set[str] = set()
+        for item in value.split(","):
+            item = item.strip()
+            paths = exclude if item.startswith("-") else include
+            path = item.removeprefix("-").removeprefix("+")
+            if not path or "" in path.split("."):
+                raise ValueError(f"Invalid field '{item}'")
+            paths.add(path)
+        return cls(frozenset(include), frozenset(exclude))
+
+    def member(self, name: str) -> "Fields":
+        """The fields of the member `name` of a feature, such as its properties."""
+        prefix = f"{name}."
+        return Fields(
+            frozenset(
+                path.removeprefix(prefix)
+                for path in self.include
+                if path.startswith(prefix)
+            ),
+            frozenset(
+                path.removeprefix(prefix)
+                for path in self.exclude
+                if path.startswith(prefix)
+            ),
+        )
+
+    def includes(self, path: str) -> bool:
+        """Whether the member at the dotted `path`, or part of it, is returned."""
+        if any(_within(path, excluded) for excluded in self.exclude):
+            return False
+        if not self.include or path in ALWAYS_INCLUDED:
+            return True
+        return any(
+            _within(path, included) or _within(included, path)
+            for included in self.include
+        )
+
+
+ALL_FIELDS = Fields()
+
+
+def _within(path: str, parent: str) -> bool:
+    return path == parent or path.startswith(f"{parent}.")
+
+
+def get_fields(
+    request: Request,
+    fields: str | None = Query(
+        None,
+        description=(
+            "Comma separated dotted paths of the feature members to return, "
+            "or with a `-` prefix to leave out, e.g. "
+            "`id,properties.datetime,-links`."
+        ),
+    ),
+) -> Fields:
+    """Parse the `fields` parameter and note it for the backends of the request."""
+    if fields is None:
+        selected = ALL_FIELDS
+    else:
+        try:
+            selected = Fields.parse(fields)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)
+            ) from None
+    request.state.fields = selected
+    return selected
+
+
+def requested_fields(request: Request) -> Fields:
+    """Return the fields of the features requested by `request`."""
+    return getattr(request.state, "fields", ALL_FIELDS)
@@ -0,0 +1,251 @@
+"""
+Filters of the orders listed by `GET /orders`.
+
+The `bbox` query parameter selects the orders whose geometry intersects a
+`min_x,min_y,max_x,max_y` box, `intersects` those whose geometry intersects
+a GeoJSON geometry, and `datetime` those whose search datetime interval overlaps
+a datetime or an interval of them. `status` and `product_id` select the orders
+with one of a comma separated list of status codes or products, and `created`
+those created at a datetime or within an interval of them.
+
+Backends are passed the `OrderFilter` of the request, and should look up
+candidates in their own indexes, for example by bounding box or interval with
+`stapi_fastapi.indexes.RTree` and `IntervalIndex`, then test them exactly with
+`matches`.
+"""
+
+import math
+from dataclasses import dataclass
+from datetime import datetime
+from functools import cached_property
+
+from fastapi import HTTPException, Query, status
+from geojson_pydantic import Polygon
+from geojson_pydantic.geometries import Geometry
+from pydantic import TypeAdapter, ValidationError
+
+from stapi_fastapi.geometry import BBox, bbox_intersects, bounds, intersects
+from stapi_fastapi.models.order import Order, OrderProperties, OrderStatusCode
+from stapi_fastapi.types.datetime_interval import DatetimeInterval
+
+_geometry_adapter: TypeAdapter[Geometry] = TypeAdapter(Geometry)
+
+# a start and an end, either of which may be open
+type DatetimeRange = tuple[datetime | None, datetime | None]
+
+
+@dataclass(frozen=True)
+class OrderFilter:
+    """The orders to list, all of them unless narrowed down."""
+
+    bbox: BBox | None = None
+    intersects: Geometry | None = None
+    datetime: DatetimeRange | None = None
+    status: frozenset[OrderStatusCode] | None = None
+    product_id: frozenset[str] | None = None
+    created: DatetimeRange | None = None
+
+    @property
+    def spatial(self) -> bool:
+        """Whether orders are filtered by their geometry."""
+        return self.bbox is not None or self.intersects is not None
+
+    @cached_property
+    def search_bbox(self) -> BBox | None:
+        """The box the bounds of matching orders intersect, if filtered by geometry."""
+        if self.intersects is None:
+            return self.bbox
+        box = bounds(self.intersects)
+        if self.bbox is None or not bbox_intersects(box, self.bbox):
+            return box
+        return (
+            max(box[0], self.bbox[0]),
+            max(box[1], self.bbox[1]),
+            min(box[2], self.bbox[2]),
+            min(box[3], self.bbox[3]),
+        )
+
+    @cached_property
+    def timestamps(self) -> tuple[float, float] | None:
+        """The `datetime` range as POSIX timestamps, open ends as infinities."""
+        return None if self.datetime is None else _timestamps(self.datetime)
+
+    @cached_property
+    def created_timestamps(self) -> tuple[float, float] | None:
+        """The `created` range as POSIX timestamps, open ends as infinities."""
+        return None if self.created is None else _timestamps(self.created)
+
+    @cached_property
+    def _bbox_polygon(self) -> Polygon | None:
+        return None if self.bbox is None else Polygon.from_bounds(*self.bbox)
+
+    def matches_geometry(self, geometry: Geometry) -> bool:
+        """Whether `geometry` intersects the box and geometry of the filter."""
+        return (
+            self._bbox_polygon is None or intersects(geometry, self._bbox_polygon)
+        ) and (self.intersects is None or intersects(geometry, self.intersects))
+
+    def matches_datetime(self, interval: DatetimeInterval) -> bool:
+        """Whether the datetime `interval` overlaps the range of the filter."""
+        if self.timestamps is None:
+            return True
+        start, end = self.timestamps
+        return interval[0].timestamp() <= end and interval[1].timestamp() >= start
+
+    def matches_properties(self, properties: OrderProperties) -> bool:
+        """Whether the status, product, and creation time of an order match."""
+        if self.status is not None and properties.status.status_code not in self.status:
+            return False
+        if self.product_id is not None and properties.product_id not in self.product_id:
+            return False
+        if self.created_timestamps is None:
+            return True
+        start, end = self.created_timestamps
+        return start <= properties.created.timestamp() <= end
+
+    def matches(self, order: Order) -> bool:
+        """Whether `order` is selected by the filter."""
+        return (
+            self.matches_properties(order.properties)
+            and self.matches_datetime(order.properties.search_parameters.datetime)
+            and self.matches_geometry(order.geometry)
+        )
+
+
+ALL_ORDERS = OrderFilter()
+
+
+def _timestamps(value: DatetimeRange) -> tuple[float, float]:
+    start, end = value
+    return (
+        -math.inf if start is None else start.timestamp(),
+        math.inf if end is None else end.timestamp(),
+    )
+
+
+def parse_bbox(value: str) -> BBox:
+    """
+    Parse a `min_x,min_y,max_x,max_y` box, or a 3D box with minimum and maximum
+    heights after each of the corners, whose heights are ignored.
+
+    Raises:
+        ValueError: If the box is malformed or its minimum exceeds its maximum.
+    """
+    try:
+        values = [float(v) for v in value.split(",")]
+    except ValueError:
+        raise ValueError(f"Invalid bbox '{value}'") from None
+    match values:
+        case [min_x, min_y, max_x, max_y] | [min_x, min_y, _, max_x, max_y, _]:
+            pass
+        case _:
+            raise ValueError("bbox must have 4 or 6 numbers")
+    if min_x > max_x or min_y > max_y:
+        raise ValueError("bbox minimum must not exceed its maximum")
+    return min_x, min_y, max_x, max_y
+
+
+def parse_datetime(value: str) -> DatetimeRange:
+    """
+    Parse an RFC 3339 datetime, or an interval of two separated by `/` with
+    either end left open as `..` or empty.
+
+    Raises:
+        ValueError: If a datetime is malformed or has no timezone, or the
+            interval is open at both ends or ends before it starts.
+    """
+    start, separator, end = value.partition("/")
+    if not separator:
+        instant = _parse_instant(start)
+        return instant, instant
+    ends = tuple(
+        None if part in ("", "..") else _parse_instant(part) for part in (start, end)
+    )
+    match ends:
+        case (None, None):
+            raise ValueError("datetime interval must have a start or an end")
+        case (datetime() as first, datetime() as last) if last < first:
+            raise ValueError("datetime interval ends before it starts")
+    return ends[0], ends[1]
+
+
+def parse_list(value: str) -> frozenset[str]:
+    """Parse a comma separated list of values."""
+    return frozenset(item for item in map(str.strip, value.split(",")) if item)
+
+
+def _parse_instant(value: str) -> datetime:
+    try:
+        instant = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid datetime '{value}'") from None
+    if instant.tzinfo is None:
+        raise ValueError(f"datetime '{value}' must have a timezone")
+    return instant
+
+
+def get_order_filter(
+    bbox: str | None = Query(
+        None,
+        description=(
+            "Only orders whose geometry intersects the box "
+            "`min_x,min_y,max_x,max_y`, e.g. `13.0,52.3,13.8,52.7`."
+        ),
+    ),
+    intersects: str | None = Query(
+        None,
+        description="Only orders whose geometry intersects this GeoJSON geometry.",
+    ),
+    datetime: str | None = Query(
+        None,
+        description=(
+            "Only orders whose datetime interval overlaps this datetime or "
+            "interval, e.g. `2025-01-01T00:00:00Z/..`."
+        ),
+    ),
+    status_codes: str | None = Query(
+        None,
+        alias="status",
+        description=(
+            "Only orders with one of these comma separated status codes, "
+            "e.g. `accepted,processing`."
+        ),
+    ),
+    product_id: str | None = Query(
+        None, description="Only orders of one of these comma separated products."
+    ),
+    created: str | None = Query(
+        None,
+        description=(
+            "Only orders created at this datetime or within this interval, "
+            "e.g. `2025-01-01T00:00:00Z/..`."
+        ),
+    ),
+) -> OrderFilter:
+    """Parse the filter parameters of `GET /orders`."""
+    try:
+        return OrderFilter(
+            bbox=None if bbox is None else parse_bbox(bbox),
+            intersects=(
+                None
+                if intersects is None
+                else _geometry_adapter.validate_json(intersects)
+            ),
+            datetime=None if datetime is None else parse_datetime(datetime),
+            status=(
+                None
+                if status_codes is None
+                else frozenset(map(OrderStatusCode, parse_list(status_codes)))
+            ),
+            product_id=None if product_id is None else parse_list(product_id),
+            created=None if created is None else parse_datetime(created),
+        )
+    except ValidationError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="intersects must be a GeoJSON geometry",
+        ) from None
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)
+        ) from None
@@ -0,0 +1,449 @@
+"""
+Content negotiation and streaming of feature collections.
+
+Collections of opportunities and orders are written feature by feature, in the
+format the `Accept` header of the request prefers among the registered ones:
+
+- `application/geo+json`, the default: a GeoJSON FeatureCollection, with its
+  links and other members after the features
+- `application/geo+json-seq`: a GeoJSON text sequence of features (RFC 8142)
+- `application/x-ndjson`: newline delimited JSON features
+- `application/vnd.msgpack`: a sequence of MessagePack features, with the
+  `msgpack` package
+- `application/vnd.apache.arrow.stream` and `application/vnd.apache.parquet`:
+  an Arrow IPC stream or a GeoParquet file, with the `pyarrow` package, of one
+  row per feature with its id, its geometry as WKB, and a column per property
+
+The binary formats are written from the models of the features, without going
+through their JSON representation. Formats whose package is not installed are
+not registered, so requests for them get the default.
+
+The sequences and tables have no place for the links of the collection, which
+are sent in a `Link` header instead. Output is buffered into chunks of `CHUNK_SIZE` bytes,
+so that a small collection is still sent in one piece, while the first chunk of
+a large one is sent as soon as it is written.
+"""
+
+import io
+import itertools
+import json
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from dataclasses import dataclass
+from datetime import date, datetime
+from enum import Enum
+from functools import lru_cache, partial
+from typing import Any
+
+from fastapi import Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from pydantic_core import to_json
+from starlette.concurrency import run_in_threadpool
+
+from stapi_fastapi.constants import TYPE_GEOJSON
+from stapi_fastapi.fields import ALL_FIELDS, Fields
+from stapi_fastapi.geometry import GeometryReducer, wkb
+from stapi_fastapi.models.shared import Link
+from stapi_fastapi.timing import timed
+
+TYPE_GEOJSON_SEQ = "application/geo+json-seq"
+TYPE_NDJSON = "application/x-ndjson"
+TYPE_MSGPACK = "application/vnd.msgpack"
+TYPE_ARROW_STREAM = "application/vnd.apache.arrow.stream"
+TYPE_PARQUET = "application/vnd.apache.parquet"
+
+CHUNK_SIZE = 64 * 1024
+# features per record batch of Arrow streams and row group of Parquet files
+BATCH_SIZE = 1024
+
+type FeatureWriter = Callable[
+    [Iterable[BaseModel], list[Link], Mapping[str, Any], Fields], Iterator[bytes]
+]
+"""
+Writes the selected fields of the features of a collection, followed by its
+links and other members, as parts of the response body.
+"""
+
+
+@dataclass(frozen=True)
+class Format:
+    media_type: str
+    write: FeatureWriter
+    # whether the links of the collection are sent in a `Link` header
+    links_in_header: bool = False
+
+
+FORMATS: dict[str, Format] = {}
+
+
+def register_format(format: Format, *aliases: str) -> None:
+    """Serve `format` to requests accepting its media type or one of `aliases`."""
+    for media_type in (format.media_type, *aliases):
+        FORMATS[media_type] = format
+    negotiate.cache_clear()
+
+
+@lru_cache(maxsize=256)
+def negotiate(accept: str | None) -> Format:
+    """
+    Return the registered format preferred by the `Accept` header `accept`, the
+    GeoJSON default if it accepts no registered format.
+    """
+    default = FORMATS[TYPE_GEOJSON]
+    if not accept:
+        return default
+
+    best, best_quality = default, 0.0
+    for accepted in accept.split(","):
+        media_type, *params = (part.strip() for part in accepted.split(";"))
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        media_type = media_type.lower()
+        format = default if media_type in ("*/*", "application/*") else None
+        format = FORMATS.get(media_type, format)
+        if format is not None and quality > best_quality:
+            best, best_quality = format, quality
+    return best
+
+
+def write_feature_collection(
+    features: Iterable[BaseModel],
+    links: list[Link],
+    members: Mapping[str, Any],
+    fields: Fields,
+) -> Iterator[bytes]:
+    yield b'{"type":"FeatureCollection","features":['
+    separator = b""
+    for feature in features:
+        yield separator
+        yield to_json(
+            feature,
+            by_alias=True,
+            include=fields.include_tree,
+            exclude=fields.exclude_tree,
+        )
+        separator = b","
+    # the remaining members, without the opening brace of their object
+    yield b"],"
+    yield to_json({"links": links, **members}, by_alias=True)[1:]
+
+
+def write_geojson_seq(
+    features: Iterable[BaseModel],
+    links: list[Link],
+    members: Mapping[str, Any],
+    fields: Fields,
+) -> Iterator[bytes]:
+    for feature in features:
+        yield b"\x1e"
+        yield to_json(
+            feature,
+            by_alias=True,
+            include=fields.include_tree,
+            exclude=fields.exclude_tree,
+        )
+        yield b"\n"
+
+
+def write_ndjson(
+    features: Iterable[BaseModel],
+    links: list[Link],
+    members: Mapping[str, Any],
+    fields: Fields,
+) -> Iterator[bytes]:
+    for feature in features:
+        yield to_json(
+            feature,
+            by_alias=True,
+            include=fields.include_tree,
+            exclude=fields.exclude_tree,
+        )
+        yield b"\n"
+
+
+register_format(Format(TYPE_GEOJSON, write_feature_collection), "application/json")
+register_format(
+    Format(TYPE_GEOJSON_SEQ, write_geojson_seq, links_in_header=True),
+)
+register_format(
+    Format(TYPE_NDJSON, write_ndjson, links_in_header=True),
+    "application/ndjson",
+    "application/jsonl",
+)
+
+
+def feature_row(feature: BaseModel, fields: Fields = ALL_FIELDS) -> dict[str, Any]:
+    """
+    Return the selected `fields` of `feature` as a table row: its id, its
+    geometry as WKB, and its properties. Properties that are objects or arrays
+    are JSON encoded.
+    """
+    row: dict[str, Any] = {}
+    if fields.includes("id"):
+        row["id"] = getattr(feature, "id", None)
+    if fields.includes("geometry"):
+        geometry = getattr(feature, "geometry", None)
+        row["geometry"] = None if geometry is None else wkb(geometry)
+    properties = getattr(feature, "properties", None)
+    if not fields.includes("properties"):
+        properties = None
+    elif isinstance(properties, BaseModel):
+        selected = fields.member("properties")
+        properties = properties.model_dump(
+            by_alias=True,
+            include=selected.include_tree,
+            exclude=selected.exclude_tree,
+        )
+    for key, value in (properties or {}).items():
+        if isinstance(value, Enum):
+            value = value.value
+        elif not isinstance(value, str | int | float | datetime | date | None):
+            value = to_json(value).decode()
+        row.setdefault(key, value)
+    return row
+
+
+class _Sink(io.RawIOBase):
+    """A file collecting what is written to it until it is taken."""
+
+    def __init__(self) -> None:
+        self._parts: list[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def take(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+try:
+    import msgpack
+
+    def _msgpack_default(value: Any) -> Any:
+        # values pydantic leaves as objects, such as URLs
+        return value.value if isinstance(value, Enum) else str(value)
+
+    def write_msgpack(
+        features: Iterable[BaseModel],
+        links: list[Link],
+        members: Mapping[str, Any],
+        fields: Fields,
+    ) -> Iterator[bytes]:
+        packer = msgpack.Packer(datetime=True, default=_msgpack_default)
+        for feature in features:
+            yield packer.pack(
+                feature.model_dump(
+                    by_alias=True,
+                    include=fields.include_tree,
+                    exclude=fields.exclude_tree,
+                )
+            )
+
+    register_format(
+        Format(TYPE_MSGPACK, write_msgpack, links_in_header=True),
+        "application/msgpack",
+        "application/x-msgpack",
+    )
+except ImportError:
+    pass
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # GeoParquet 1.0 metadata for the WKB geometry column
+    GEO_METADATA = json.dumps(
+        {
+            "version": "1.0.0",
+            "primary_column": "geometry",
+            "columns": {"geometry": {"encoding": "WKB", "geometry_types": []}},
+        }
+    ).encode()
+    EMPTY_SCHEMA = pa.schema([("id", pa.string()), ("geometry", pa.binary())])
+
+    def _table(features: Iterable[BaseModel], fields: Fields) -> pa.Table:
+        """
+        The table of `features`, converted in batches of `BATCH_SIZE` rows.
+
+        The schema is inferred from every batch and unified before anything is
+        written, since a stream cannot change its schema: a property that is
+        null throughout the first batch, or an integer in one batch and a float
+        in another, gets the type of all its values. Features that cannot be
+        converted thus fail the response before it starts.
+        """
+        tables = [
+            pa.Table.from_pylist([feature_row(feature, fields) for feature in batch])
+            for batch in itertools.batched(features, BATCH_SIZE)
+        ]
+        if not tables:
+            return EMPTY_SCHEMA.empty_table()
+        return pa.concat_tables(tables, promote_options="permissive")
+
+    def write_arrow_stream(
+        features: Iterable[BaseModel],
+        links: list[Link],
+        members: Mapping[str, Any],
+        fields: Fields,
+    ) -> Iterator[bytes]:
+        table = _table(features, fields)
+        sink = _Sink()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            for batch in table.to_batches(max_chunksize=BATCH_SIZE):
+                writer.write_batch(batch)
+                yield sink.take()
+        yield sink.take()
+
+    def write_geoparquet(
+        features: Iterable[BaseModel],
+        links: list[Link],
+        members: Mapping[str, Any],
+        fields: Fields,
+    ) -> Iterator[bytes]:
+        table = _table(features, fields)
+        sink = _Sink()
+        schema = table.schema.with_metadata({b"geo": GEO_METADATA})
+        with pq.ParquetWriter(sink, schema) as writer:
+            for batch in table.to_batches(max_chunksize=BATCH_SIZE):
+                writer.write_batch(batch)
+                yield sink.take()
+        yield sink.take()
+
+    register_format(
+        Format(TYPE_ARROW_STREAM, write_arrow_stream, links_in_header=True),
+    )
+    register_format(
+        Format(TYPE_PARQUET, write_geoparquet, links_in_header=True),
+        "application/x-parquet",
+    )
+except ImportError:
+    pass
+
+
+def chunked(parts: Iterable[bytes], size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Join `parts` into chunks of at least `size` bytes, but the last."""
+    buffer = bytearray()
+    for part in parts:
+        buffer += part
+        if len(buffer) >= size:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+def _rendered(parts: Iterable[bytes]) -> Iterator[bytes]:
+    chunks = chunked(parts)
+    while True:
+        with timed("render"):
+            chunk = next(chunks, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+def link_header(links: Iterable[Link]) -> str:
+    """Format `links` as the value of a `Link` header (RFC 8288)."""
+    values = []
+    for link in links:
+        value = f'<{link.href}>; rel="{link.rel}"'
+        for param in ("type", "title", "method"):
+            if (param_value := getattr(link, param)) is not None:
+                value += f'; {param}="{param_value}"'
+        values.append(value)
+    return ", ".join(values)
+
+
+def openapi_responses() -> dict[int | str, dict[str, Any]]:
+    """Document the registered formats as alternative content of a `200` response."""
+    content: dict[str, Any] = {format.media_type: {} for format in FORMATS.values()}
+    return {200: {"content": content}}
+
+
+def get_geometry_reducer(
+    precision: int | None = Query(
+        None,
+        ge=0,
+        le=15,
+        description="Round the coordinates of geometries to this many decimals.",
+    ),
+    simplify: float | None = Query(
+        None,
+        gt=0,
+        description=(
+            "Simplify geometries, keeping positions further than this distance, "
+            "in coordinate units, from the simplified line."
+        ),
+    ),
+) -> GeometryReducer | None:
+    if precision is None and simplify is None:
+        return None
+    return GeometryReducer(precision, simplify)
+
+
+def _validated(model: type[BaseModel], feature: BaseModel) -> BaseModel:
+    return model.model_validate(feature, from_attributes=True)
+
+
+async def feature_collection_response(
+    request: Request,
+    features: Iterable[BaseModel],
+    links: list[Link],
+    status_code: int = 200,
+    headers: Mapping[str, str] | None = None,
+    reducer: GeometryReducer | None = None,
+    fields: Fields = ALL_FIELDS,
+    model: type[BaseModel] | None = None,
+    **members: Any,
+) -> StreamingResponse:
+    """
+    Stream the selected `fields` of the collection of `features`, with `links`
+    and `members`, in the format negotiated for `request`, with their geometries
+    reduced by `reducer`.
+
+    `features` may be a generator, converting each feature as it is written.
+    Every chunk is written in the threadpool: the first before returning, the rest
+    as they are sent.
+
+    Streamed collections skip the response model of their route, so each feature
+    is validated against `model`, if given, as it is written. Instances of `model`
+    are trusted as they are; others, such as features of a less specific model, are
+    validated from their attributes. A feature failing validation fails the
+    request if it is in the first chunk, and aborts the response otherwise.
+    """
+    if model is not None:
+        features = map(partial(_validated, model), features)
+    if reducer is not None and fields.includes("geometry"):
+        features = map(reducer.feature, features)
+    format = negotiate(request.headers.get("accept"))
+    headers = {**(headers or {}), "Vary": "Accept"}
+    if format.links_in_header and links:
+        headers["Link"] = link_header(links)
+    body = _rendered(format.write(features, links, members, fields))
+    # render the first chunk before the response starts, so that it is timed with
+    # the request and a failure to render it is still an error response. It is the
+    # whole body for small collections and for the formats writing tables
+    first = await run_in_threadpool(next, body, b"")
+    return StreamingResponse(
+        itertools.chain([first], body),
+        status_code=status_code,
+        headers=headers,
+        media_type=format.media_type,
+    )
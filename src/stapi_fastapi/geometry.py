@@ -0,0 +1,441 @@
+import itertools
+import math
+import struct
+from collections.abc import Callable, Hashable, Iterator, Sequence
+from typing import Any
+
+from geojson_pydantic.geometries import (
+    Geometry,
+    GeometryCollection,
+    LineString,
+    MultiLineString,
+    MultiPoint,
+    MultiPolygon,
+    Point,
+    Polygon,
+)
+from geojson_pydantic.types import Position2D, Position3D
+from pydantic import BaseModel
+
+type BBox = tuple[float, float, float, float]
+
+
+# how deeply positions are nested in the coordinates of each geometry type
+NESTING = {
+    "Point": 0,
+    "MultiPoint": 1,
+    "LineString": 1,
+    "MultiLineString": 2,
+    "Polygon": 2,
+    "MultiPolygon": 3,
+}
+
+WKB_TYPES = {
+    "Point": 1,
+    "LineString": 2,
+    "Polygon": 3,
+    "MultiPoint": 4,
+    "MultiLineString": 5,
+    "MultiPolygon": 6,
+    "GeometryCollection": 7,
+}
+# the type of the members of each multi geometry type
+WKB_MEMBER_TYPES = {
+    "MultiPoint": "Point",
+    "MultiLineString": "LineString",
+    "MultiPolygon": "Polygon",
+}
+
+
+def positions(geometry: Geometry) -> Iterator[Sequence[float]]:
+    """Yield every position of `geometry`, including nested geometries."""
+    if isinstance(geometry, GeometryCollection):
+        for member in geometry.geometries:
+            yield from positions(member)
+    else:
+        yield from _flatten(geometry.coordinates, NESTING[geometry.type])
+
+
+def _flatten(coordinates: Any, depth: int) -> Iterator[Sequence[float]]:
+    if depth == 0:
+        yield coordinates
+    else:
+        for member in coordinates:
+            yield from _flatten(member, depth - 1)
+
+
+def bounds(geometry: Geometry) -> BBox:
+    """
+    Return the `(min_x, min_y, max_x, max_y)` bounding box of `geometry`.
+
+    Raises:
+        ValueError: If the geometry has no positions.
+    """
+    xs: list[float] = []
+    ys: list[float] = []
+    for position in positions(geometry):
+        xs.append(position[0])
+        ys.append(position[1])
+    if not xs:
+        raise ValueError("Cannot compute the bounds of an empty geometry")
+    return (min(xs), min(ys), max(xs), max(ys))
+
+
+def wkb(geometry: Geometry) -> bytes:
+    """
+    Encode `geometry` as little endian ISO well-known binary, with Z coordinates
+    if its first position has them.
+    """
+    first = next(itertools.islice(positions(geometry), 1), ())
+    dimensions = 3 if len(first) > 2 else 2
+    buffer = bytearray()
+    _write_wkb(buffer, geometry, dimensions)
+    return bytes(buffer)
+
+
+def _write_wkb(buffer: bytearray, geometry: Geometry, dimensions: int) -> None:
+    if isinstance(geometry, GeometryCollection):
+        _write_wkb_header(buffer, geometry.type, dimensions)
+        buffer += struct.pack("<I", len(geometry.geometries))
+        for member in geometry.geometries:
+            _write_wkb(buffer, member, dimensions)
+    else:
+        _write_wkb_coordinates(buffer, geometry.type, geometry.coordinates, dimensions)
+
+
+def _write_wkb_header(buffer: bytearray, type: str, dimensions: int) -> None:
+    z = 1000 if dimensions == 3 else 0
+    buffer += struct.pack("<BI", 1, WKB_TYPES[type] + z)
+
+
+def _write_wkb_coordinates(
+    buffer: bytearray, type: str, coordinates: Any, dimensions: int
+) -> None:
+    _write_wkb_header(buffer, type, dimensions)
+    if member_type := WKB_MEMBER_TYPES.get(type):
+        buffer += struct.pack("<I", len(coordinates))
+        for member in coordinates:
+            _write_wkb_coordinates(buffer, member_type, member, dimensions)
+    else:
+        _write_wkb_positions(buffer, coordinates, NESTING[type], dimensions)
+
+
+def _write_wkb_positions(
+    buffer: bytearray, coordinates: Any, depth: int, dimensions: int
+) -> None:
+    if depth == 0:
+        buffer += struct.pack(f"<{dimensions}d", *coordinates[:dimensions])
+    else:
+        buffer += struct.pack("<I", len(coordinates))
+        for member in coordinates:
+            _write_wkb_positions(buffer, member, depth - 1, dimensions)
+
+
+type Line = Sequence[Sequence[float]]
+
+
+def quantize(geometry: Geometry, precision: int) -> Geometry:
+    """
+    Round the coordinates of `geometry` to `precision` decimals, dropping the
+    positions of lines and rings that become repeats of the position before.
+    """
+
+    def quantize_position(position: Sequence[float]) -> Sequence[float]:
+        return _position([round(value, precision) for value in position])
+
+    def quantize_line(line: Line, minimum: int) -> Line:
+        rounded = [quantize_position(position) for position in line]
+        deduplicated = [
+            position
+            for i, position in enumerate(rounded)
+            if i == 0 or position != rounded[i - 1]
+        ]
+        return deduplicated if len(deduplicated) >= minimum else rounded
+
+    return _map_geometry(geometry, quantize_position, quantize_line)
+
+
+def simplify(geometry: Geometry, tolerance: float) -> Geometry:
+    """
+    Simplify the lines and rings of `geometry` with the Douglas-Peucker
+    algorithm, keeping the positions further than `tolerance` from the
+    simplified line. Lines and rings that would become too short are kept.
+    """
+
+    def simplify_line(line: Line, minimum: int) -> Line:
+        simplified = _douglas_peucker(line, tolerance)
+        return simplified if len(simplified) >= minimum else line
+
+    return _map_geometry(geometry, lambda position: position, simplify_line)
+
+
+class GeometryReducer:
+    """
+    Simplifies geometries within `tolerance` and rounds their coordinates to
+    `precision` decimals, skipping either if None.
+
+    Reductions are remembered by the coordinates of the geometry, so that a
+    geometry repeated in many features, such as the geometry of a search
+    copied into each of its opportunities, is reduced once. Use one reducer per
+    response.
+    """
+
+    def __init__(self, precision: int | None, tolerance: float | None) -> None:
+        self.precision = precision
+        self.tolerance = tolerance
+        self._reduced: dict[Hashable, Geometry] = {}
+
+    def reduce(self, geometry: Geometry) -> Geometry:
+        key = _geometry_key(geometry)
+        if (reduced := self._reduced.get(key)) is not None:
+            return reduced
+        reduced = geometry
+        if self.tolerance is not None:
+            reduced = simplify(reduced, self.tolerance)
+        if self.precision is not None:
+            reduced = quantize(reduced, self.precision)
+        self._reduced[key] = reduced
+        return reduced
+
+    def feature[F: BaseModel](self, feature: F) -> F:
+        """Return `feature` with its geometry reduced."""
+        geometry = getattr(feature, "geometry", None)
+        if geometry is None:
+            return feature
+        return feature.model_copy(update={"geometry": self.reduce(geometry)})
+
+
+def _geometry_key(geometry: Geometry) -> Hashable:
+    # models validated from the same geometry are copies of it, so geometries
+    # are told apart by value, hashing nested tuples of their positions
+    if isinstance(geometry, GeometryCollection):
+        return geometry.type, tuple(map(_geometry_key, geometry.geometries))
+    return geometry.type, _freeze(geometry.coordinates, NESTING[geometry.type])
+
+
+def _freeze(coordinates: Any, depth: int) -> Hashable:
+    if depth == 0:
+        return tuple(coordinates)
+    if depth == 1:
+        return tuple(map(tuple, coordinates))
+    return tuple(_freeze(member, depth - 1) for member in coordinates)
+
+
+def _position(values: Sequence[float]) -> Sequence[float]:
+    if len(values) == 2:
+        return Position2D(*values)
+    return Position3D(*values[:3])
+
+
+def _map_geometry(
+    geometry: Geometry,
+    map_position: Callable[[Sequence[float]], Sequence[float]],
+    map_line: Callable[[Line, int], Line],
+) -> Geometry:
+    """
+    Return `geometry` with its positions mapped by `map_position` and its lines
+    and rings by `map_line`, which is passed the fewest positions they may have.
+    """
+    update: dict[str, Any]
+    match geometry:
+        case GeometryCollection():
+            members = [
+                _map_geometry(member, map_position, map_line)
+                for member in geometry.geometries
+            ]
+            update = {"geometries": members}
+        case Point():
+            update = {"coordinates": map_position(geometry.coordinates)}
+        case MultiPoint():
+            update = {"coordinates": [map_position(p) for p in geometry.coordinates]}
+        case LineString():
+            update = {"coordinates": map_line(geometry.coordinates, 2)}
+        case MultiLineString():
+            update = {
+                "coordinates": [map_line(line, 2) for line in geometry.coordinates]
+            }
+        case Polygon():
+            update = {
+                "coordinates": [map_line(ring, 4) for ring in geometry.coordinates]
+            }
+        case MultiPolygon():
+            update = {
+                "coordinates": [
+                    [map_line(ring, 4) for ring in polygon]
+                    for polygon in geometry.coordinates
+                ]
+            }
+    return geometry.model_copy(update=update)
+
+
+def _douglas_peucker(line: Line, tolerance: float) -> Line:
+    if len(line) < 3:
+        return line
+    xs = [position[0] for position in line]
+    ys = [position[1] for position in line]
+    keep = [False] * len(line)
+    keep[0] = keep[-1] = True
+    # iterative rather than recursive, so long lines do not exceed the stack
+    spans = [(0, len(line) - 1)]
+    while spans:
+        start, end = spans.pop()
+        farthest, distance = 0, tolerance
+        for i in range(start + 1, end):
+            d = _segment_distance(xs[i], ys[i], xs[start], ys[start], xs[end], ys[end])
+            if d > distance:
+                farthest, distance = i, d
+        if farthest:
+            keep[farthest] = True
+            spans.append((start, farthest))
+            spans.append((farthest, end))
+    return [position for position, kept in zip(line, keep) if kept]
+
+
+def _segment_distance(
+    x: float, y: float, x1: float, y1: float, x2: float, y2: float
+) -> float:
+    """The distance of `(x, y)` from the segment from `(x1, y1)` to `(x2, y2)`."""
+    dx, dy = x2 - x1, y2 - y1
+    length = dx * dx + dy * dy
+    if length:
+        t = max(0.0, min(1.0, ((x - x1) * dx + (y - y1) * dy) / length))
+        x1, y1 = x1 + t * dx, y1 + t * dy
+    return math.hypot(x - x1, y - y1)
+
+
+type Segment = tuple[float, float, float, float]
+
+
+class _Parts:
+    """The points, segments, and polygons making up a geometry."""
+
+    def __init__(self, geometry: Geometry) -> None:
+        self.points: list[tuple[float, float]] = []
+        self.segments: list[Segment] = []
+        self.polygons: list[list[Line]] = []
+        # a position of each line and polygon, to test if it lies within the other
+        self.starts: list[tuple[float, float]] = []
+        self._add(geometry)
+
+    def _add(self, geometry: Geometry) -> None:
+        if isinstance(geometry, GeometryCollection):
+            for member in geometry.geometries:
+                self._add(member)
+            return
+        members: Any
+        if member_type := WKB_MEMBER_TYPES.get(geometry.type):
+            members = geometry.coordinates
+        else:
+            member_type, members = geometry.type, [geometry.coordinates]
+        for coordinates in members:
+            if member_type == "Point":
+                self.points.append(_xy(coordinates))
+            elif member_type == "LineString":
+                self._add_line(coordinates)
+            else:
+                self._add_polygon(coordinates)
+
+    def _add_line(self, line: Line) -> None:
+        self.starts.append(_xy(line[0]))
+        self.segments.extend(
+            (a[0], a[1], b[0], b[1]) for a, b in itertools.pairwise(line)
+        )
+
+    def _add_polygon(self, rings: Sequence[Line]) -> None:
+        for ring in rings:
+            self._add_line(ring)
+        self.polygons.append(list(rings))
+
+    def covers(self, x: float, y: float) -> bool:
+        """Whether the point `(x, y)` is part of the geometry."""
+        return (
+            (x, y) in self.points
+            or any(_on_segment(x, y, *segment) for segment in self.segments)
+            or self.surrounds(x, y)
+        )
+
+    def surrounds(self, x: float, y: float) -> bool:
+        """Whether the point `(x, y)` lies inside one of the polygons."""
+        return any(_in_polygon(x, y, polygon) for polygon in self.polygons)
+
+
+def intersects(a: Geometry, b: Geometry) -> bool:
+    """
+    Return whether `a` and `b` have at least one point in common, treating
+    coordinates as planar.
+    """
+    if not bbox_intersects(bounds(a), bounds(b)):
+        return False
+    parts_a, parts_b = _Parts(a), _Parts(b)
+    return (
+        any(
+            _segments_intersect(s, t)
+            for s in parts_a.segments
+            for t in parts_b.segments
+        )
+        or any(parts_b.covers(x, y) for x, y in parts_a.points)
+        or any(parts_a.covers(x, y) for x, y in parts_b.points)
+        # without crossing boundaries, one is either within the other or apart
+        or any(parts_b.surrounds(x, y) for x, y in parts_a.starts)
+        or any(parts_a.surrounds(x, y) for x, y in parts_b.starts)
+    )
+
+
+def bbox_intersects(a: BBox, b: BBox) -> bool:
+    """Return whether the bounding boxes `a` and `b` overlap or touch."""
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def _xy(position: Sequence[float]) -> tuple[float, float]:
+    return position[0], position[1]
+
+
+def _orientation(
+    x1: float, y1: float, x2: float, y2: float, x: float, y: float
+) -> float:
+    """Positive if `(x, y)` is left of the line through the other two points."""
+    return (x2 - x1) * (y - y1) - (y2 - y1) * (x - x1)
+
+
+def _on_segment(x: float, y: float, x1: float, y1: float, x2: float, y2: float) -> bool:
+    return (
+        min(x1, x2) <= x <= max(x1, x2)
+        and min(y1, y2) <= y <= max(y1, y2)
+        and _orientation(x1, y1, x2, y2, x, y) == 0
+    )
+
+
+def _segments_intersect(s: Segment, t: Segment) -> bool:
+    ax, ay, bx, by = s
+    cx, cy, dx, dy = t
+    if not bbox_intersects(
+        (min(ax, bx), min(ay, by), max(ax, bx), max(ay, by)),
+        (min(cx, dx), min(cy, dy), max(cx, dx), max(cy, dy)),
+    ):
+        return False
+    d1 = _orientation(cx, cy, dx, dy, ax, ay)
+    d2 = _orientation(cx, cy, dx, dy, bx, by)
+    d3 = _orientation(ax, ay, bx, by, cx, cy)
+    d4 = _orientation(ax, ay, bx, by, dx, dy)
+    if ((d1 > 0) != (d2 > 0) and d1 and d2) and ((d3 > 0) != (d4 > 0) and d3 and d4):
+        return True
+    # touching or collinear
+    return (
+        _on_segment(ax, ay, cx, cy, dx, dy)
+        or _on_segment(bx, by, cx, cy, dx, dy)
+        or _on_segment(cx, cy, ax, ay, bx, by)
+        or _on_segment(dx, dy, ax, ay, bx, by)
+    )
+
+
+def _in_ring(x: float, y: float, ring: Line) -> bool:
+    inside = False
+    for (x1, y1, *_), (x2, y2, *_) in itertools.pairwise(ring):
+        if (y1 > y) != (y2 > y) and x < (x2 - x1) * (y - y1) / (y2 - y1) + x1:
+            inside = not inside
+    return inside
+
+
+def _in_polygon(x: float, y: float, rings: Sequence[Line]) -> bool:
+    exterior, *holes = rings
+    return _in_ring(x, y, exterior) and not any(_in_ring(x, y, h) for h in holes)
@@ -0,0 +1,7 @@
+from .interval import IntervalIndex
+from .spatial import RTree
+
+__all__ = [
+    "IntervalIndex",
+    "RTree",
+]
@@ -0,0 +1,78 @@
+"""
+An in-process index of intervals, such as the datetime windows of orders.
+
+Intervals are kept sorted by their start, along with the sorted lengths of all
+of them. The intervals overlapping a query can only start between the query's
+start less the longest interval and its end, so a search is two binary searches
+and a scan of that slice, testing the end of each interval in it.
+"""
+
+import bisect
+from collections.abc import Hashable, Iterable
+
+type Interval = tuple[float, float]
+
+
+class IntervalIndex[K: Hashable]:
+    """
+    Closed `(start, end)` intervals by key, searchable by the intervals they
+    overlap.
+
+    Args:
+        items (Iterable[tuple[K, Interval]]): The keys and intervals to load.
+    """
+
+    def __init__(self, items: Iterable[tuple[K, Interval]] = ()) -> None:
+        self._intervals: dict[K, Interval] = dict(items)
+        entries = sorted(
+            ((interval[0], key) for key, interval in self._intervals.items()),
+            key=lambda entry: entry[0],
+        )
+        self._starts = [start for start, _ in entries]
+        self._keys = [key for _, key in entries]
+        self._lengths = sorted(end - start for start, end in self._intervals.values())
+
+    def __len__(self) -> int:
+        return len(self._intervals)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._intervals
+
+    def get(self, key: K) -> Interval | None:
+        """Return the interval of `key`, or None if it is not in the index."""
+        return self._intervals.get(key)
+
+    def insert(self, key: K, interval: Interval) -> None:
+        """Add `key` with `interval`, replacing its previous interval if any."""
+        start, end = interval
+        if end < start:
+            raise ValueError("interval end before start")
+        self.remove(key)
+        self._intervals[key] = interval
+        index = bisect.bisect_right(self._starts, start)
+        self._starts.insert(index, start)
+        self._keys.insert(index, key)
+        bisect.insort(self._lengths, end - start)
+
+    def remove(self, key: K) -> bool:
+        """Remove `key`, returning whether it was in the index."""
+        interval = self._intervals.pop(key, None)
+        if interval is None:
+            return False
+        start, end = interval
+        index = bisect.bisect_left(self._starts, start)
+        while self._keys[index] != key:
+            index += 1
+        del self._starts[index]
+        del self._keys[index]
+        del self._lengths[bisect.bisect_left(self._lengths, end - start)]
+        return True
+
+    def overlapping(self, start: float, end: float) -> list[K]:
+        """Return the keys of the intervals overlapping `[start, end]`, by start."""
+        longest = self._lengths[-1] if self._lengths else 0.0
+        first = bisect.bisect_left(self._starts, start - longest)
+        last = bisect.bisect_right(self._starts, end)
+        return [
+            key for key in self._keys[first:last] if self._intervals[key][1] >= start
+        ]
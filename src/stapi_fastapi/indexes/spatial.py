@@ -0,0 +1,151 @@
+"""
+An in-process R-tree of bounding boxes, in pure Python.
+
+The tree is packed with the Sort-Tile-Recursive algorithm into flat arrays of
+doubles, four per box: the first level holds the boxes of the entries and each
+level above the bounds of groups of `node_size` consecutive boxes of the level
+below, up to a single root. Searching descends from the root into the groups
+overlapping the query box only.
+
+Packed trees cannot be updated in place, so entries inserted afterwards are kept
+in a buffer that is scanned linearly, and replaced or removed entries are
+skipped until the tree is packed again, once the buffer and skipped entries
+grow beyond a fraction of the tree.
+"""
+
+import math
+from array import array
+from collections.abc import Hashable, Iterable
+
+from stapi_fastapi.geometry import BBox, bbox_intersects
+
+NODE_SIZE = 16
+# the tree is packed again once updates exceed this fraction of its entries
+REPACK_RATIO = 0.125
+# ... or this number, for small trees
+REPACK_MINIMUM = 64
+
+
+class RTree[K: Hashable]:
+    """
+    Bounding boxes by key, searchable by the boxes they intersect.
+
+    Args:
+        items (Iterable[tuple[K, BBox]]): The keys and `(min_x, min_y, max_x,
+            max_y)` boxes to bulk load.
+        node_size (int): The number of children of each node.
+    """
+
+    def __init__(
+        self, items: Iterable[tuple[K, BBox]] = (), node_size: int = NODE_SIZE
+    ) -> None:
+        if node_size < 2:
+            raise ValueError("node_size must be at least 2")
+        self.node_size = node_size
+        self._boxes: dict[K, BBox] = dict(items)
+        self._pack()
+
+    def __len__(self) -> int:
+        return len(self._boxes)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._boxes
+
+    def get(self, key: K) -> BBox | None:
+        """Return the box of `key`, or None if it is not in the tree."""
+        return self._boxes.get(key)
+
+    def insert(self, key: K, bbox: BBox) -> None:
+        """Add `key` with `bbox`, replacing its previous box if any."""
+        if key in self._packed:
+            self._stale.add(key)
+        self._boxes[key] = bbox
+        self._buffer[key] = bbox
+        self._maybe_repack()
+
+    def remove(self, key: K) -> bool:
+        """Remove `key`, returning whether it was in the tree."""
+        if self._boxes.pop(key, None) is None:
+            return False
+        self._buffer.pop(key, None)
+        if key in self._packed:
+            self._stale.add(key)
+        self._maybe_repack()
+        return True
+
+    def search(self, bbox: BBox) -> list[K]:
+        """Return the keys of the boxes intersecting `bbox`, in no given order."""
+        min_x, min_y, max_x, max_y = bbox
+        found: list[K] = []
+        levels, node_size = self._levels, self.node_size
+        stack = [(len(levels) - 1, 0)] if self._keys else []
+        while stack:
+            level, index = stack.pop()
+            boxes = levels[level]
+            offset = index * 4
+            if (
+                boxes[offset] > max_x
+                or boxes[offset + 1] > max_y
+                or boxes[offset + 2] < min_x
+                or boxes[offset + 3] < min_y
+            ):
+                continue
+            if level == 0:
+                key = self._keys[index]
+                if key not in self._stale:
+                    found.append(key)
+            else:
+                first = index * node_size
+                last = min(first + node_size, len(levels[level - 1]) // 4)
+                stack.extend((level - 1, child) for child in range(first, last))
+        found.extend(
+            key for key, box in self._buffer.items() if bbox_intersects(box, bbox)
+        )
+        return found
+
+    def _maybe_repack(self) -> None:
+        updates = len(self._buffer) + len(self._stale)
+        if updates > max(REPACK_MINIMUM, len(self._packed) * REPACK_RATIO):
+            self._pack()
+
+    def _pack(self) -> None:
+        """Bulk load every box with Sort-Tile-Recursive."""
+        node_size = self.node_size
+        items = list(self._boxes.items())
+        leaves = math.ceil(len(items) / node_size)
+        slices = math.ceil(math.sqrt(leaves))
+        slice_size = max(slices * node_size, 1)
+        # sort by center, first into vertical slices, then each slice by y
+        items.sort(key=lambda item: item[1][0] + item[1][2])
+        ordered: list[tuple[K, BBox]] = []
+        for start in range(0, len(items), slice_size):
+            tile = items[start : start + slice_size]
+            tile.sort(key=lambda item: item[1][1] + item[1][3])
+            ordered.extend(tile)
+
+        self._keys = [key for key, _ in ordered]
+        level = array("d", (value for _, box in ordered for value in box))
+        self._levels = [level]
+        while len(level) > 4:
+            level = _parent_level(level, node_size)
+            self._levels.append(level)
+        self._packed = frozenset(self._keys)
+        self._buffer: dict[K, BBox] = {}
+        self._stale: set[K] = set()
+
+
+def _parent_level(level: array, node_size: int) -> array:
+    """The bounds of each group of `node_size` consecutive boxes of `level`."""
+    parents = array("d")
+    group = node_size * 4
+    for start in range(0, len(level), group):
+        boxes = level[start : start + group]
+        parents.extend(
+            (
+                min(boxes[0::4]),
+                min(boxes[1::4]),
+                max(boxes[2::4]),
+                max(boxes[3::4]),
+            )
+        )
+    return parents
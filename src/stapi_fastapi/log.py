@@ -0,0 +1,214 @@
+"""
+Non-blocking structured logging.
+
+`install_logging` routes all log records through a bounded queue to a background
+thread, which formats them as JSON lines. Logging a record costs the calling
+thread, usually the event loop, no more than putting it on the queue: messages
+are merged with their arguments, and exceptions formatted, only in the
+background thread. When the queue is full, records are dropped rather than
+blocking the caller.
+
+Extra fields of records, such as request payloads, are included in the JSON
+line with secrets redacted. Above `DEBUG`, long strings and lists are truncated,
+so that payloads are only logged in full when debugging.
+
+During an incident the same error tends to be logged for every request. The
+`ErrorStormFilter` lets the first few of each kind through, then suppresses the
+rest until its window ends; the next record let through reports how many were
+suppressed.
+"""
+
+import atexit
+import json
+import logging
+import queue
+import re
+import sys
+import threading
+import time
+from datetime import UTC, datetime
+from logging.handlers import QueueHandler, QueueListener
+from typing import IO, Any
+
+from stapi_fastapi.metrics import Counter
+
+LOG_RECORDS_DROPPED = Counter(
+    "stapi_log_records_dropped_total",
+    "Log records not written, by reason: queue_full or sampled.",
+    ["reason"],
+)
+
+SECRET = re.compile(r"authorization|api[-_]?key|token|secret|password|cookie", re.I)
+REDACTED = "[redacted]"
+
+# attributes of every log record, anything else was passed as `extra`
+_RECORD_ATTRIBUTES = frozenset(
+    logging.LogRecord("", 0, "", 0, "", (), None).__dict__
+) | {"message", "asctime", "taskName"}
+
+
+def redact(
+    value: Any, max_length: int | None = None, max_items: int | None = None
+) -> Any:
+    """
+    Replace the values of keys that look like secrets, and truncate strings and
+    lists longer than `max_length` characters and `max_items` items.
+    """
+    if isinstance(value, dict):
+        return {
+            key: REDACTED
+            if SECRET.search(str(key))
+            else redact(item, max_length, max_items)
+            for key, item in value.items()
+        }
+    if isinstance(value, list | tuple):
+        items = [redact(item, max_length, max_items) for item in value[:max_items]]
+        if max_items is not None and len(value) > max_items:
+            items.append(f"... {len(value) - max_items} more")
+        return items
+    if isinstance(value, str) and max_length is not None and len(value) > max_length:
+        return f"{value[:max_length]}... ({len(value)} characters)"
+    return value
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    Formats records as JSON objects with the time, level, logger, message, extra
+    fields and exception of the record.
+
+    Args:
+        max_length (int): The length strings are truncated to above `DEBUG`.
+        max_items (int): The number of items lists are truncated to above `DEBUG`.
+    """
+
+    def __init__(self, max_length: int = 1000, max_items: int = 20) -> None:
+        super().__init__()
+        self.max_length = max_length
+        self.max_items = max_items
+
+    def format(self, record: logging.LogRecord) -> str:
+        if record.levelno > logging.DEBUG:
+            max_length, max_items = self.max_length, self.max_items
+        else:
+            max_length, max_items = None, None
+
+        entry: dict[str, Any] = {
+            "time": datetime.fromtimestamp(record.created, UTC).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": redact(record.getMessage(), max_length),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = (
+                    REDACTED
+                    if SECRET.search(key)
+                    else redact(value, max_length, max_items)
+                )
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
+
+
+class ErrorStormFilter(logging.Filter):
+    """
+    Lets through at most `burst` records of the same kind per `window` seconds.
+
+    Records are of the same kind if they come from the same logger with the same
+    level, message template and exception type. Records below `level` are not
+    sampled.
+    """
+
+    max_kinds = 10_000
+
+    def __init__(
+        self, burst: int = 5, window: float = 60.0, level: int = logging.WARNING
+    ) -> None:
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self.level = level
+        # per kind: window start, records in the window, records suppressed
+        self._kinds: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < self.level:
+            return True
+        exc_type = record.exc_info[0] if record.exc_info else None
+        kind = (record.name, record.levelno, str(record.msg), exc_type)
+        now = time.monotonic()
+        with self._lock:
+            state = self._kinds.get(kind)
+            if state is None or now - state[0] >= self.window:
+                if len(self._kinds) >= self.max_kinds:
+                    self._kinds.clear()
+                self._kinds[kind] = [now, 1, 0]
+                if state is not None and state[2]:
+                    record.suppressed = state[2]
+                return True
+            state[1] += 1
+            if state[1] <= self.burst:
+                return True
+            state[2] += 1
+        LOG_RECORDS_DROPPED.inc(reason="sampled")
+        return False
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Puts records on a bounded queue as they are, leaving all formatting to the
+    thread that writes them, and drops them when the queue is full.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # the queue is read in this process, so the record does not need to be
+        # made picklable by formatting it here
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc(reason="queue_full")
+
+
+def install_logging(
+    level: int | str = logging.INFO,
+    stream: IO[str] | None = None,
+    queue_size: int = 10_000,
+    burst: int = 5,
+    window: float = 60.0,
+    max_length: int = 1000,
+    max_items: int = 20,
+) -> QueueListener:
+    """
+    Write the records of all loggers at `level` and above to `stream`, standard
+    error by default, as JSON lines from a background thread.
+
+    Replaces the queue handler of an earlier call. Returns the listener writing
+    the records, which is stopped, flushing the queue, on exit.
+    """
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(JSONFormatter(max_length, max_items))
+    records: queue.Queue[logging.LogRecord] = queue.Queue(queue_size)
+    queue_handler = NonBlockingQueueHandler(records)
+    queue_handler.addFilter(ErrorStormFilter(burst, window))
+    listener = QueueListener(records, handler, respect_handler_level=True)
+    queue_handler.listener = listener
+
+    root = logging.getLogger()
+    for previous in root.handlers[:]:
+        if isinstance(previous, NonBlockingQueueHandler):
+            root.removeHandler(previous)
+            if previous.listener is not None:
+                atexit.unregister(previous.listener.stop)
+                previous.listener.stop()
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
@@ -0,0 +1,163 @@
+"""
+Event loop lag monitoring and detection of blocking calls.
+
+A heartbeat task measures how late the event loop wakes it up and records the
+lag in the `stapi_event_loop_lag_seconds` histogram. A watchdog thread notices
+when the heartbeat stops because a call blocks the loop: it then logs the stack
+of the event loop thread, innermost frame first, showing the blocking call, with
+the name of the route whose request was being handled.
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+import weakref
+
+from fastapi import FastAPI
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from stapi_fastapi.metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG = Histogram(
+    "stapi_event_loop_lag_seconds",
+    "How late the event loop ran a task scheduled to run.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+# frames of a blocking stack logged, innermost first, so that the blocking call
+# survives the truncation of long extras by `stapi_fastapi.log.JSONFormatter`
+STACK_DEPTH = 20
+LOOP_BLOCKED = Counter(
+    "stapi_event_loop_blocked_total",
+    "Calls that blocked the event loop for longer than the threshold, by route.",
+    ["route"],
+)
+
+
+class LoopMonitor:
+    """
+    Monitors the event loop it is started in.
+
+    Args:
+        interval (float): Seconds between heartbeats.
+        threshold (float): Seconds a heartbeat may be late before the loop is
+            considered blocked and the blocking stack is logged.
+    """
+
+    def __init__(self, interval: float = 0.05, threshold: float = 0.25) -> None:
+        self.interval = interval
+        self.threshold = threshold
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self._heartbeat = 0.0
+        self._stop = threading.Event()
+        # the request scope handled by each task, to name the blocked route
+        self._scopes: weakref.WeakKeyDictionary[asyncio.Task, Scope] = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def start(self) -> None:
+        """Start monitoring the running event loop."""
+        self.stop()
+        self.loop = asyncio.get_running_loop()
+        self._stop = threading.Event()
+        self._heartbeat = time.monotonic()
+        self.loop.create_task(self._beat(self._stop))
+        threading.Thread(
+            target=self._watch,
+            args=(self.loop, threading.get_ident(), self._stop),
+            name="loop-monitor",
+            daemon=True,
+        ).start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def ensure_started(self) -> None:
+        """Start monitoring the running event loop unless already monitoring it."""
+        if self.loop is not asyncio.get_running_loop() or self._stop.is_set():
+            self.start()
+
+    def track(self, scope: Scope) -> None:
+        """Note that the current task handles the request of `scope`."""
+        task = asyncio.current_task()
+        if task is not None:
+            self._scopes[task] = scope
+
+    async def _beat(self, stop: threading.Event) -> None:
+        try:
+            while not stop.is_set():
+                start = time.monotonic()
+                await asyncio.sleep(self.interval)
+                self._heartbeat = time.monotonic()
+                LOOP_LAG.observe(max(0.0, self._heartbeat - start - self.interval))
+        finally:
+            stop.set()
+
+    def _watch(
+        self, loop: asyncio.AbstractEventLoop, thread_id: int, stop: threading.Event
+    ) -> None:
+        reported = 0.0
+        while not stop.wait(self.threshold / 2):
+            if not loop.is_running():
+                continue
+            heartbeat = self._heartbeat
+            blocked = time.monotonic() - heartbeat - self.interval
+            if blocked > self.threshold and heartbeat != reported:
+                # report each blocking call once
+                reported = heartbeat
+                self._report(loop, thread_id, blocked)
+
+    def _report(
+        self, loop: asyncio.AbstractEventLoop, thread_id: int, blocked: float
+    ) -> None:
+        frame = sys._current_frames().get(thread_id)
+        if frame is None:
+            return
+        stack = traceback.format_stack(frame)[-STACK_DEPTH:][::-1]
+        route = self._route(loop)
+        LOOP_BLOCKED.inc(route=route)
+        logger.warning(
+            "Event loop blocked for more than %.3fs handling %s",
+            blocked,
+            route,
+            extra={"route": route, "stack": stack},
+        )
+
+    def _route(self, loop: asyncio.AbstractEventLoop) -> str:
+        # the loop thread is blocked, so its current task does not change
+        task = asyncio.tasks._current_tasks.get(loop)  # type: ignore[attr-defined]
+        scope = self._scopes.get(task) if task is not None else None
+        if scope is None:
+            return "unknown"
+        route = scope.get("route")
+        return getattr(route, "name", None) or f"{scope['method']} {scope['path']}"
+
+
+class LoopMonitorMiddleware:
+    """Starts the monitor and tells it which task handles which request."""
+
+    def __init__(self, app: ASGIApp, monitor: LoopMonitor) -> None:
+        self.app = app
+        self.monitor = monitor
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            self.monitor.ensure_started()
+            self.monitor.track(scope)
+        await self.app(scope, receive, send)
+
+
+def install_loop_monitor(
+    app: FastAPI, interval: float = 0.05, threshold: float = 0.25
+) -> LoopMonitor:
+    """
+    Monitor the event loop serving `app`, from its first request on, logging
+    calls that block it for more than `threshold` seconds.
+    """
+    monitor = LoopMonitor(interval, threshold)
+    app.add_middleware(LoopMonitorMiddleware, monitor=monitor)
+    return monitor
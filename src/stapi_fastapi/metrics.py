@@ -0,0 +1,423 @@
+"""
+Prometheus metrics without a client library dependency.
+
+Metrics are registered with a `Registry` and rendered in the Prometheus text
+exposition format. Updates take an uncontended lock, which costs well under a
+microsecond and keeps the metrics correct for endpoints and backends running in
+the threadpool as well as on the event loop.
+
+Each uvicorn worker is a separate process with its own metrics. Give the
+registry a `directory` shared by the workers and each of them periodically
+writes a snapshot there; whichever worker answers a scrape adds them all up.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections.abc import Container, Iterator, Sequence
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, ClassVar
+
+from fastapi import FastAPI, Request, Response
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+type Labels = tuple[str, ...]
+
+
+class Metric:
+    type: ClassVar[str]
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        registry: "Registry | None" = None,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: dict[Labels, Any] = {}
+        self._lock = threading.Lock()
+        (REGISTRY if registry is None else registry).register(self)
+
+    def _key(self, labels: dict[str, Any]) -> Labels:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes the labels {self.labelnames}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            samples = [[list(key), value] for key, value in self._values.items()]
+        return {
+            "type": self.type,
+            "help": self.documentation,
+            "labelnames": list(self.labelnames),
+            "samples": samples,
+        }
+
+
+class Counter(Metric):
+    """A value that only goes up, such as the number of requests served."""
+
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(Metric):
+    """A value that goes up and down, such as the number of requests in flight."""
+
+    type = "gauge"
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0)
+
+
+class Histogram(Metric):
+    """Counts observations, such as request durations, into buckets."""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        registry: "Registry | None" = None,
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.buckets = (*sorted(buckets), math.inf)
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # per bucket counts, sum, count
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels: Any) -> int:
+        state = self._values.get(self._key(labels))
+        return 0 if state is None else state[2]
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            samples = [
+                [list(key), [list(counts), total, count]]
+                for key, (counts, total, count) in self._values.items()
+            ]
+        return {
+            "type": self.type,
+            "help": self.documentation,
+            "labelnames": list(self.labelnames),
+            "buckets": list(self.buckets[:-1]),
+            "samples": samples,
+        }
+
+
+class Registry:
+    """
+    A set of metrics.
+
+    Args:
+        directory (str | os.PathLike | None): A directory shared by all worker
+            processes, in which each of them stores snapshots of its metrics.
+        flush_interval (float): The minimum number of seconds between
+            snapshots written by a worker.
+    """
+
+    def __init__(
+        self, directory: str | os.PathLike | None = None, flush_interval: float = 5
+    ) -> None:
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.metrics: dict[str, Metric] = {}
+        self._flushed = 0.0
+        self._flush_lock = threading.Lock()
+
+    def register(self, metric: Metric) -> None:
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+
+    def snapshot(self) -> dict[str, Any]:
+        return {name: metric.snapshot() for name, metric in self.metrics.items()}
+
+    def flush_due(self) -> bool:
+        """Whether `flush` would write a snapshot."""
+        return (
+            self.directory is not None
+            and time.monotonic() - self._flushed >= self.flush_interval
+        )
+
+    def flush(self, force: bool = False) -> None:
+        """
+        Write this process' snapshot, at most once per `flush_interval`. The
+        snapshot is written to a file, so call this off the event loop.
+        """
+        if self.directory is None or not (force or self.flush_due()):
+            return
+        # threads finding a flush due at the same time write the snapshot once
+        if not self._flush_lock.acquire(blocking=force):
+            return
+        try:
+            self._flushed = time.monotonic()
+            path = Path(self.directory, f"metrics-{os.getpid()}.json")
+            tmp = path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(self.snapshot()))
+            # replacing makes the write atomic for concurrent readers
+            os.replace(tmp, path)
+        finally:
+            self._flush_lock.release()
+
+    def collect(self) -> dict[str, Any]:
+        """Return the metrics of all worker processes added up."""
+        if self.directory is None:
+            return self.snapshot()
+        self.flush(force=True)
+        snapshots = []
+        for path in Path(self.directory).glob("metrics-*.json"):
+            pid = int(path.stem.removeprefix("metrics-"))
+            try:
+                snapshots.append((_is_alive(pid), json.loads(path.read_text())))
+            except (OSError, ValueError):
+                # a worker is replacing its snapshot, or the file is corrupt
+                continue
+        return merge(snapshots)
+
+    def exposition(self) -> str:
+        """
+        Render the metrics of all worker processes, which reads their snapshot
+        files, so call this off the event loop.
+        """
+        return exposition(self.collect())
+
+
+REGISTRY = Registry()
+
+
+def merge(snapshots: list[tuple[bool, dict[str, Any]]]) -> dict[str, Any]:
+    """
+    Add up snapshots of several processes. Gauges of processes that are no
+    longer alive are left out, counters and histograms keep their counts.
+    """
+    merged: dict[str, Any] = {}
+    for alive, snapshot in snapshots:
+        for name, metric in snapshot.items():
+            if metric["type"] == "gauge" and not alive:
+                continue
+            target = merged.setdefault(name, {**metric, "samples": []})
+            samples = {tuple(labels): value for labels, value in target["samples"]}
+            for labels, value in metric["samples"]:
+                key = tuple(labels)
+                samples[key] = _add(samples[key], value) if key in samples else value
+            target["samples"] = [[list(key), value] for key, value in samples.items()]
+    return merged
+
+
+def _add(a: Any, b: Any) -> Any:
+    if isinstance(a, list):
+        counts = [x + y for x, y in zip(a[0], b[0])]
+        return [counts, a[1] + b[1], a[2] + b[2]]
+    return a + b
+
+
+def _is_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def exposition(snapshot: dict[str, Any]) -> str:
+    """Render a snapshot in the Prometheus text exposition format."""
+    lines = []
+    for name, metric in sorted(snapshot.items()):
+        lines.append(f"# HELP {name} {_escape_help(metric['help'])}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        for labels, value in metric["samples"]:
+            pairs = list(zip(metric["labelnames"], labels))
+            if metric["type"] == "histogram":
+                lines.extend(_histogram_lines(name, pairs, metric["buckets"], value))
+            else:
+                lines.append(f"{name}{_labels(pairs)} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def _histogram_lines(
+    name: str, pairs: list[tuple[str, str]], buckets: list[float], value: list
+) -> Iterator[str]:
+    counts, total, count = value
+    cumulative = 0
+    for bound, bucket_count in zip([*buckets, math.inf], counts):
+        cumulative += bucket_count
+        le = ("le", _number(bound))
+        yield f"{name}_bucket{_labels([*pairs, le])} {cumulative}"
+    yield f"{name}_sum{_labels(pairs)} {_number(total)}"
+    yield f"{name}_count{_labels(pairs)} {count}"
+
+
+def _labels(pairs: list[tuple[str, str]]) -> str:
+    if not pairs:
+        return ""
+    escaped = (f'{name}="{_escape_label(value)}"' for name, value in pairs)
+    return "{" + ",".join(escaped) + "}"
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _escape_help(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value))
+
+
+REQUEST_DURATION = Histogram(
+    "stapi_request_duration_seconds",
+    "Time spent handling requests, by route name and product.",
+    ["route", "product", "method", "status"],
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "stapi_requests_in_progress", "Requests currently being handled."
+)
+CACHE_REQUESTS = Counter(
+    "stapi_cache_requests_total",
+    "Cache lookups by cache and result, either hit or miss.",
+    ["cache", "result"],
+)
+
+
+class MetricsMiddleware:
+    """
+    Records the duration of every request by route name and product, and the
+    number of requests in flight.
+
+    Routes are labeled with the name they are registered under, without the
+    router name and product id, e.g. `create-order`; requests that match no
+    route with `unmatched`.
+    """
+
+    def __init__(self, app: ASGIApp, registry: Registry = REGISTRY) -> None:
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        REQUESTS_IN_PROGRESS.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUESTS_IN_PROGRESS.dec()
+            route, product = route_labels(scope)
+            REQUEST_DURATION.observe(
+                time.perf_counter() - start,
+                route=route,
+                product=product,
+                method=scope["method"],
+                status=status_code,
+            )
+            if self.registry.flush_due():
+                # writing the snapshot is file I/O, keep it off the event loop
+                await run_in_threadpool(self.registry.flush)
+
+
+def route_labels(scope: Scope) -> tuple[str, str]:
+    """Return the route name and product id labels of a handled request."""
+    route = scope.get("route")
+    name = getattr(route, "name", None)
+    if not name:
+        return "unmatched", ""
+    # route names are `root:route` or `root:product_id:route`
+    _, _, rest = name.partition(":")
+    product, _, route_name = rest.rpartition(":")
+    if not product:
+        # collapsed product routes take the product id as a path parameter, only
+        # trust it if it is a known product, so that labels stay bounded
+        product_id = scope.get("path_params", {}).get("product_id", "")
+        if product_id in _product_routers(route):
+            product = product_id
+    return route_name or name, product
+
+
+def _product_routers(route: object) -> Container[str]:
+    # collapsed product routes are bound methods of the root router
+    root_router = getattr(getattr(route, "endpoint", None), "__self__", None)
+    return getattr(root_router, "product_routers", ())
+
+
+def install_metrics(
+    app: FastAPI, registry: Registry = REGISTRY, path: str = "/metrics"
+) -> None:
+    """Record request metrics for `app` and serve all metrics at `path`."""
+
+    async def metrics(request: Request) -> Response:
+        body = await run_in_threadpool(registry.exposition)
+        return Response(body, media_type=CONTENT_TYPE)
+
+    app.add_middleware(MetricsMiddleware, registry=registry)
+    app.add_route(path, metrics, name="metrics", include_in_schema=False)
@@ -3,7 +3,7 @@ from typing import Any, Literal, TypeVar
 
 from geojson_pydantic import Feature, FeatureCollection
 from geojson_pydantic.geometries import Geometry
-from pydantic import AwareDatetime, BaseModel, ConfigDict, Field
+from pydantic import AwareDatetime, BaseModel, ConfigDict, Field, field_validator
 
 from stapi_fastapi.models.shared import Link
 from stapi_fastapi.types.datetime_interval import DatetimeInterval
@@ -42,12 +42,59 @@ class Opportunity(Feature[G, P]):
     type: Literal["Feature"] = "Feature"
     links: list[Link] = Field(default_factory=list)
 
+    # opportunities may be shared between requests; routers add links to copies.
+    # The freeze is shallow: `links`, the geometry coordinates, and the properties
+    # are still mutable lists and models, and must not be mutated in place
+    model_config = ConfigDict(frozen=True)
+
 
 class OpportunityCollection(FeatureCollection[Opportunity[G, P]]):
     type: Literal["FeatureCollection"] = "FeatureCollection"
     links: list[Link] = Field(default_factory=list)
     id: str | None = None
 
+    model_config = ConfigDict(frozen=True)
+
+
+class ProductsOpportunityPayload(OpportunityPayload):
+    """An opportunity search across the products `product_ids`."""
+
+    product_ids: list[str] = Field(min_length=1)
+
+    @field_validator("next")
+    @classmethod
+    def first_page_only(cls, next: str | None) -> str | None:
+        # a pagination token is issued for the search of a single product
+        if next is not None:
+            raise ValueError("only the first page of each product can be searched")
+        return next
+
+    def product_search(self) -> OpportunityPayload:
+        """The search of each product, starting at its first page."""
+        return OpportunityPayload.model_construct(
+            datetime=self.datetime,
+            geometry=self.geometry,
+            filter=self.filter,
+            limit=self.limit,
+        )
+
+
+class OpportunitySearchError(BaseModel):
+    """Why the opportunities of a product could not be searched."""
+
+    product_id: str
+    status_code: int
+    detail: Any
+
+
+class ProductsOpportunityCollection(OpportunityCollection[G, P]):
+    """
+    The opportunities of several products, with the errors of the products that
+    could not be searched.
+    """
+
+    errors: list[OpportunitySearchError] = Field(default_factory=list)
+
 
 class OpportunitySearchStatusCode(StrEnum):
     received = "received"
@@ -64,6 +111,8 @@ class OpportunitySearchStatus(BaseModel):
     reason_text: str | None = None
     links: list[Link] = Field(default_factory=list)
 
+    model_config = ConfigDict(frozen=True)
+
 
 class OpportunitySearchRecord(BaseModel):
     id: str
@@ -72,6 +121,8 @@ class OpportunitySearchRecord(BaseModel):
     status: OpportunitySearchStatus
     links: list[Link] = Field(default_factory=list)
 
+    model_config = ConfigDict(frozen=True)
+
 
 class OpportunitySearchRecords(BaseModel):
     search_records: list[OpportunitySearchRecord]
@@ -54,7 +54,7 @@ class OrderStatus(BaseModel):
     reason_text: Optional[str] = None
     links: list[Link] = Field(default_factory=list)
 
-    model_config = ConfigDict(extra="allow")
+    model_config = ConfigDict(extra="allow", frozen=True)
 
 
 class OrderStatuses[T: OrderStatus](BaseModel):
@@ -93,6 +93,11 @@ class Order(_GeoJsonBase):
 
     links: list[Link] = Field(default_factory=list)
 
+    # orders are shared between requests by stores; routers add links to copies.
+    # The freeze is shallow: `links`, the geometry coordinates, and the nested
+    # properties are still mutable lists and models, and must not be mutated in place
+    model_config = ConfigDict(frozen=True)
+
     __geojson_exclude_if_none__ = {"bbox", "id"}
 
     @field_validator("geometry", mode="before")
@@ -7,11 +7,12 @@ from pydantic import AnyHttpUrl, BaseModel, Field
 
 from stapi_fastapi.models.opportunity import OpportunityProperties
 from stapi_fastapi.models.order import OrderParameters
-from stapi_fastapi.models.shared import Link
+from stapi_fastapi.models.shared import Link, with_links
 
 if TYPE_CHECKING:
     from stapi_fastapi.backends.product_backend import (
         CreateOrder,
+        DeferOpportunitySearch,
         GetOpportunityCollection,
         SearchOpportunities,
         SearchOpportunitiesAsync,
@@ -59,6 +60,7 @@ class Product(BaseModel):
     _search_opportunities: SearchOpportunities | None
     _search_opportunities_async: SearchOpportunitiesAsync | None
     _get_opportunity_collection: GetOpportunityCollection | None
+    _defer_opportunity_search: DeferOpportunitySearch | None
 
     def __init__(
         self,
@@ -70,6 +72,7 @@ class Product(BaseModel):
         search_opportunities: SearchOpportunities | None = None,
         search_opportunities_async: SearchOpportunitiesAsync | None = None,
         get_opportunity_collection: GetOpportunityCollection | None = None,
+        defer_opportunity_search: DeferOpportunitySearch | None = None,
         **kwargs,
     ) -> None:
         super().__init__(*args, **kwargs)
@@ -80,6 +83,14 @@ class Product(BaseModel):
                 "arguments must be provided if either is provided"
             )
 
+        if defer_opportunity_search and not (
+            search_opportunities and search_opportunities_async
+        ):
+            raise ValueError(
+                "The `defer_opportunity_search` argument requires both sync and async "
+                "opportunity search"
+            )
+
         self._constraints = constraints
         self._opportunity_properties = opportunity_properties
         self._order_parameters = order_parameters
@@ -87,6 +98,7 @@ class Product(BaseModel):
         self._search_opportunities = search_opportunities
         self._search_opportunities_async = search_opportunities_async
         self._get_opportunity_collection = get_opportunity_collection
+        self._defer_opportunity_search = defer_opportunity_search
 
     @property
     def create_order(self) -> CreateOrder:
@@ -114,6 +126,14 @@ class Product(BaseModel):
             )
         return self._get_opportunity_collection
 
+    @property
+    def defer_opportunity_search(self) -> DeferOpportunitySearch:
+        if not self._defer_opportunity_search:
+            raise AttributeError(
+                "This product does not support deferring opportunity search"
+            )
+        return self._defer_opportunity_search
+
     @property
     def constraints(self) -> type[Constraints]:
         return self._constraints
@@ -137,13 +157,12 @@ class Product(BaseModel):
             and self._get_opportunity_collection is not None
         )
 
-    def with_links(self, links: list[Link] | None = None) -> Self:
-        if not links:
-            return self
+    @property
+    def supports_deferred_opportunity_search(self) -> bool:
+        return self._defer_opportunity_search is not None
 
-        new = self.model_copy(deep=True)
-        new.links.extend(links)
-        return new
+    def with_links(self, links: list[Link] | None = None) -> Self:
+        return with_links(self, links or [])
 
 
 class ProductsCollection(BaseModel):
@@ -1,3 +1,4 @@
+from collections.abc import Iterable
 from typing import Any
 
 from pydantic import (
@@ -30,3 +31,16 @@ class Link(BaseModel):
     @model_serializer(mode="wrap", when_used="json")
     def serialize(self, handler: SerializerFunctionWrapHandler) -> dict[str, Any]:
         return {k: v for k, v in handler(self).items() if v is not None}
+
+
+def with_links[M: BaseModel](model: M, links: Iterable[Link]) -> M:
+    """
+    Return a shallow copy of `model` with `links` appended to its `links`.
+
+    `model` itself is left untouched, so stored records can be handed out to
+    every request without copying them first.
+    """
+    links = list(links)
+    if not links:
+        return model
+    return model.model_copy(update={"links": [*model.links, *links]})  # type: ignore [attr-defined]
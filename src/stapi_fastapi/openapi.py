@@ -0,0 +1,209 @@
+import hashlib
+import json
+import os
+import threading
+import weakref
+from dataclasses import dataclass, field
+
+from fastapi import FastAPI, Request, Response, status
+from starlette.concurrency import run_in_threadpool
+from starlette.routing import BaseRoute, Route
+
+from stapi_fastapi.compression import ENCODINGS, negotiate_encoding
+from stapi_fastapi.metrics import CACHE_REQUESTS
+from stapi_fastapi.routers.root_router import RootRouter
+
+OPENAPI_ROUTE_NAME = "openapi"
+
+
+@dataclass(frozen=True)
+class OpenAPIDocument:
+    """A serialized OpenAPI document and its precompressed encodings."""
+
+    body: bytes
+    etag: str
+    version: int
+    encodings: dict[str, bytes] = field(default_factory=dict)
+
+    def etag_for(self, encoding: str | None) -> str:
+        """The ETag of the body in `encoding`, or of the identity body if None."""
+        return self.etag if encoding is None else f'{self.etag[:-1]}-{encoding}"'
+
+    @property
+    def etags(self) -> frozenset[str]:
+        """The ETags of the identity body and each of its encodings."""
+        return frozenset(
+            self.etag_for(encoding) for encoding in (None, *self.encodings)
+        )
+
+
+class OpenAPICache:
+    """
+    Serves the OpenAPI document of an app from precomputed bytes.
+
+    FastAPI generates the document on the first request to `/openapi.json`,
+    which walks the schemas of every product route while that request waits.
+    The cache generates it up front instead, keeps it serialized and compressed
+    with every available encoding at its highest level, and answers conditional
+    requests with `304 Not Modified`. Each encoding has its own ETag, the ETag of
+    the identity body suffixed with the encoding, and a request conditional on
+    any of them is answered with `304`.
+
+    The document is regenerated when products are added to `root_router`; call
+    `refresh` after adding products at runtime to move that work off the next
+    request.
+
+    Args:
+        app (FastAPI): The app to document. All routers must be included.
+        root_router (RootRouter | None): The router whose product set is
+            watched for changes.
+    """
+
+    def __init__(self, app: FastAPI, root_router: RootRouter | None = None) -> None:
+        self.app = app
+        self.root_router = root_router
+        self._documents: dict[str, OpenAPIDocument] = {}
+        self._lock = threading.Lock()
+        _caches.add(self)
+
+    @property
+    def version(self) -> int:
+        return 0 if self.root_router is None else self.root_router.products_version
+
+    def refresh(self) -> None:
+        """Regenerate the documents that are out of date."""
+        for root_path in list(self._documents) or [self.app.root_path.rstrip("/")]:
+            self.document(root_path)
+
+    def document(self, root_path: str = "") -> OpenAPIDocument:
+        """Return the document served below `root_path`, generating it if stale."""
+        document = self._documents.get(root_path)
+        if document is None or document.version != self.version:
+            # requests arriving during a build wait for it instead of repeating it
+            with self._lock:
+                document = self._documents.get(root_path)
+                if document is None or document.version != self.version:
+                    document = self._build(root_path)
+                    self._documents[root_path] = document
+        return document
+
+    async def endpoint(self, request: Request) -> Response:
+        root_path = request.scope.get("root_path", "").rstrip("/")
+        document = self._documents.get(root_path)
+        if document is None or document.version != self.version:
+            CACHE_REQUESTS.inc(cache="openapi", result="miss")
+            # generating the document takes a while, keep it off the event loop
+            document = await run_in_threadpool(self.document, root_path)
+        else:
+            CACHE_REQUESTS.inc(cache="openapi", result="hit")
+        encoding = negotiate_encoding(
+            request.headers.get("accept-encoding", ""), tuple(document.encodings)
+        )
+        # each encoding is a different byte sequence, so it has its own strong ETag
+        headers = {
+            "ETag": document.etag_for(encoding),
+            "Cache-Control": "no-cache",
+            "Vary": "Accept-Encoding",
+        }
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and _etag_matches(if_none_match, document.etags):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+            return Response(
+                document.encodings[encoding],
+                media_type="application/json",
+                headers=headers,
+            )
+        return Response(document.body, media_type="application/json", headers=headers)
+
+    def _build(self, root_path: str) -> OpenAPIDocument:
+        version = self.version
+        app = self.app
+        # mirror what FastAPI's own endpoint does for apps mounted below a root path
+        if root_path and app.root_path_in_servers:
+            if root_path not in {server.get("url") for server in app.servers}:
+                app.servers.insert(0, {"url": root_path})
+        app.openapi_schema = None
+
+        body = json.dumps(
+            app.openapi(), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+        ).encode()
+        return OpenAPIDocument(
+            body=body,
+            etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"',
+            version=version,
+            # in order of preference
+            encodings={
+                name: encoding.compress(body, encoding.max_level)
+                for name, encoding in ENCODINGS.items()
+            },
+        )
+
+
+_caches: weakref.WeakSet[OpenAPICache] = weakref.WeakSet()
+
+
+def _reset_locks_after_fork() -> None:
+    # a worker forked while a build held the lock, e.g. by `gunicorn --preload`,
+    # inherits it held with no thread left to release it
+    for cache in _caches:
+        cache._lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_locks_after_fork)
+
+
+def install_openapi_cache(
+    app: FastAPI, root_router: RootRouter | None = None, background: bool = False
+) -> OpenAPICache:
+    """
+    Replace the `openapi_url` route of `app` with one served by an
+    `OpenAPICache`, and generate the document immediately.
+
+    Call this after all routers and products have been added to the app. The
+    route keeps the name `openapi`, so `service-description` links still
+    resolve.
+
+    With `background` the document is generated in a daemon thread, so the app
+    is ready to serve other requests without waiting for it. Requests for the
+    document made before it is ready wait for that thread to finish. Workers
+    forked before the thread finished, e.g. with `gunicorn --preload`, generate
+    the document on their first request for it instead.
+    """
+    if app.openapi_url is None:
+        raise ValueError("The app does not serve an OpenAPI document")
+
+    cache = OpenAPICache(app, root_router)
+    app.router.routes = [
+        route for route in app.router.routes if not _is_openapi_route(app, route)
+    ]
+    app.add_route(
+        app.openapi_url,
+        cache.endpoint,
+        name=OPENAPI_ROUTE_NAME,
+        include_in_schema=False,
+    )
+    if background:
+        threading.Thread(
+            target=cache.refresh, name="openapi-cache", daemon=True
+        ).start()
+    else:
+        cache.refresh()
+    return cache
+
+
+def _is_openapi_route(app: FastAPI, route: BaseRoute) -> bool:
+    return isinstance(route, Route) and route.path == app.openapi_url
+
+
+def _etag_matches(if_none_match: str, etags: frozenset[str]) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        candidate.strip().removeprefix("W/") in etags
+        for candidate in if_none_match.split(",")
+    )
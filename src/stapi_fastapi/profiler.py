@@ -0,0 +1,206 @@
+"""
+On-demand statistical profiling of a running server.
+
+A `SamplingProfiler` samples the stacks of all threads from a background thread
+and counts identical stacks. The result is written in the collapsed stack format
+read by `flamegraph.pl`, speedscope and most other flame graph tools.
+
+`install_profiler` offers two ways to trigger it, both authenticated with a
+shared token:
+
+- sending a request with an `X-Profile: <token>` header profiles that request,
+- `POST /admin/profile?seconds=N` with `Authorization: Bearer <token>` profiles
+  whatever the server does during the next N seconds.
+
+Requests sharing the event loop with a profiled request appear in its samples
+as well. Nothing is installed without a token, so profiling then costs nothing.
+"""
+
+import asyncio
+import hmac
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from types import FrameType
+
+from fastapi import FastAPI, HTTPException, Query, Request, status
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+PROFILE_HEADER = "x-profile"
+OUTPUT_HEADER = "X-Profile-Output"
+MAX_WINDOW = 300
+
+# only one profiler runs at a time, concurrent ones would sample each other
+_running = threading.Lock()
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of all other threads every `interval` seconds.
+
+    Args:
+        interval (float): Seconds between samples.
+    """
+
+    def __init__(self, interval: float = 0.005) -> None:
+        self.interval = interval
+        self.samples: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(
+            target=self._run, name="sampling-profiler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> Counter[str]:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.samples
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own:
+                    stack = collapse(frame, names.get(thread_id, str(thread_id)))
+                    self.samples[stack] += 1
+
+    def write(self, directory: str | os.PathLike, label: str) -> Path:
+        """Write the samples in collapsed stack format and return the file."""
+        Path(directory).mkdir(parents=True, exist_ok=True)
+        path = Path(
+            directory,
+            f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{_safe(label)}.collapsed",
+        )
+        path.write_text(
+            "".join(f"{stack} {count}\n" for stack, count in self.samples.items())
+        )
+        return path
+
+
+def collapse(frame: FrameType | None, thread_name: str) -> str:
+    """Return a stack as `thread;outermost;...;innermost` frames."""
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append(f"{code.co_qualname} ({code.co_filename}:{code.co_firstlineno})")
+        frame = frame.f_back
+    frames.append(f"thread {thread_name}")
+    return ";".join(_safe(name, ";") for name in reversed(frames))
+
+
+def _safe(value: str, unsafe: str = "/\\;: ") -> str:
+    for char in unsafe:
+        value = value.replace(char, "_")
+    return value
+
+
+def _authorized(token: str, offered: str | None) -> bool:
+    return offered is not None and hmac.compare_digest(token.encode(), offered.encode())
+
+
+class ProfileRequestMiddleware:
+    """Profiles requests carrying the profiling token in an `X-Profile` header."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        token: str,
+        directory: str | os.PathLike,
+        interval: float = 0.005,
+    ) -> None:
+        self.app = app
+        self.token = token
+        self.directory = directory
+        self.interval = interval
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        offered = Headers(scope=scope).get(PROFILE_HEADER)
+        if offered is None or not _authorized(self.token, offered):
+            await self.app(scope, receive, send)
+            return
+        if not _running.acquire(blocking=False):
+            # another profile is being taken, serve the request unprofiled
+            await self.app(scope, receive, send)
+            return
+
+        profiler = SamplingProfiler(self.interval)
+        path: Path | None = None
+
+        async def send_with_output(message: Message) -> None:
+            nonlocal path
+            if message["type"] == "http.response.start":
+                # the response body is rendered by now, the rest is I/O
+                profiler.stop()
+                path = profiler.write(
+                    self.directory, f"{scope['method']}{scope['path']}"
+                )
+                MutableHeaders(scope=message)[OUTPUT_HEADER] = path.name
+            await send(message)
+
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_output)
+        finally:
+            if path is None:
+                profiler.stop()
+                profiler.write(self.directory, f"{scope['method']}{scope['path']}")
+            _running.release()
+
+
+def install_profiler(
+    app: FastAPI,
+    token: str,
+    directory: str | os.PathLike,
+    interval: float = 0.005,
+    path: str = "/admin/profile",
+) -> None:
+    """
+    Let holders of `token` profile single requests or time windows of `app`,
+    writing the profiles to `directory`.
+    """
+    if not token:
+        raise ValueError("A profiling token is required")
+
+    async def profile_window(
+        request: Request,
+        seconds: float = Query(gt=0, le=MAX_WINDOW),
+    ) -> dict[str, str | int]:
+        authorization = request.headers.get("authorization", "")
+        if not _authorized(token, authorization.removeprefix("Bearer ")):
+            raise HTTPException(status.HTTP_401_UNAUTHORIZED, "Invalid token")
+        if not _running.acquire(blocking=False):
+            raise HTTPException(status.HTTP_409_CONFLICT, "Already profiling")
+        try:
+            profiler = SamplingProfiler(interval)
+            profiler.start()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                profiler.stop()
+            output = profiler.write(directory, f"window-{seconds:g}s")
+        finally:
+            _running.release()
+        return {"output": output.name, "samples": sum(profiler.samples.values())}
+
+    app.add_middleware(
+        ProfileRequestMiddleware, token=token, directory=directory, interval=interval
+    )
+    app.add_api_route(
+        path,
+        profile_window,
+        methods=["POST"],
+        name="profile",
+        include_in_schema=False,
+    )
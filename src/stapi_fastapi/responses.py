@@ -1,7 +1,14 @@
+from typing import Any
+
 from fastapi.responses import JSONResponse
 
 from stapi_fastapi.constants import TYPE_GEOJSON
+from stapi_fastapi.timing import timed
 
 
 class GeoJSONResponse(JSONResponse):
     media_type = TYPE_GEOJSON
+
+    def render(self, content: Any) -> bytes:
+        with timed("render"):
+            return super().render(content)
@@ -1,8 +1,10 @@
 from __future__ import annotations
 
+import asyncio
 import logging
-import traceback
-from typing import TYPE_CHECKING
+import math
+from functools import cached_property
+from typing import TYPE_CHECKING, Any
 
 from fastapi import (
     APIRouter,
@@ -16,11 +18,19 @@ from fastapi import (
 from fastapi.responses import JSONResponse
 from geojson_pydantic.geometries import Geometry
 from returns.maybe import Maybe, Some
-from returns.result import Failure, Success
+from returns.result import Failure, ResultE, Success
 
 from stapi_fastapi.constants import TYPE_JSON
 from stapi_fastapi.exceptions import ConstraintsException, NotFoundException
+from stapi_fastapi.fields import ALL_FIELDS, Fields, get_fields
+from stapi_fastapi.formats import (
+    feature_collection_response,
+    get_geometry_reducer,
+    openapi_responses,
+)
+from stapi_fastapi.geometry import GeometryReducer
 from stapi_fastapi.models.opportunity import (
+    Opportunity,
     OpportunityCollection,
     OpportunityPayload,
     OpportunitySearchRecord,
@@ -28,7 +38,7 @@ from stapi_fastapi.models.opportunity import (
 )
 from stapi_fastapi.models.order import Order, OrderPayload
 from stapi_fastapi.models.product import Product
-from stapi_fastapi.models.shared import Link
+from stapi_fastapi.models.shared import Link, with_links
 from stapi_fastapi.responses import GeoJSONResponse
 from stapi_fastapi.routers.route_names import (
     CREATE_ORDER,
@@ -38,6 +48,7 @@ from stapi_fastapi.routers.route_names import (
     GET_PRODUCT,
     SEARCH_OPPORTUNITIES,
 )
+from stapi_fastapi.timing import timed_await
 from stapi_fastapi.types.json_schema_model import JsonSchemaModel
 
 if TYPE_CHECKING:
@@ -45,18 +56,54 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger(__name__)
 
+# searches still running after being deferred, referenced until they complete
+_deferred_searches: set[asyncio.Task] = set()
+
+
+def parse_prefer(value: str) -> dict[str, str | None]:
+    """
+    Parse the preferences of a `Prefer` header (RFC 7240) into a mapping of their
+    lowercased tokens to their values, ignoring preference parameters.
+    """
+    preferences: dict[str, str | None] = {}
+    for preference in value.split(","):
+        token, _, token_value = preference.split(";")[0].partition("=")
+        if token := token.strip().lower():
+            preferences.setdefault(token, token_value.strip().strip('"') or None)
+    return preferences
+
 
-def get_prefer(prefer: str | None = Header(None)) -> str | None:
+def get_prefer(prefer: str | None = Header(None)) -> Prefer | None:
     if prefer is None:
         return None
 
-    if prefer not in Prefer:
+    preferences = parse_prefer(prefer)
+    if not preferences or any(token not in Prefer for token in preferences):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Invalid Prefer header value: {prefer}",
         )
 
-    return Prefer(prefer)
+    if Prefer.respond_async in preferences:
+        return Prefer.respond_async
+    return Prefer.wait
+
+
+def get_prefer_wait(prefer: str | None = Header(None)) -> float | None:
+    """The seconds the client prefers to wait for a response, from `wait=N`."""
+    if prefer is None or (wait := parse_prefer(prefer).get(Prefer.wait)) is None:
+        return None
+
+    try:
+        seconds = float(wait)
+    except ValueError:
+        seconds = math.nan
+    if not 0 <= seconds < math.inf:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid Prefer wait value: {wait}",
+        )
+    return seconds
 
 
 class ProductRouter(APIRouter):
@@ -81,10 +128,16 @@ class ProductRouter(APIRouter):
         self.product = product
         self.root_router = root_router
 
+        # with collapsed product routes the root router registers a single set of
+        # routes for all products and dispatches to this router by `product_id`
+        if not root_router.collapse_product_routes:
+            self.add_product_routes()
+
+    def add_product_routes(self) -> None:
         self.add_api_route(
             path="",
             endpoint=self.get_product,
-            name=f"{self.root_router.name}:{self.product.id}:{GET_PRODUCT}",
+            name=self.route_name(GET_PRODUCT),
             methods=["GET"],
             summary="Retrieve this product",
             tags=["Products"],
@@ -93,7 +146,7 @@ class ProductRouter(APIRouter):
         self.add_api_route(
             path="/constraints",
             endpoint=self.get_product_constraints,
-            name=f"{self.root_router.name}:{self.product.id}:{GET_CONSTRAINTS}",
+            name=self.route_name(GET_CONSTRAINTS),
             methods=["GET"],
             summary="Get constraints for the product",
             tags=["Products"],
@@ -102,7 +155,7 @@ class ProductRouter(APIRouter):
         self.add_api_route(
             path="/order-parameters",
             endpoint=self.get_product_order_parameters,
-            name=f"{self.root_router.name}:{self.product.id}:{GET_ORDER_PARAMETERS}",
+            name=self.route_name(GET_ORDER_PARAMETERS),
             methods=["GET"],
             summary="Get order parameters for the product",
             tags=["Products"],
@@ -122,14 +175,12 @@ class ProductRouter(APIRouter):
         ) -> Order:
             return await self.create_order(payload, request, response)
 
-        _create_order.__annotations__["payload"] = OrderPayload[
-            self.product.order_parameters  # type: ignore
-        ]
+        _create_order.__annotations__["payload"] = self.order_payload_model
 
         self.add_api_route(
             path="/orders",
             endpoint=_create_order,
-            name=f"{self.root_router.name}:{self.product.id}:{CREATE_ORDER}",
+            name=self.route_name(CREATE_ORDER),
             methods=["POST"],
             response_class=GeoJSONResponse,
             status_code=status.HTTP_201_CREATED,
@@ -137,94 +188,104 @@ class ProductRouter(APIRouter):
             tags=["Products"],
         )
 
-        if (
-            product.supports_opportunity_search
-            or root_router.supports_async_opportunity_search
-        ):
+        if self.supports_opportunity_search:
             self.add_api_route(
                 path="/opportunities",
                 endpoint=self.search_opportunities,
-                name=f"{self.root_router.name}:{self.product.id}:{SEARCH_OPPORTUNITIES}",
+                name=self.route_name(SEARCH_OPPORTUNITIES),
                 methods=["POST"],
                 response_class=GeoJSONResponse,
-                # unknown why mypy can't see the constraints property on Product, ignoring
-                response_model=OpportunityCollection[
-                    Geometry,
-                    self.product.opportunity_properties,  # type: ignore
-                ],
+                response_model=self.opportunity_collection_model,
                 responses={
+                    **openapi_responses(),
                     201: {
                         "model": OpportunitySearchRecord,
                         "content": {TYPE_JSON: {}},
-                    }
+                    },
                 },
                 summary="Search Opportunities for the product",
                 tags=["Products"],
             )
 
-        if root_router.supports_async_opportunity_search:
+        if self.root_router.supports_async_opportunity_search:
             self.add_api_route(
                 path="/opportunities/{opportunity_collection_id}",
                 endpoint=self.get_opportunity_collection,
-                name=f"{self.root_router.name}:{self.product.id}:{GET_OPPORTUNITY_COLLECTION}",
+                name=self.route_name(GET_OPPORTUNITY_COLLECTION),
                 methods=["GET"],
                 response_class=GeoJSONResponse,
+                response_model=self.opportunity_collection_model,
+                responses=openapi_responses(),
                 summary="Get an Opportunity Collection by ID",
                 tags=["Products"],
             )
 
+    @cached_property
+    def order_payload_model(self) -> type[OrderPayload]:
+        """`OrderPayload` specialized for this product's order parameters."""
+        return OrderPayload[self.product.order_parameters]  # type: ignore
+
+    @cached_property
+    def opportunity_model(self) -> type[Opportunity]:
+        """`Opportunity` specialized for this product's properties."""
+        return Opportunity[Geometry, self.product.opportunity_properties]  # type: ignore
+
+    @cached_property
+    def opportunity_collection_model(self) -> type[OpportunityCollection]:
+        """`OpportunityCollection` specialized for this product's properties."""
+        # unknown why mypy can't see the constraints property on Product, ignoring
+        return OpportunityCollection[
+            Geometry,
+            self.product.opportunity_properties,  # type: ignore
+        ]
+
+    @property
+    def supports_opportunity_search(self) -> bool:
+        return (
+            self.product.supports_opportunity_search
+            or self.root_router.supports_async_opportunity_search
+        )
+
+    def route_name(self, name: str) -> str:
+        if self.root_router.collapse_product_routes:
+            return f"{self.root_router.name}:{name}"
+        return f"{self.root_router.name}:{self.product.id}:{name}"
+
+    def url_for(self, request: Request, name: str, **path_params: Any) -> str:
+        """Return the URL of the route `name` of this product."""
+        if self.root_router.collapse_product_routes:
+            path_params["product_id"] = self.product.id
+        return str(request.url_for(self.route_name(name), **path_params))
+
     def get_product(self, request: Request) -> Product:
         links = [
             Link(
-                href=str(
-                    request.url_for(
-                        f"{self.root_router.name}:{self.product.id}:{GET_PRODUCT}",
-                    ),
-                ),
+                href=self.url_for(request, GET_PRODUCT),
                 rel="self",
                 type=TYPE_JSON,
             ),
             Link(
-                href=str(
-                    request.url_for(
-                        f"{self.root_router.name}:{self.product.id}:{GET_CONSTRAINTS}",
-                    ),
-                ),
+                href=self.url_for(request, GET_CONSTRAINTS),
                 rel="constraints",
                 type=TYPE_JSON,
             ),
             Link(
-                href=str(
-                    request.url_for(
-                        f"{self.root_router.name}:{self.product.id}:{GET_ORDER_PARAMETERS}",
-                    ),
-                ),
+                href=self.url_for(request, GET_ORDER_PARAMETERS),
                 rel="order-parameters",
                 type=TYPE_JSON,
             ),
             Link(
-                href=str(
-                    request.url_for(
-                        f"{self.root_router.name}:{self.product.id}:{CREATE_ORDER}",
-                    ),
-                ),
+                href=self.url_for(request, CREATE_ORDER),
                 rel="create-order",
                 type=TYPE_JSON,
                 method="POST",
             ),
         ]
 
-        if (
-            self.product.supports_opportunity_search
-            or self.root_router.supports_async_opportunity_search
-        ):
+        if self.supports_opportunity_search:
             links.append(
                 Link(
-                    href=str(
-                        request.url_for(
-                            f"{self.root_router.name}:{self.product.id}:{SEARCH_OPPORTUNITIES}",
-                        ),
-                    ),
+                    href=self.url_for(request, SEARCH_OPPORTUNITIES),
                     rel="opportunities",
                     type=TYPE_JSON,
                 ),
@@ -238,10 +299,19 @@ class ProductRouter(APIRouter):
         request: Request,
         response: Response,
         prefer: Prefer | None = Depends(get_prefer),
+        wait: float | None = Depends(get_prefer_wait),
+        reducer: GeometryReducer | None = Depends(get_geometry_reducer),
+        fields: Fields = Depends(get_fields),
     ) -> OpportunityCollection | Response:
         """
         Explore the opportunities available for a particular set of constraints
         """
+        # sync, deferred to async if it takes longer than the client waits
+        if (budget := self.opportunity_search_wait(prefer, wait)) is not None:
+            return await self.search_opportunities_deferrable(
+                search, request, budget, reducer, fields
+            )
+
         # sync
         if not self.root_router.supports_async_opportunity_search or (
             prefer is Prefer.wait and self.product.supports_opportunity_search
@@ -251,6 +321,8 @@ class ProductRouter(APIRouter):
                 request,
                 response,
                 prefer,
+                reducer,
+                fields,
             )
 
         # async
@@ -263,21 +335,144 @@ class ProductRouter(APIRouter):
 
         raise AssertionError("Expected code to be unreachable")
 
+    def opportunity_search_wait(
+        self, prefer: Prefer | None, wait: float | None
+    ) -> float | None:
+        """
+        Return the seconds to wait for a sync search before deferring it, or None
+        if the search should not be deferred.
+
+        Searches are deferred if the product supports it and the client prefers
+        to wait, for at most the router's `max_opportunity_search_wait`.
+        """
+        if not (
+            self.root_router.supports_async_opportunity_search
+            and self.product.supports_deferred_opportunity_search
+        ):
+            return None
+        max_wait = self.root_router.max_opportunity_search_wait
+        if wait is None:
+            return max_wait if prefer is Prefer.wait else None
+        return wait if max_wait is None else min(wait, max_wait)
+
     async def search_opportunities_sync(
         self,
         search: OpportunityPayload,
         request: Request,
         response: Response,
         prefer: Prefer | None,
+        reducer: GeometryReducer | None = None,
+        fields: Fields = ALL_FIELDS,
+    ) -> Response:
+        result = await timed_await(
+            "backend.search_opportunities",
+            self.product.search_opportunities(
+                self,
+                search,
+                search.next,
+                search.limit,
+                request,
+            ),
+        )
+        headers = {}
+        if prefer is Prefer.wait and self.root_router.supports_async_opportunity_search:
+            headers["Preference-Applied"] = "wait"
+
+        collection = self.opportunity_collection(result, search, request)
+        return await feature_collection_response(
+            request,
+            collection.features,
+            collection.links,
+            headers=headers,
+            reducer=reducer,
+            fields=fields,
+            model=self.opportunity_model,
+            id=None,
+        )
+
+    async def search_opportunities_deferrable(
+        self,
+        search: OpportunityPayload,
+        request: Request,
+        wait: float,
+        reducer: GeometryReducer | None = None,
+        fields: Fields = ALL_FIELDS,
+    ) -> Response:
+        """
+        Search synchronously for up to `wait` seconds, then hand the still running
+        search to the backend as an async search instead of restarting it.
+        """
+        search_task = asyncio.ensure_future(
+            timed_await(
+                "backend.search_opportunities",
+                self.product.search_opportunities(
+                    self,
+                    search,
+                    search.next,
+                    search.limit,
+                    request,
+                ),
+            )
+        )
+        try:
+            await asyncio.wait([search_task], timeout=wait)
+        except asyncio.CancelledError:
+            search_task.cancel()
+            raise
+
+        if search_task.done():
+            collection = self.opportunity_collection(
+                search_task.result(), search, request
+            )
+            return await feature_collection_response(
+                request,
+                collection.features,
+                collection.links,
+                headers={"Preference-Applied": "wait"},
+                reducer=reducer,
+                fields=fields,
+                model=self.opportunity_model,
+                id=None,
+            )
+
+        try:
+            match await timed_await(
+                "backend.defer_opportunity_search",
+                self.product.defer_opportunity_search(
+                    self, search, search_task, request
+                ),
+            ):
+                case Success(search_record):
+                    _deferred_searches.add(search_task)
+                    search_task.add_done_callback(_deferred_searches.discard)
+                    return self.search_record_response(
+                        search_record, request, "respond-async"
+                    )
+                case Failure(e):
+                    logger.error(
+                        "An error occurred while deferring an opportunity search",
+                        exc_info=e,
+                    )
+                    raise HTTPException(
+                        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                        detail="Error searching opportunities",
+                    )
+                case x:
+                    raise AssertionError(f"Expected code to be unreachable: {x}")
+        except BaseException:
+            # nothing tracks a search that was not deferred, stop it
+            search_task.cancel()
+            raise
+
+    def opportunity_collection(
+        self,
+        result: ResultE[tuple[list[Opportunity], Maybe[str]]],
+        search: OpportunityPayload,
+        request: Request,
     ) -> OpportunityCollection:
+        """Return the collection of a sync search `result`, with its links."""
         links: list[Link] = []
-        match await self.product.search_opportunities(
-            self,
-            search,
-            search.next,
-            search.limit,
-            request,
-        ):
+        match result:
             case Success((features, maybe_pagination_token)):
                 links.append(self.order_link(request, search))
                 match maybe_pagination_token:
@@ -289,8 +484,8 @@ class ProductRouter(APIRouter):
                 raise e
             case Failure(e):
                 logger.error(
-                    "An error occurred while searching opportunities: %s",
-                    traceback.format_exception(e),
+                    "An error occurred while searching opportunities",
+                    exc_info=e,
                 )
                 raise HTTPException(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -299,9 +494,6 @@ class ProductRouter(APIRouter):
             case x:
                 raise AssertionError(f"Expected code to be unreachable {x}")
 
-        if prefer is Prefer.wait and self.root_router.supports_async_opportunity_search:
-            response.headers["Preference-Applied"] = "wait"
-
         return OpportunityCollection(features=features, links=links)
 
     async def search_opportunities_async(
@@ -310,32 +502,22 @@ class ProductRouter(APIRouter):
         request: Request,
         prefer: Prefer | None,
     ) -> JSONResponse:
-        match await self.product.search_opportunities_async(self, search, request):
+        match await timed_await(
+            "backend.search_opportunities_async",
+            self.product.search_opportunities_async(self, search, request),
+        ):
             case Success(search_record):
-                search_record.links.append(
-                    self.root_router.opportunity_search_record_self_link(
-                        search_record, request
-                    )
-                )
-                headers = {}
-                headers["Location"] = str(
-                    self.root_router.generate_opportunity_search_record_href(
-                        request, search_record.id
-                    )
-                )
-                if prefer is not None:
-                    headers["Preference-Applied"] = "respond-async"
-                return JSONResponse(
-                    status_code=201,
-                    content=search_record.model_dump(mode="json"),
-                    headers=headers,
+                return self.search_record_response(
+                    search_record,
+                    request,
+                    None if prefer is None else Prefer.respond_async,
                 )
             case Failure(e) if isinstance(e, ConstraintsException):
                 raise e
             case Failure(e):
                 logger.error(
-                    "An error occurred while initiating an asynchronous opportunity search: %s",
-                    traceback.format_exception(e),
+                    "An error occurred while initiating an asynchronous opportunity search",
+                    exc_info=e,
                 )
                 raise HTTPException(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -344,6 +526,35 @@ class ProductRouter(APIRouter):
             case x:
                 raise AssertionError(f"Expected code to be unreachable: {x}")
 
+    def search_record_response(
+        self,
+        search_record: OpportunitySearchRecord,
+        request: Request,
+        preference_applied: str | None,
+    ) -> JSONResponse:
+        """Return the 201 response to a search continuing as `search_record`."""
+        search_record = with_links(
+            search_record,
+            [
+                self.root_router.opportunity_search_record_self_link(
+                    search_record, request
+                )
+            ],
+        )
+        headers = {}
+        headers["Location"] = str(
+            self.root_router.generate_opportunity_search_record_href(
+                request, search_record.id
+            )
+        )
+        if preference_applied is not None:
+            headers["Preference-Applied"] = preference_applied
+        return JSONResponse(
+            status_code=201,
+            content=search_record.model_dump(mode="json"),
+            headers=headers,
+        )
+
     def get_product_constraints(self) -> JsonSchemaModel:
         """
         Return supported constraints of a specific product
@@ -362,13 +573,16 @@ class ProductRouter(APIRouter):
         """
         Create a new order.
         """
-        match await self.product.create_order(
-            self,
-            payload,
-            request,
+        match await timed_await(
+            "backend.create_order",
+            self.product.create_order(
+                self,
+                payload,
+                request,
+            ),
         ):
             case Success(order):
-                order.links.extend(self.root_router.order_links(order, request))
+                order = with_links(order, self.root_router.order_links(order, request))
                 location = str(self.root_router.generate_order_href(request, order.id))
                 response.headers["Location"] = location
                 return order
@@ -376,8 +590,8 @@ class ProductRouter(APIRouter):
                 raise e
             case Failure(e):
                 logger.error(
-                    "An error occurred while creating order: %s",
-                    traceback.format_exception(e),
+                    "An error occurred while creating order",
+                    exc_info=e,
                 )
                 raise HTTPException(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -388,11 +602,7 @@ class ProductRouter(APIRouter):
 
     def order_link(self, request: Request, opp_req: OpportunityPayload):
         return Link(
-            href=str(
-                request.url_for(
-                    f"{self.root_router.name}:{self.product.id}:{CREATE_ORDER}",
-                ),
-            ),
+            href=self.url_for(request, CREATE_ORDER),
             rel="create-order",
             type=TYPE_JSON,
             method="POST",
@@ -413,37 +623,49 @@ class ProductRouter(APIRouter):
         )
 
     async def get_opportunity_collection(
-        self, opportunity_collection_id: str, request: Request
-    ) -> OpportunityCollection:
+        self,
+        opportunity_collection_id: str,
+        request: Request,
+        reducer: GeometryReducer | None = Depends(get_geometry_reducer),
+        fields: Fields = Depends(get_fields),
+    ) -> OpportunityCollection | Response:
         """
         Fetch an opportunity collection generated by an asynchronous opportunity search.
         """
-        match await self.product.get_opportunity_collection(
-            self,
-            opportunity_collection_id,
-            request,
+        match await timed_await(
+            "backend.get_opportunity_collection",
+            self.product.get_opportunity_collection(
+                self,
+                opportunity_collection_id,
+                request,
+            ),
         ):
             case Success(Some(opportunity_collection)):
-                opportunity_collection.links.append(
-                    Link(
-                        href=str(
-                            request.url_for(
-                                f"{self.root_router.name}:{self.product.id}:{GET_OPPORTUNITY_COLLECTION}",
-                                opportunity_collection_id=opportunity_collection_id,
-                            ),
-                        ),
-                        rel="self",
-                        type=TYPE_JSON,
+                self_link = Link(
+                    href=self.url_for(
+                        request,
+                        GET_OPPORTUNITY_COLLECTION,
+                        opportunity_collection_id=opportunity_collection_id,
                     ),
+                    rel="self",
+                    type=TYPE_JSON,
+                )
+                return await feature_collection_response(
+                    request,
+                    opportunity_collection.features,
+                    [*opportunity_collection.links, self_link],
+                    reducer=reducer,
+                    fields=fields,
+                    model=self.opportunity_model,
+                    id=opportunity_collection.id,
                 )
-                return opportunity_collection
             case Success(Maybe.empty):
                 raise NotFoundException("Opportunity Collection not found")
             case Failure(e):
                 logger.error(
-                    "An error occurred while fetching opportunity collection: '%s': %s",
+                    "An error occurred while fetching opportunity collection: '%s'",
                     opportunity_collection_id,
-                    traceback.format_exception(e),
+                    exc_info=e,
                 )
                 raise HTTPException(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1,8 +1,19 @@
+import asyncio
 import logging
-import traceback
-
-from fastapi import APIRouter, HTTPException, Request, status
+from typing import Any
+
+from fastapi import (
+    APIRouter,
+    Body,
+    Depends,
+    HTTPException,
+    Request,
+    Response,
+    status,
+)
 from fastapi.datastructures import URL
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
 from returns.maybe import Maybe, Some
 from returns.result import Failure, Success
 
@@ -15,14 +26,30 @@ from stapi_fastapi.backends.root_backend import (
 )
 from stapi_fastapi.constants import TYPE_GEOJSON, TYPE_JSON
 from stapi_fastapi.exceptions import NotFoundException
+from stapi_fastapi.fields import Fields, get_fields
+from stapi_fastapi.filters import OrderFilter, get_order_filter
+from stapi_fastapi.formats import (
+    feature_collection_response,
+    get_geometry_reducer,
+    openapi_responses,
+)
+from stapi_fastapi.geometry import GeometryReducer
 from stapi_fastapi.models.conformance import (
     ASYNC_OPPORTUNITIES,
     CORE,
+    OPPORTUNITIES,
     Conformance,
 )
 from stapi_fastapi.models.opportunity import (
+    Opportunity,
+    OpportunityCollection,
+    OpportunityPayload,
+    OpportunitySearchError,
     OpportunitySearchRecord,
     OpportunitySearchRecords,
+    Prefer,
+    ProductsOpportunityCollection,
+    ProductsOpportunityPayload,
 )
 from stapi_fastapi.models.order import (
     Order,
@@ -31,24 +58,63 @@ from stapi_fastapi.models.order import (
 )
 from stapi_fastapi.models.product import Product, ProductsCollection
 from stapi_fastapi.models.root import RootResponse
-from stapi_fastapi.models.shared import Link
+from stapi_fastapi.models.shared import Link, with_links
+from stapi_fastapi.pagination import InvalidPaginationToken, Paginator
 from stapi_fastapi.responses import GeoJSONResponse
-from stapi_fastapi.routers.product_router import ProductRouter
+from stapi_fastapi.routers.product_router import (
+    ProductRouter,
+    get_prefer,
+    get_prefer_wait,
+)
 from stapi_fastapi.routers.route_names import (
     CONFORMANCE,
+    CREATE_ORDER,
+    GET_CONSTRAINTS,
+    GET_OPPORTUNITY_COLLECTION,
     GET_OPPORTUNITY_SEARCH_RECORD,
     GET_ORDER,
+    GET_ORDER_PARAMETERS,
+    GET_PRODUCT,
     LIST_OPPORTUNITY_SEARCH_RECORDS,
     LIST_ORDER_STATUSES,
     LIST_ORDERS,
     LIST_PRODUCTS,
     ROOT,
+    SEARCH_OPPORTUNITIES,
+    SEARCH_PRODUCTS_OPPORTUNITIES,
 )
+from stapi_fastapi.timing import timed_await
+from stapi_fastapi.types.json_schema_model import JsonSchemaModel
 
 logger = logging.getLogger(__name__)
 
 
+def _with_product_id(opportunity: Opportunity, product_id: str) -> Opportunity:
+    if opportunity.properties is None:
+        return opportunity
+    properties = opportunity.properties.model_copy(update={"product_id": product_id})
+    return opportunity.model_copy(update={"properties": properties})
+
+
 class RootRouter(APIRouter):
+    """
+    The root of a STAPI API.
+
+    With `collapse_product_routes` the routes of all products are registered
+    once, parameterized by `product_id`, instead of once per product. Startup
+    time, the route table, and the OpenAPI document then no longer grow with the
+    number of products, at the cost of the product specific order parameter and
+    opportunity schemas in the OpenAPI document. Request bodies are still
+    validated against the models of the requested product, which are built on
+    first use.
+
+    Products that can defer opportunity searches answer a search synchronously
+    if it completes within the wait the client prefers (`Prefer: wait=N`, RFC
+    7240), and continue it as an async search otherwise. The wait is capped at
+    `max_opportunity_search_wait` seconds, which also bounds a plain
+    `Prefer: wait`.
+    """
+
     def __init__(
         self,
         get_orders: GetOrders,
@@ -60,6 +126,9 @@ class RootRouter(APIRouter):
         name: str = "root",
         openapi_endpoint_name: str = "openapi",
         docs_endpoint_name: str = "swagger_ui_html",
+        paginator: Paginator | None = None,
+        collapse_product_routes: bool = False,
+        max_opportunity_search_wait: float | None = None,
         *args,
         **kwargs,
     ) -> None:
@@ -82,7 +151,13 @@ class RootRouter(APIRouter):
         self.name = name
         self.openapi_endpoint_name = openapi_endpoint_name
         self.docs_endpoint_name = docs_endpoint_name
+        self.paginator = paginator or Paginator()
+        self.collapse_product_routes = collapse_product_routes
+        self.max_opportunity_search_wait = max_opportunity_search_wait
         self.product_ids: list[str] = []
+        # incremented whenever the product set changes, so derived documents
+        # such as the cached OpenAPI document know when to regenerate
+        self.products_version = 0
 
         # A dict is used to track the product routers so we can ensure
         # idempotentcy in case a product is added multiple times, and also to
@@ -120,6 +195,8 @@ class RootRouter(APIRouter):
             methods=["GET"],
             name=f"{self.name}:{LIST_ORDERS}",
             response_class=GeoJSONResponse,
+            response_model=OrderCollection,
+            responses=openapi_responses(),
             tags=["Orders"],
         )
 
@@ -140,6 +217,17 @@ class RootRouter(APIRouter):
             tags=["Orders"],
         )
 
+        if OPPORTUNITIES in conformances:
+            self.add_api_route(
+                "/opportunities",
+                self.search_opportunities,
+                methods=["POST"],
+                name=f"{self.name}:{SEARCH_PRODUCTS_OPPORTUNITIES}",
+                response_class=GeoJSONResponse,
+                summary="Search Opportunities across products",
+                tags=["Opportunities"],
+            )
+
         if ASYNC_OPPORTUNITIES in conformances:
             self.add_api_route(
                 "/searches/opportunities",
@@ -159,6 +247,79 @@ class RootRouter(APIRouter):
                 tags=["Opportunities"],
             )
 
+        if collapse_product_routes:
+            self.add_product_routes()
+
+    def add_product_routes(self) -> None:
+        self.add_api_route(
+            "/products/{product_id}",
+            self.get_product,
+            methods=["GET"],
+            name=f"{self.name}:{GET_PRODUCT}",
+            summary="Retrieve a product",
+            tags=["Products"],
+        )
+
+        self.add_api_route(
+            "/products/{product_id}/constraints",
+            self.get_product_constraints,
+            methods=["GET"],
+            name=f"{self.name}:{GET_CONSTRAINTS}",
+            summary="Get constraints for a product",
+            tags=["Products"],
+        )
+
+        self.add_api_route(
+            "/products/{product_id}/order-parameters",
+            self.get_product_order_parameters,
+            methods=["GET"],
+            name=f"{self.name}:{GET_ORDER_PARAMETERS}",
+            summary="Get order parameters for a product",
+            tags=["Products"],
+        )
+
+        self.add_api_route(
+            "/products/{product_id}/orders",
+            self.create_product_order,
+            methods=["POST"],
+            name=f"{self.name}:{CREATE_ORDER}",
+            response_class=GeoJSONResponse,
+            status_code=status.HTTP_201_CREATED,
+            summary="Create an order for a product",
+            tags=["Products"],
+        )
+
+        self.add_api_route(
+            "/products/{product_id}/opportunities",
+            self.search_product_opportunities,
+            methods=["POST"],
+            name=f"{self.name}:{SEARCH_OPPORTUNITIES}",
+            response_class=GeoJSONResponse,
+            response_model=None,
+            responses={
+                **openapi_responses(),
+                201: {
+                    "model": OpportunitySearchRecord,
+                    "content": {TYPE_JSON: {}},
+                },
+            },
+            summary="Search Opportunities for a product",
+            tags=["Products"],
+        )
+
+        if self.supports_async_opportunity_search:
+            self.add_api_route(
+                "/products/{product_id}/opportunities/{opportunity_collection_id}",
+                self.get_product_opportunity_collection,
+                methods=["GET"],
+                name=f"{self.name}:{GET_OPPORTUNITY_COLLECTION}",
+                response_class=GeoJSONResponse,
+                response_model=None,
+                responses=openapi_responses(),
+                summary="Get an Opportunity Collection by ID",
+                tags=["Products"],
+            )
+
     def get_root(self, request: Request) -> RootResponse:
         links = [
             Link(
@@ -218,18 +379,15 @@ class RootRouter(APIRouter):
     def get_products(
         self, request: Request, next: str | None = None, limit: int = 10
     ) -> ProductsCollection:
-        start = 0
         limit = min(limit, 100)
         try:
-            if next:
-                start = self.product_ids.index(next)
-        except ValueError:
-            logger.exception("An error occurred while retrieving products")
+            ids, maybe_pagination_token = self.paginator.paginate(
+                self.product_ids, next, limit, scope=LIST_PRODUCTS
+            )
+        except InvalidPaginationToken:
             raise NotFoundException(
                 detail="Error finding pagination token for products"
             ) from None
-        end = start + limit
-        ids = self.product_ids[start:end]
         links = [
             Link(
                 href=str(request.url_for(f"{self.name}:{LIST_PRODUCTS}")),
@@ -237,8 +395,11 @@ class RootRouter(APIRouter):
                 type=TYPE_JSON,
             ),
         ]
-        if end > 0 and end < len(self.product_ids):
-            links.append(self.pagination_link(request, self.product_ids[end], limit))
+        match maybe_pagination_token:
+            case Some(x):
+                links.append(self.pagination_link(request, x, limit))
+            case Maybe.empty:
+                pass
         return ProductsCollection(
             products=[
                 self.product_routers[product_id].get_product(request)
@@ -248,13 +409,19 @@ class RootRouter(APIRouter):
         )
 
     async def get_orders(
-        self, request: Request, next: str | None = None, limit: int = 10
-    ) -> OrderCollection:
+        self,
+        request: Request,
+        next: str | None = None,
+        limit: int = 10,
+        reducer: GeometryReducer | None = Depends(get_geometry_reducer),
+        fields: Fields = Depends(get_fields),
+        order_filter: OrderFilter = Depends(get_order_filter),
+    ) -> OrderCollection | Response:
         links: list[Link] = []
-        match await self._get_orders(next, limit, request):
+        match await timed_await(
+            "backend.get_orders", self._get_orders(next, limit, order_filter, request)
+        ):
             case Success((orders, maybe_pagination_token)):
-                for order in orders:
-                    order.links.extend(self.order_links(order, request))
                 match maybe_pagination_token:
                     case Some(x):
                         links.append(self.pagination_link(request, x, limit))
@@ -264,8 +431,8 @@ class RootRouter(APIRouter):
                 raise NotFoundException(detail="Error finding pagination token")
             case Failure(e):
                 logger.error(
-                    "An error occurred while retrieving orders: %s",
-                    traceback.format_exception(e),
+                    "An error occurred while retrieving orders",
+                    exc_info=e,
                 )
                 raise HTTPException(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -273,23 +440,31 @@ class RootRouter(APIRouter):
                 )
             case _:
                 raise AssertionError("Expected code to be unreachable")
-        return OrderCollection(features=orders, links=links)
+        if fields.includes("links"):
+            # links are added to each order as it is written
+            orders = (
+                with_links(order, self.order_links(order, request)) for order in orders
+            )
+        return await feature_collection_response(
+            request, orders, links, reducer=reducer, fields=fields, model=Order
+        )
 
     async def get_order(self, order_id: str, request: Request) -> Order:
         """
         Get details for order with `order_id`.
         """
-        match await self._get_order(order_id, request):
+        match await timed_await(
+            "backend.get_order", self._get_order(order_id, request)
+        ):
             case Success(Some(order)):
-                order.links.extend(self.order_links(order, request))
-                return order
+                return with_links(order, self.order_links(order, request))
             case Success(Maybe.empty):
                 raise NotFoundException("Order not found")
             case Failure(e):
                 logger.error(
-                    "An error occurred while retrieving order '%s': %s",
+                    "An error occurred while retrieving order '%s'",
                     order_id,
-                    traceback.format_exception(e),
+                    exc_info=e,
                 )
                 raise HTTPException(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -306,7 +481,10 @@ class RootRouter(APIRouter):
         limit: int = 10,
     ) -> OrderStatuses:
         links: list[Link] = []
-        match await self._get_order_statuses(order_id, next, limit, request):
+        match await timed_await(
+            "backend.get_order_statuses",
+            self._get_order_statuses(order_id, next, limit, request),
+        ):
             case Success(Some((statuses, maybe_pagination_token))):
                 links.append(self.order_statuses_link(request, order_id))
                 match maybe_pagination_token:
@@ -320,8 +498,8 @@ class RootRouter(APIRouter):
                 raise NotFoundException("Error finding pagination token")
             case Failure(e):
                 logger.error(
-                    "An error occurred while retrieving order statuses: %s",
-                    traceback.format_exception(e),
+                    "An error occurred while retrieving order statuses",
+                    exc_info=e,
                 )
                 raise HTTPException(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -332,11 +510,210 @@ class RootRouter(APIRouter):
         return OrderStatuses(statuses=statuses, links=links)
 
     def add_product(self, product: Product, *args, **kwargs) -> None:
-        # Give the include a prefix from the product router
         product_router = ProductRouter(product, self, *args, **kwargs)
-        self.include_router(product_router, prefix=f"/products/{product.id}")
+        if not self.collapse_product_routes:
+            # Give the include a prefix from the product router
+            self.include_router(product_router, prefix=f"/products/{product.id}")
         self.product_routers[product.id] = product_router
         self.product_ids = [*self.product_routers.keys()]
+        self.products_version += 1
+
+    def get_product_router(self, product_id: str) -> ProductRouter:
+        try:
+            return self.product_routers[product_id]
+        except KeyError:
+            raise NotFoundException("Product not found") from None
+
+    def get_product(self, product_id: str, request: Request) -> Product:
+        return self.get_product_router(product_id).get_product(request)
+
+    def get_product_constraints(self, product_id: str) -> JsonSchemaModel:
+        """
+        Return supported constraints of a specific product
+        """
+        return self.get_product_router(product_id).get_product_constraints()
+
+    def get_product_order_parameters(self, product_id: str) -> JsonSchemaModel:
+        """
+        Return supported order parameters of a specific product
+        """
+        return self.get_product_router(product_id).get_product_order_parameters()
+
+    async def create_product_order(
+        self,
+        product_id: str,
+        request: Request,
+        response: Response,
+        payload: dict[str, Any] = Body(),
+    ) -> Order:
+        """
+        Create a new order.
+        """
+        product_router = self.get_product_router(product_id)
+        try:
+            validated = product_router.order_payload_model.model_validate(payload)
+        except ValidationError as e:
+            raise RequestValidationError(
+                [
+                    {**error, "loc": ("body", *error["loc"])}
+                    for error in e.errors(include_url=False)
+                ]
+            ) from None
+        return await product_router.create_order(validated, request, response)
+
+    async def search_product_opportunities(
+        self,
+        product_id: str,
+        search: OpportunityPayload,
+        request: Request,
+        response: Response,
+        prefer: Prefer | None = Depends(get_prefer),
+        wait: float | None = Depends(get_prefer_wait),
+        reducer: GeometryReducer | None = Depends(get_geometry_reducer),
+        fields: Fields = Depends(get_fields),
+    ) -> OpportunityCollection | Response:
+        """
+        Explore the opportunities available for a particular set of constraints
+
+        Unlike the per-product route, this route has no response model, so the
+        OpenAPI document describes its responses with the generic
+        `OpportunityCollection` rather than the product's opportunity properties.
+        Responses are streamed in both modes and not validated against either.
+        """
+        product_router = self.get_product_router(product_id)
+        if not product_router.supports_opportunity_search:
+            raise NotFoundException("Product does not support opportunity search")
+        return await product_router.search_opportunities(
+            search, request, response, prefer, wait, reducer, fields
+        )
+
+    async def search_opportunities(
+        self,
+        search: ProductsOpportunityPayload,
+        request: Request,
+        response: Response,
+        wait: float | None = Depends(get_prefer_wait),
+        reducer: GeometryReducer | None = Depends(get_geometry_reducer),
+    ) -> ProductsOpportunityCollection:
+        """
+        Explore the opportunities of several products for the same constraints,
+        searching the products concurrently
+        """
+        product_search = search.product_search()
+        searches = {
+            product_id: asyncio.ensure_future(
+                self.search_product_opportunities_sync(
+                    product_id, product_search, request
+                )
+            )
+            for product_id in dict.fromkeys(search.product_ids)
+        }
+        deadline = self.opportunity_search_deadline(wait)
+        try:
+            await asyncio.wait(searches.values(), timeout=deadline)
+        except asyncio.CancelledError:
+            for product_search_task in searches.values():
+                product_search_task.cancel()
+            raise
+        if wait is not None:
+            response.headers["Preference-Applied"] = f"wait={wait:g}"
+
+        features: list[Opportunity] = []
+        links: list[Link] = []
+        errors: list[OpportunitySearchError] = []
+        for product_id, product_search_task in searches.items():
+            match self._product_opportunities(product_id, product_search_task):
+                case OpportunitySearchError() as error:
+                    errors.append(error)
+                case product_collection:
+                    features.extend(product_collection.features)
+                    links.extend(product_collection.links)
+            # searches still running after the deadline are not waited for
+            product_search_task.cancel()
+        if reducer is not None:
+            features = [reducer.feature(feature) for feature in features]
+        return ProductsOpportunityCollection(
+            features=features, links=links, errors=errors
+        )
+
+    def opportunity_search_deadline(self, wait: float | None) -> float | None:
+        """
+        The seconds a search across products waits for all of them: the wait the
+        client prefers, capped at `max_opportunity_search_wait`.
+        """
+        waits = [x for x in (wait, self.max_opportunity_search_wait) if x is not None]
+        return min(waits, default=None)
+
+    async def search_product_opportunities_sync(
+        self, product_id: str, search: OpportunityPayload, request: Request
+    ) -> OpportunityCollection:
+        product_router = self.get_product_router(product_id)
+        if not product_router.product.supports_opportunity_search:
+            raise NotFoundException("Product does not support opportunity search")
+        result = await timed_await(
+            "backend.search_opportunities",
+            product_router.product.search_opportunities(
+                product_router, search, None, search.limit, request
+            ),
+        )
+        return product_router.opportunity_collection(result, search, request)
+
+    def _product_opportunities(
+        self,
+        product_id: str,
+        product_search_task: asyncio.Future[OpportunityCollection],
+    ) -> OpportunityCollection | OpportunitySearchError:
+        if not product_search_task.done():
+            return OpportunitySearchError(
+                product_id=product_id,
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                detail="Timed out searching opportunities",
+            )
+        if isinstance(e := product_search_task.exception(), HTTPException):
+            return OpportunitySearchError(
+                product_id=product_id, status_code=e.status_code, detail=e.detail
+            )
+        if e is not None:
+            logger.error(
+                "An error occurred while searching opportunities of '%s'",
+                product_id,
+                exc_info=e,
+            )
+            return OpportunitySearchError(
+                product_id=product_id,
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Error searching opportunities",
+            )
+
+        collection = product_search_task.result()
+        # tag the opportunities and links with the product they belong to
+        return collection.model_copy(
+            update={
+                "features": [
+                    _with_product_id(feature, product_id)
+                    for feature in collection.features
+                ],
+                "links": [
+                    link.model_copy(update={"product_id": product_id})
+                    for link in collection.links
+                ],
+            }
+        )
+
+    async def get_product_opportunity_collection(
+        self,
+        product_id: str,
+        opportunity_collection_id: str,
+        request: Request,
+        reducer: GeometryReducer | None = Depends(get_geometry_reducer),
+        fields: Fields = Depends(get_fields),
+    ) -> OpportunityCollection | Response:
+        """
+        Fetch an opportunity collection generated by an asynchronous opportunity search.
+        """
+        return await self.get_product_router(product_id).get_opportunity_collection(
+            opportunity_collection_id, request, reducer, fields
+        )
 
     def generate_order_href(self, request: Request, order_id: str) -> URL:
         return request.url_for(f"{self.name}:{GET_ORDER}", order_id=order_id)
@@ -383,12 +760,18 @@ class RootRouter(APIRouter):
         self, request: Request, next: str | None = None, limit: int = 10
     ) -> OpportunitySearchRecords:
         links: list[Link] = []
-        match await self._get_opportunity_search_records(next, limit, request):
+        match await timed_await(
+            "backend.get_opportunity_search_records",
+            self._get_opportunity_search_records(next, limit, request),
+        ):
             case Success((records, maybe_pagination_token)):
-                for record in records:
-                    record.links.append(
-                        self.opportunity_search_record_self_link(record, request)
+                records = [
+                    with_links(
+                        record,
+                        [self.opportunity_search_record_self_link(record, request)],
                     )
+                    for record in records
+                ]
                 match maybe_pagination_token:
                     case Some(x):
                         links.append(self.pagination_link(request, x, limit))
@@ -398,8 +781,8 @@ class RootRouter(APIRouter):
                 raise NotFoundException(detail="Error finding pagination token")
             case Failure(e):
                 logger.error(
-                    "An error occurred while retrieving opportunity search records: %s",
-                    traceback.format_exception(e),
+                    "An error occurred while retrieving opportunity search records",
+                    exc_info=e,
                 )
                 raise HTTPException(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -415,19 +798,22 @@ class RootRouter(APIRouter):
         """
         Get the Opportunity Search Record with `search_record_id`.
         """
-        match await self._get_opportunity_search_record(search_record_id, request):
+        match await timed_await(
+            "backend.get_opportunity_search_record",
+            self._get_opportunity_search_record(search_record_id, request),
+        ):
             case Success(Some(search_record)):
-                search_record.links.append(
-                    self.opportunity_search_record_self_link(search_record, request)
+                return with_links(
+                    search_record,
+                    [self.opportunity_search_record_self_link(search_record, request)],
                 )
-                return search_record
             case Success(Maybe.empty):
                 raise NotFoundException("Opportunity Search Record not found")
             case Failure(e):
                 logger.error(
-                    "An error occurred while retrieving opportunity search record '%s': %s",
+                    "An error occurred while retrieving opportunity search record '%s'",
                     search_record_id,
-                    traceback.format_exception(e),
+                    exc_info=e,
                 )
                 raise HTTPException(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -12,6 +12,7 @@ GET_ORDER_PARAMETERS = "get-order-parameters"
 LIST_OPPORTUNITY_SEARCH_RECORDS = "list-opportunity-search-records"
 GET_OPPORTUNITY_SEARCH_RECORD = "get-opportunity-search-record"
 SEARCH_OPPORTUNITIES = "search-opportunities"
+SEARCH_PRODUCTS_OPPORTUNITIES = "search-products-opportunities"
 GET_OPPORTUNITY_COLLECTION = "get-opportunity-collection"
 
 # Order
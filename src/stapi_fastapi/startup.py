@@ -0,0 +1,172 @@
+"""
+Profile how long an application takes to start.
+
+Imports a module in a fresh interpreter, the way a new worker does, and reports
+the time spent importing each package and module and adding each product to a
+`RootRouter`:
+
+    python -m stapi_fastapi.startup planet.application --budget 1
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from collections.abc import Sequence
+from dataclasses import dataclass
+
+# runs in the profiled interpreter, which reports product timings on stdout
+CHILD = """
+import importlib, json, sys
+from stapi_fastapi.startup import record_products
+products = record_products()
+importlib.import_module(sys.argv[1])
+print(json.dumps(products))
+"""
+
+
+@dataclass
+class StartupProfile:
+    """
+    Startup timings in seconds.
+
+    Attributes:
+        total (float): The wall time from starting the interpreter until the
+            module was imported.
+        modules (dict[str, float]): The time spent importing each module,
+            excluding the modules it imported in turn.
+        products (dict[str, float]): The time spent in `RootRouter.add_product`
+            for each product.
+    """
+
+    total: float
+    modules: dict[str, float]
+    products: dict[str, float]
+
+    @property
+    def packages(self) -> dict[str, float]:
+        """The import time of all modules of each top-level package."""
+        packages: dict[str, float] = defaultdict(float)
+        for module, seconds in self.modules.items():
+            packages[module.partition(".")[0]] += seconds
+        return dict(packages)
+
+
+def record_products() -> dict[str, float]:
+    """Time every `RootRouter.add_product` call made from now on."""
+    from stapi_fastapi.routers.root_router import RootRouter
+
+    timings: dict[str, float] = {}
+    add_product = RootRouter.add_product
+
+    def timed_add_product(self, product, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return add_product(self, product, *args, **kwargs)
+        finally:
+            timings[product.id] = time.perf_counter() - start
+
+    RootRouter.add_product = timed_add_product  # type: ignore[method-assign]
+    return timings
+
+
+def parse_importtime(output: str) -> dict[str, float]:
+    """Return the self time of each module in `python -X importtime` output."""
+    modules = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line.removeprefix("import time:").split("|")
+        # skip the header line and anything else that is not a measurement
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        modules[fields[2].strip()] = int(fields[0]) / 1_000_000
+    return modules
+
+
+def profile(module: str) -> StartupProfile:
+    """Import `module` in a new interpreter and return its startup timings."""
+    start = time.perf_counter()
+    result = _run([sys.executable, "-c", CHILD, module])
+    total = time.perf_counter() - start
+    # -X importtime slows imports down, so it gets a separate run
+    modules = parse_importtime(
+        _run([sys.executable, "-X", "importtime", "-c", CHILD, module]).stderr
+    )
+    return StartupProfile(
+        total=total,
+        modules=modules,
+        products=json.loads(result.stdout.splitlines()[-1]),
+    )
+
+
+def _run(command: list[str]) -> subprocess.CompletedProcess:
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {command[-1]} failed:\n{result.stderr}")
+    return result
+
+
+def report(profile: StartupProfile, top: int) -> str:
+    def table(title: str, timings: dict[str, float]) -> list[str]:
+        rows = sorted(timings.items(), key=lambda item: item[1], reverse=True)
+        return [
+            "",
+            title,
+            *(f"  {seconds:8.3f}s  {name}" for name, seconds in rows[:top]),
+        ]
+
+    return "\n".join(
+        [
+            f"startup: {profile.total:.3f}s",
+            *table("imports by package:", profile.packages),
+            *table("imports by module:", profile.modules),
+            *table("products:", profile.products),
+        ]
+    )
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("module", help="the module defining the application")
+    parser.add_argument(
+        "--top", type=int, default=15, help="the number of entries to list per table"
+    )
+    parser.add_argument(
+        "--budget",
+        type=float,
+        help="fail if startup takes longer than this many seconds",
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="print the full profile as JSON"
+    )
+    args = parser.parse_args(argv)
+
+    result = profile(args.module)
+    if args.json:
+        print(
+            json.dumps(
+                {
+                    "total": result.total,
+                    "packages": result.packages,
+                    "modules": result.modules,
+                    "products": result.products,
+                }
+            )
+        )
+    else:
+        print(report(result, args.top))
+
+    if args.budget is not None and result.total > args.budget:
+        print(
+            f"startup took {result.total:.3f}s, over the budget of {args.budget:.3f}s",
+            file=sys.stderr,
+        )
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
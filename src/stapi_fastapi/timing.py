@@ -0,0 +1,124 @@
+import logging
+import re
+import time
+from collections.abc import Awaitable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from stapi_fastapi.tracing import TRACER
+
+logger = logging.getLogger(__name__)
+
+# the phases timed during the current request, None when timing is disabled
+_timings: ContextVar[list[tuple[str, float]] | None] = ContextVar(
+    "stapi_timings", default=None
+)
+
+# characters not allowed in a Server-Timing metric name, which is an HTTP token
+_NOT_TOKEN = re.compile(r"[^!#$%&'*+\-.^_`|~0-9A-Za-z]")
+
+
+@contextmanager
+def timed(name: str) -> Iterator[None]:
+    """
+    Time the enclosed block as phase `name` of the current request.
+
+    Does nothing unless the request is handled by a `ServerTimingMiddleware`
+    with timing enabled. Phases with the same name are added up. When tracing
+    is enabled the block is traced as a span of the same name as well.
+    """
+    timings = _timings.get()
+    if timings is None and not TRACER.enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        with TRACER.span(name):
+            yield
+    finally:
+        if timings is not None:
+            timings.append((name, time.perf_counter() - start))
+
+
+async def timed_await[T](name: str, awaitable: Awaitable[T]) -> T:
+    """Await `awaitable`, timing it as phase `name` of the current request."""
+    with timed(name):
+        return await awaitable
+
+
+def summarize(timings: list[tuple[str, float]]) -> dict[str, float]:
+    """Return the total milliseconds spent in each phase."""
+    summary: dict[str, float] = {}
+    for name, seconds in timings:
+        summary[name] = summary.get(name, 0.0) + seconds * 1000
+    return summary
+
+
+def server_timing(summary: dict[str, float]) -> str:
+    """Format phase durations in milliseconds as a `Server-Timing` header value."""
+    return ", ".join(
+        f"{_NOT_TOKEN.sub('_', name)};dur={duration:.1f}"
+        for name, duration in summary.items()
+    )
+
+
+class ServerTimingMiddleware:
+    """
+    Times the phases of each request marked with `timed`.
+
+    The durations are sent in a `Server-Timing` response header, so browser
+    developer tools and `curl -v` show them, and logged with the request as the
+    `timings` field of the log record. A `total` phase covers the request up to
+    the start of the response.
+
+    Args:
+        app (ASGIApp): The application to wrap.
+        enabled (bool): Whether to time requests at all. When disabled,
+            requests are passed through untouched.
+        header (bool): Whether to send the `Server-Timing` header.
+        log (bool): Whether to log the timings of each request.
+    """
+
+    def __init__(
+        self, app: ASGIApp, enabled: bool = True, header: bool = True, log: bool = True
+    ) -> None:
+        self.app = app
+        self.enabled = enabled
+        self.header = header
+        self.log = log
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if not self.enabled or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: list[tuple[str, float]] = []
+        token = _timings.set(timings)
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timings(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                timings.append(("total", time.perf_counter() - start))
+                if self.header:
+                    headers = MutableHeaders(scope=message)
+                    headers.append("Server-Timing", server_timing(summarize(timings)))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timings)
+        finally:
+            _timings.reset(token)
+            if self.log:
+                logger.info(
+                    "%s %s %s",
+                    scope["method"],
+                    scope["path"],
+                    status_code,
+                    extra={"timings": summarize(timings)},
+                )
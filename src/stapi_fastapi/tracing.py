@@ -0,0 +1,232 @@
+"""
+Minimal distributed tracing.
+
+Spans are opened around each request, every phase marked with
+`stapi_fastapi.timing.timed` (backend calls, upstream HTTP calls, conversion,
+rendering) and any block wrapped in `TRACER.span()`. Trace context is taken from
+incoming `traceparent` headers and can be passed on to upstream requests with
+`inject`, following W3C Trace Context.
+
+Tracing is off until the tracer is given an exporter, and costs a single
+attribute check per span until then. `RingBufferExporter` keeps the most recent
+spans in memory, so traces can be inspected without running a collector.
+"""
+
+import hmac
+import json
+import re
+import secrets
+import time
+from collections import deque
+from collections.abc import Iterator, Mapping, MutableMapping
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import IO, Any, Protocol
+
+from fastapi import FastAPI, HTTPException, Request, Response, status
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+type SpanContext = tuple[str, str]
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str | None
+    start: float
+    duration_ms: float | None = None
+    status: str = "ok"
+    attributes: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+
+class Exporter(Protocol):
+    def export(self, span: Span) -> None: ...
+
+
+class RingBufferExporter:
+    """Keeps the `capacity` most recently finished spans in memory."""
+
+    def __init__(self, capacity: int = 10_000) -> None:
+        self._spans: deque[Span] = deque(maxlen=capacity)
+
+    def export(self, span: Span) -> None:
+        self._spans.append(span)
+
+    def spans(self, trace_id: str | None = None) -> list[Span]:
+        spans = list(self._spans)
+        if trace_id is not None:
+            spans = [span for span in spans if span.trace_id == trace_id]
+        return spans
+
+    def to_json(self, trace_id: str | None = None) -> list[dict[str, Any]]:
+        return [asdict(span) for span in self.spans(trace_id)]
+
+    def dump(self, file: IO[str], trace_id: str | None = None) -> None:
+        json.dump(self.to_json(trace_id), file)
+
+    def clear(self) -> None:
+        self._spans.clear()
+
+
+_current: ContextVar[Span | None] = ContextVar("stapi_span", default=None)
+
+
+class Tracer:
+    def __init__(self, exporter: Exporter | None = None) -> None:
+        self.exporter = exporter
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    @contextmanager
+    def span(
+        self, name: str, parent: SpanContext | None = None, **attributes: Any
+    ) -> Iterator[Span | None]:
+        """
+        Open a span, a child of `parent` or else of the current span. Yields
+        `None` when tracing is off.
+        """
+        exporter = self.exporter
+        if exporter is None:
+            yield None
+            return
+
+        current = _current.get()
+        if parent is None and current is not None:
+            parent = (current.trace_id, current.span_id)
+        trace_id, parent_id = parent or (secrets.token_hex(16), None)
+        span = Span(
+            name=name,
+            trace_id=trace_id,
+            span_id=secrets.token_hex(8),
+            parent_id=parent_id,
+            start=time.time(),
+            attributes=attributes,
+        )
+        token = _current.set(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.attributes["exception"] = repr(e)
+            raise
+        finally:
+            span.duration_ms = (time.perf_counter() - start) * 1000
+            _current.reset(token)
+            exporter.export(span)
+
+
+TRACER = Tracer()
+
+
+def current_span() -> Span | None:
+    return _current.get()
+
+
+def inject[H: MutableMapping[str, str]](headers: H) -> H:
+    """Add the `traceparent` of the current span to outgoing `headers`."""
+    span = _current.get()
+    if span is not None:
+        headers["traceparent"] = span.traceparent
+    return headers
+
+
+def extract(headers: Mapping[str, str]) -> SpanContext | None:
+    """Return the trace and parent span id of an incoming `traceparent` header."""
+    match = TRACEPARENT.match(headers.get("traceparent", "").strip().lower())
+    if match is None:
+        return None
+    trace_id, span_id = match.groups()
+    # all zero ids are invalid
+    if not trace_id.strip("0") or not span_id.strip("0"):
+        return None
+    return trace_id, span_id
+
+
+class TracingMiddleware:
+    """
+    Opens a span for each request, continuing the trace of the caller if the
+    request has a `traceparent` header. The span is named after the route that
+    handled the request.
+    """
+
+    def __init__(self, app: ASGIApp, tracer: Tracer = TRACER) -> None:
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        with self.tracer.span(
+            f"{scope['method']} {scope['path']}",
+            parent=extract(Headers(scope=scope)),
+            **{"http.method": scope["method"], "http.target": scope["path"]},
+        ) as span:
+            assert span is not None
+
+            async def send_with_status(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    span.attributes["http.status_code"] = message["status"]
+                    if message["status"] >= 500:
+                        span.status = "error"
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                route = scope.get("route")
+                if getattr(route, "name", None):
+                    span.name = route.name  # type: ignore[union-attr]
+                    span.attributes["http.route"] = route.path  # type: ignore[union-attr]
+
+
+def install_tracing(
+    app: FastAPI,
+    exporter: Exporter | None = None,
+    tracer: Tracer = TRACER,
+    path: str | None = None,
+    token: str | None = None,
+) -> Exporter:
+    """
+    Trace the requests of `app`, exporting spans to `exporter`, by default a
+    `RingBufferExporter`.
+
+    With `path`, the spans kept by a `RingBufferExporter` are served as JSON at
+    that path, optionally filtered by the `trace_id` query parameter. They
+    reveal request details, so with `token` they are only served to requests
+    with an `Authorization: Bearer <token>` header; without it, only expose the
+    path to trusted clients.
+    """
+    exporter = exporter or RingBufferExporter()
+    tracer.exporter = exporter
+    app.add_middleware(TracingMiddleware, tracer=tracer)
+
+    if path is not None and isinstance(exporter, RingBufferExporter):
+        buffer = exporter
+
+        async def traces(request: Request) -> Response:
+            if token is not None:
+                offered = request.headers.get("authorization", "")
+                if not hmac.compare_digest(
+                    token.encode(), offered.removeprefix("Bearer ").encode()
+                ):
+                    raise HTTPException(status.HTTP_401_UNAUTHORIZED, "Invalid token")
+            spans = buffer.to_json(request.query_params.get("trace_id"))
+            return Response(json.dumps(spans), media_type="application/json")
+
+        app.add_route(path, traces, name="traces", include_in_schema=False)
+    return exporter
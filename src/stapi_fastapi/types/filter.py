@@ -1,11 +1,14 @@
 from typing import Annotated, Any
 
 from pydantic import BeforeValidator
-from pygeofilter.parsers import cql2_json
 
 
 def validate(v: dict[str, Any]) -> dict[str, Any]:
     if v:
+        # pygeofilter takes several hundred milliseconds to import, so it is only
+        # loaded once a filter is actually validated
+        from pygeofilter.parsers import cql2_json
+
         try:
             cql2_json.parse({"filter": v})
         except Exception as e:
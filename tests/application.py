@@ -20,6 +20,7 @@ from tests.backends import (
 from tests.shared import (
     InMemoryOpportunityDB,
     InMemoryOrderDB,
+    create_mock_opportunity,
     product_test_satellite_provider_sync_opportunity,
 )
 
@@ -30,6 +31,7 @@ async def lifespan(app: FastAPI) -> AsyncIterator[dict[str, Any]]:
         yield {
             "_orders_db": InMemoryOrderDB(),
             "_opportunities_db": InMemoryOpportunityDB(),
+            "_opportunities": [create_mock_opportunity() for _ in range(10)],
         }
     finally:
         pass
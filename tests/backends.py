@@ -1,3 +1,4 @@
+import asyncio
 from datetime import datetime, timezone
 from uuid import uuid4
 
@@ -5,6 +6,7 @@ from fastapi import Request
 from returns.maybe import Maybe, Nothing, Some
 from returns.result import Failure, ResultE, Success
 
+from stapi_fastapi.filters import OrderFilter
 from stapi_fastapi.models.opportunity import (
     Opportunity,
     OpportunityCollection,
@@ -21,31 +23,37 @@ from stapi_fastapi.models.order import (
     OrderStatus,
     OrderStatusCode,
 )
+from stapi_fastapi.models.shared import Link
+from stapi_fastapi.pagination import Paginator
 from stapi_fastapi.routers.product_router import ProductRouter
+from stapi_fastapi.routers.route_names import (
+    GET_OPPORTUNITY_COLLECTION,
+    LIST_OPPORTUNITY_SEARCH_RECORDS,
+    LIST_ORDERS,
+    SEARCH_OPPORTUNITIES,
+)
+
+paginator = Paginator()
 
 
 async def mock_get_orders(
-    next: str | None, limit: int, request: Request
+    next: str | None, limit: int, order_filter: OrderFilter, request: Request
 ) -> ResultE[tuple[list[Order], Maybe[str]]]:
     """
     Return orders from backend.  Handle pagination/limit if applicable
     """
     try:
-        start = 0
-        limit = min(limit, 100)
-        order_ids = [*request.state._orders_db._orders.keys()]
-
-        if next:
-            start = order_ids.index(next)
-        end = start + limit
-        ids = order_ids[start:end]
-        orders = [request.state._orders_db.get_order(order_id) for order_id in ids]
-
-        if end > 0 and end < len(order_ids):
-            return Success(
-                (orders, Some(request.state._orders_db._orders[order_ids[end]].id))
-            )
-        return Success((orders, Nothing))
+        orders_db = request.state._orders_db
+        matching = [
+            order_id
+            for order_id in orders_db._order_ids
+            if order_filter.matches(orders_db.get_order(order_id))
+        ]
+        order_ids, maybe_pagination_token = paginator.paginate(
+            matching, next, limit, scope=LIST_ORDERS
+        )
+        orders = [orders_db.get_order(order_id) for order_id in order_ids]
+        return Success((orders, maybe_pagination_token))
     except Exception as e:
         return Failure(e)
 
@@ -66,20 +74,10 @@ async def mock_get_order_statuses(
     order_id: str, next: str | None, limit: int, request: Request
 ) -> ResultE[Maybe[tuple[list[OrderStatus], Maybe[str]]]]:
     try:
-        start = 0
-        limit = min(limit, 100)
         statuses = request.state._orders_db.get_order_statuses(order_id)
         if statuses is None:
             return Success(Nothing)
-
-        if next:
-            start = int(next)
-        end = start + limit
-        stati = statuses[start:end]
-
-        if end > 0 and end < len(statuses):
-            return Success(Some((stati, Some(str(end)))))
-        return Success(Some((stati, Nothing)))
+        return Success(Some(paginator.paginate(statuses, next, limit, scope=order_id)))
     except Exception as e:
         return Failure(e)
 
@@ -131,22 +129,28 @@ async def mock_search_opportunities(
     request: Request,
 ) -> ResultE[tuple[list[Opportunity], Maybe[str]]]:
     try:
-        start = 0
-        limit = min(limit, 100)
-        if next:
-            start = int(next)
-        end = start + limit
+        page, maybe_pagination_token = paginator.paginate(
+            request.state._opportunities, next, limit, scope=SEARCH_OPPORTUNITIES
+        )
         opportunities = [
-            o.model_copy(update=search.model_dump())
-            for o in request.state._opportunities[start:end]
+            o.model_copy(update={"geometry": search.geometry}) for o in page
         ]
-        if end > 0 and end < len(request.state._opportunities):
-            return Success((opportunities, Some(str(end))))
-        return Success((opportunities, Nothing))
+        return Success((opportunities, maybe_pagination_token))
     except Exception as e:
         return Failure(e)
 
 
+async def mock_search_opportunities_slowly(
+    product_router: ProductRouter,
+    search: OpportunityPayload,
+    next: str | None,
+    limit: int,
+    request: Request,
+) -> ResultE[tuple[list[Opportunity], Maybe[str]]]:
+    await asyncio.sleep(0.2)
+    return await mock_search_opportunities(product_router, search, next, limit, request)
+
+
 async def mock_search_opportunities_async(
     product_router: ProductRouter,
     search: OpportunityPayload,
@@ -170,6 +174,59 @@ async def mock_search_opportunities_async(
         return Failure(e)
 
 
+async def mock_defer_opportunity_search(
+    product_router: ProductRouter,
+    search: OpportunityPayload,
+    search_result: asyncio.Future[ResultE[tuple[list[Opportunity], Maybe[str]]]],
+    request: Request,
+) -> ResultE[OpportunitySearchRecord]:
+    try:
+        db = request.state._opportunities_db
+        search_record = OpportunitySearchRecord(
+            id=str(uuid4()),
+            product_id=product_router.product.id,
+            opportunity_request=search,
+            status=OpportunitySearchStatus(
+                timestamp=datetime.now(timezone.utc),
+                status_code=OpportunitySearchStatusCode.in_progress,
+            ),
+            links=[],
+        )
+        db.put_search_record(search_record)
+
+        def complete(search_result: asyncio.Future) -> None:
+            links = []
+            if search_result.cancelled():
+                status_code = OpportunitySearchStatusCode.canceled
+            else:
+                match search_result.result():
+                    case Success((features, _)):
+                        collection = OpportunityCollection(
+                            id=str(uuid4()), features=features
+                        )
+                        db.put_opportunity_collection(collection)
+                        status_code = OpportunitySearchStatusCode.completed
+                        href = product_router.url_for(
+                            request,
+                            GET_OPPORTUNITY_COLLECTION,
+                            opportunity_collection_id=collection.id,
+                        )
+                        links.append(Link(href=href, rel="opportunities"))
+                    case _:
+                        status_code = OpportunitySearchStatusCode.failed
+            status = OpportunitySearchStatus(
+                timestamp=datetime.now(timezone.utc), status_code=status_code
+            )
+            db.put_search_record(
+                search_record.model_copy(update={"status": status, "links": links})
+            )
+
+        search_result.add_done_callback(complete)
+        return Success(search_record)
+    except Exception as e:
+        return Failure(e)
+
+
 async def mock_get_opportunity_collection(
     product_router: ProductRouter, opportunity_collection_id: str, request: Request
 ) -> ResultE[Maybe[OpportunityCollection]]:
@@ -191,18 +248,17 @@ async def mock_get_opportunity_search_records(
     request: Request,
 ) -> ResultE[tuple[list[OpportunitySearchRecord], Maybe[str]]]:
     try:
-        start = 0
-        limit = min(limit, 100)
-        search_records = request.state._opportunities_db.get_search_records()
-
-        if next:
-            start = int(next)
-        end = start + limit
-        page = search_records[start:end]
-
-        if end > 0 and end < len(search_records):
-            return Success((page, Some(str(end))))
-        return Success((page, Nothing))
+        record_ids, maybe_pagination_token = paginator.paginate(
+            request.state._opportunities_db._search_record_ids,
+            next,
+            limit,
+            scope=LIST_OPPORTUNITY_SEARCH_RECORDS,
+        )
+        search_records = [
+            request.state._opportunities_db.get_search_record(record_id)
+            for record_id in record_ids
+        ]
+        return Success((search_records, maybe_pagination_token))
     except Exception as e:
         return Failure(e)
 
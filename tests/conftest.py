@@ -50,6 +50,13 @@ def mock_products(request) -> list[Product]:
     ]
 
 
+@pytest.fixture
+def conformances(request) -> list[str]:
+    if request.node.get_closest_marker("conformances") is not None:
+        return request.node.get_closest_marker("conformances").args[0]
+    return [CORE]
+
+
 @pytest.fixture
 def mock_opportunities() -> list[Opportunity]:
     return [create_mock_opportunity()]
@@ -60,6 +67,7 @@ def stapi_client(
     mock_products: list[Product],
     base_url: str,
     mock_opportunities: list[Opportunity],
+    conformances: list[str],
 ) -> Generator[TestClient, None, None]:
     @asynccontextmanager
     async def lifespan(app: FastAPI) -> AsyncIterator[dict[str, Any]]:
@@ -75,7 +83,7 @@ def stapi_client(
         get_orders=mock_get_orders,
         get_order=mock_get_order,
         get_order_statuses=mock_get_order_statuses,
-        conformances=[CORE],
+        conformances=conformances,
     )
 
     for mock_product in mock_products:
@@ -1,5 +1,4 @@
 from collections import defaultdict
-from copy import deepcopy
 from datetime import datetime, timedelta, timezone
 from typing import Any, Literal, Self
 from urllib.parse import parse_qs, urlparse
@@ -32,9 +31,11 @@ from stapi_fastapi.models.product import (
 
 from .backends import (
     mock_create_order,
+    mock_defer_opportunity_search,
     mock_get_opportunity_collection,
     mock_search_opportunities,
     mock_search_opportunities_async,
+    mock_search_opportunities_slowly,
 )
 
 type link_dict = dict[str, Any]
@@ -44,48 +45,56 @@ def find_link(links: list[link_dict], rel: str) -> link_dict | None:
     return next((link for link in links if link["rel"] == rel), None)
 
 
+# Stored records are frozen and routers add links to copies of them, so the
+# in-memory databases hand out shared references instead of copying.
 class InMemoryOrderDB:
     def __init__(self) -> None:
         self._orders: dict[str, Order] = {}
+        self._order_ids: list[str] = []
         self._statuses: dict[str, list[OrderStatus]] = defaultdict(list)
 
     def get_order(self, order_id: str) -> Order | None:
-        return deepcopy(self._orders.get(order_id))
+        return self._orders.get(order_id)
 
     def get_orders(self) -> list[Order]:
-        return deepcopy(list(self._orders.values()))
+        return list(self._orders.values())
 
     def put_order(self, order: Order) -> None:
-        self._orders[order.id] = deepcopy(order)
+        if order.id not in self._orders:
+            self._order_ids.append(order.id)
+        self._orders[order.id] = order
 
     def get_order_statuses(self, order_id: str) -> list[OrderStatus] | None:
-        return deepcopy(self._statuses.get(order_id))
+        return self._statuses.get(order_id)
 
     def put_order_status(self, order_id: str, status: OrderStatus) -> None:
-        self._statuses[order_id].append(deepcopy(status))
+        self._statuses[order_id].append(status)
 
 
 class InMemoryOpportunityDB:
     def __init__(self) -> None:
         self._search_records: dict[str, OpportunitySearchRecord] = {}
+        self._search_record_ids: list[str] = []
         self._collections: dict[str, OpportunityCollection] = {}
 
     def get_search_record(self, search_id: str) -> OpportunitySearchRecord | None:
-        return deepcopy(self._search_records.get(search_id))
+        return self._search_records.get(search_id)
 
     def get_search_records(self) -> list[OpportunitySearchRecord]:
-        return deepcopy(list(self._search_records.values()))
+        return list(self._search_records.values())
 
     def put_search_record(self, search_record: OpportunitySearchRecord) -> None:
-        self._search_records[search_record.id] = deepcopy(search_record)
+        if search_record.id not in self._search_records:
+            self._search_record_ids.append(search_record.id)
+        self._search_records[search_record.id] = search_record
 
     def get_opportunity_collection(self, collection_id) -> OpportunityCollection | None:
-        return deepcopy(self._collections.get(collection_id))
+        return self._collections.get(collection_id)
 
     def put_opportunity_collection(self, collection: OpportunityCollection) -> None:
         if collection.id is None:
             raise ValueError("collection must have an id")
-        self._collections[collection.id] = deepcopy(collection)
+        self._collections[collection.id] = collection
 
 
 class MyProductConstraints(BaseModel):
@@ -189,6 +198,24 @@ product_test_spotlight_sync_async_opportunity = Product(
     order_parameters=MyOrderParameters,
 )
 
+product_test_spotlight_deferred_opportunity = Product(
+    id="test-spotlight",
+    title="Test Spotlight Product",
+    description="Test product for test spotlight",
+    license="CC-BY-4.0",
+    keywords=["test", "satellite"],
+    providers=[provider],
+    links=[],
+    create_order=mock_create_order,
+    search_opportunities=mock_search_opportunities_slowly,
+    search_opportunities_async=mock_search_opportunities_async,
+    get_opportunity_collection=mock_get_opportunity_collection,
+    defer_opportunity_search=mock_defer_opportunity_search,
+    constraints=MyProductConstraints,
+    opportunity_properties=MyOpportunityProperties,
+    order_parameters=MyOrderParameters,
+)
+
 product_test_satellite_provider_sync_opportunity = Product(
     id="test-satellite-provider",
     title="Satellite Product",
@@ -0,0 +1,227 @@
+from collections.abc import AsyncIterator, Generator
+from contextlib import asynccontextmanager
+from typing import Any
+
+import pytest
+from fastapi import FastAPI, status
+from fastapi.testclient import TestClient
+
+from stapi_fastapi.models.conformance import ASYNC_OPPORTUNITIES, CORE, OPPORTUNITIES
+from stapi_fastapi.models.opportunity import Opportunity
+from stapi_fastapi.routers.root_router import RootRouter
+
+from .backends import (
+    mock_get_opportunity_search_record,
+    mock_get_opportunity_search_records,
+    mock_get_order,
+    mock_get_order_statuses,
+    mock_get_orders,
+)
+from .shared import (
+    InMemoryOpportunityDB,
+    InMemoryOrderDB,
+    find_link,
+    product_test_spotlight,
+    product_test_spotlight_sync_async_opportunity,
+)
+
+PRODUCT_ID = "test-spotlight"
+
+ORDER = {
+    "geometry": {"type": "Point", "coordinates": [14.4, 56.5]},
+    "datetime": "2024-10-09T18:55:33Z/2024-10-12T18:55:33Z",
+    "filter": None,
+    "order_parameters": {"s3_path": "s3://my-bucket"},
+}
+
+
+def make_root_router(collapse_product_routes: bool) -> RootRouter:
+    return RootRouter(
+        get_orders=mock_get_orders,
+        get_order=mock_get_order,
+        get_order_statuses=mock_get_order_statuses,
+        get_opportunity_search_records=mock_get_opportunity_search_records,
+        get_opportunity_search_record=mock_get_opportunity_search_record,
+        conformances=[CORE, OPPORTUNITIES, ASYNC_OPPORTUNITIES],
+        collapse_product_routes=collapse_product_routes,
+    )
+
+
+@pytest.fixture
+def collapsed_client(
+    base_url: str,
+    mock_opportunities: list[Opportunity],
+) -> Generator[TestClient, None, None]:
+    @asynccontextmanager
+    async def lifespan(app: FastAPI) -> AsyncIterator[dict[str, Any]]:
+        yield {
+            "_orders_db": InMemoryOrderDB(),
+            "_opportunities_db": InMemoryOpportunityDB(),
+            "_opportunities": mock_opportunities,
+        }
+
+    root_router = make_root_router(collapse_product_routes=True)
+    root_router.add_product(product_test_spotlight_sync_async_opportunity)
+
+    app = FastAPI(lifespan=lifespan)
+    app.include_router(root_router, prefix="")
+
+    with TestClient(app, base_url=base_url) as client:
+        yield client
+
+
+def test_adding_products_adds_no_routes() -> None:
+    root_router = make_root_router(collapse_product_routes=True)
+    routes = len(root_router.routes)
+
+    for i in range(50):
+        root_router.add_product(
+            product_test_spotlight_sync_async_opportunity.model_copy(
+                update={"id": f"product-{i}"}
+            )
+        )
+
+    assert len(root_router.routes) == routes
+    assert len(root_router.product_routers) == 50
+
+
+def test_product_models_are_built_on_first_use() -> None:
+    root_router = make_root_router(collapse_product_routes=True)
+    root_router.add_product(product_test_spotlight_sync_async_opportunity)
+    product_router = root_router.product_routers[PRODUCT_ID]
+
+    assert "order_payload_model" not in product_router.__dict__
+    assert product_router.order_payload_model is product_router.order_payload_model
+
+
+def test_product_links_match_uncollapsed(
+    collapsed_client: TestClient, assert_link
+) -> None:
+    res = collapsed_client.get(f"/products/{PRODUCT_ID}")
+    assert res.status_code == status.HTTP_200_OK
+
+    body = res.json()
+    url = f"GET /products/{PRODUCT_ID}"
+    assert_link(url, body, "self", f"/products/{PRODUCT_ID}")
+    assert_link(url, body, "constraints", f"/products/{PRODUCT_ID}/constraints")
+    assert_link(
+        url, body, "order-parameters", f"/products/{PRODUCT_ID}/order-parameters"
+    )
+    assert_link(url, body, "opportunities", f"/products/{PRODUCT_ID}/opportunities")
+    assert_link(
+        url, body, "create-order", f"/products/{PRODUCT_ID}/orders", method="POST"
+    )
+
+    products = collapsed_client.get("/products").json()["products"]
+    assert products == [body]
+
+
+@pytest.mark.parametrize(
+    "method, path",
+    [
+        ("GET", "/products/unknown"),
+        ("GET", "/products/unknown/constraints"),
+        ("GET", "/products/unknown/order-parameters"),
+        ("POST", "/products/unknown/orders"),
+        ("GET", "/products/unknown/opportunities/some-collection"),
+    ],
+)
+def test_unknown_product(collapsed_client: TestClient, method: str, path: str) -> None:
+    res = collapsed_client.request(method, path, json=ORDER)
+    assert res.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_product_schemas(collapsed_client: TestClient) -> None:
+    constraints = collapsed_client.get(f"/products/{PRODUCT_ID}/constraints").json()
+    assert "off_nadir" in constraints["properties"]
+
+    parameters = collapsed_client.get(f"/products/{PRODUCT_ID}/order-parameters").json()
+    assert "s3_path" in parameters["properties"]
+
+
+def test_create_order(collapsed_client: TestClient) -> None:
+    res = collapsed_client.post(f"/products/{PRODUCT_ID}/orders", json=ORDER)
+    assert res.status_code == status.HTTP_201_CREATED, res.text
+    assert res.headers["Content-Type"] == "application/geo+json"
+
+    order = res.json()
+    link = find_link(order["links"], "self")
+    assert link
+    assert res.headers["Location"] == link["href"]
+    assert order["properties"]["order_parameters"] == {"s3_path": "s3://my-bucket"}
+
+
+def test_create_order_validates_product_order_parameters(
+    collapsed_client: TestClient,
+) -> None:
+    payload = {**ORDER, "order_parameters": {"unknown": "parameter"}}
+    res = collapsed_client.post(f"/products/{PRODUCT_ID}/orders", json=payload)
+    assert res.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    locations = [error["loc"] for error in res.json()["detail"]]
+    assert ["body", "order_parameters", "unknown"] in locations
+
+
+def test_search_opportunities(
+    collapsed_client: TestClient, opportunity_search: dict[str, Any]
+) -> None:
+    url = f"/products/{PRODUCT_ID}/opportunities"
+
+    res = collapsed_client.post(
+        url, json=opportunity_search, headers={"Prefer": "wait"}
+    )
+    assert res.status_code == status.HTTP_200_OK, res.text
+    assert res.headers["Preference-Applied"] == "wait"
+    body = res.json()
+    assert body["type"] == "FeatureCollection"
+    link = find_link(body["links"], "create-order")
+    assert link
+    assert link["href"].endswith(f"/products/{PRODUCT_ID}/orders")
+
+    res = collapsed_client.post(url, json=opportunity_search)
+    assert res.status_code == status.HTTP_201_CREATED, res.text
+    link = find_link(res.json()["links"], "self")
+    assert link
+    assert res.headers["Location"] == link["href"]
+
+
+def test_search_opportunities_unsupported(
+    base_url: str, opportunity_search: dict[str, Any]
+) -> None:
+    root_router = RootRouter(
+        get_orders=mock_get_orders,
+        get_order=mock_get_order,
+        get_order_statuses=mock_get_order_statuses,
+        collapse_product_routes=True,
+    )
+    root_router.add_product(product_test_spotlight)
+    app = FastAPI()
+    app.include_router(root_router)
+
+    with TestClient(app, base_url=base_url) as client:
+        res = client.post(
+            f"/products/{PRODUCT_ID}/opportunities", json=opportunity_search
+        )
+        assert res.status_code == status.HTTP_404_NOT_FOUND
+        assert (
+            find_link(
+                client.get(f"/products/{PRODUCT_ID}").json()["links"], "opportunities"
+            )
+            is None
+        )
+
+
+def test_openapi_is_independent_of_products() -> None:
+    def openapi_paths(products: int) -> dict[str, Any]:
+        root_router = make_root_router(collapse_product_routes=True)
+        for i in range(products):
+            root_router.add_product(
+                product_test_spotlight_sync_async_opportunity.model_copy(
+                    update={"id": f"product-{i}"}
+                )
+            )
+        app = FastAPI()
+        app.include_router(root_router)
+        return app.openapi()["paths"]
+
+    assert openapi_paths(1) == openapi_paths(20)
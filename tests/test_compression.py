@@ -0,0 +1,193 @@
+import asyncio
+import threading
+import zlib
+from collections.abc import Iterator
+
+import pytest
+from fastapi import FastAPI, status
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from starlette.types import Message
+
+from stapi_fastapi.compression import (
+    ENCODINGS,
+    CompressionMiddleware,
+    Encoding,
+    RouteCompression,
+    compressible,
+    install_compression,
+    negotiate_encoding,
+)
+from stapi_fastapi.metrics import CACHE_REQUESTS
+from stapi_fastapi.openapi import install_openapi_cache
+from stapi_fastapi.routers.root_router import RootRouter
+
+from .backends import mock_get_order, mock_get_order_statuses, mock_get_orders
+from .shared import product_test_spotlight_sync_opportunity
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, encoding",
+    [
+        ("", None),
+        ("identity", None),
+        ("gzip", "gzip"),
+        ("gzip;q=0", None),
+        ("br, gzip", "br"),
+        ("gzip;q=0.5, br", "br"),
+        ("br;q=0.5, zstd", "zstd"),
+        ("*", "zstd"),
+        ("*, zstd;q=0", "br"),
+        ("deflate, GZIP", "gzip"),
+    ],
+)
+def test_negotiate_encoding(accept_encoding: str, encoding: str | None) -> None:
+    assert negotiate_encoding(accept_encoding, ("zstd", "br", "gzip")) == encoding
+
+
+def test_compressible() -> None:
+    assert compressible("application/json")
+    assert compressible("application/geo+json; charset=utf-8")
+    assert compressible("text/html")
+    assert not compressible("image/png")
+    assert not compressible(None)
+
+
+@pytest.fixture
+def app() -> FastAPI:
+    root_router = RootRouter(
+        get_orders=mock_get_orders,
+        get_order=mock_get_order,
+        get_order_statuses=mock_get_order_statuses,
+    )
+    root_router.add_product(product_test_spotlight_sync_opportunity)
+    app = FastAPI()
+    app.include_router(root_router)
+
+    @app.get("/stream")
+    def stream() -> StreamingResponse:
+        return StreamingResponse(
+            iter([b'{"a":' + b"1" * 2000, b',"b":2}']), media_type="application/json"
+        )
+
+    @app.get("/small")
+    def small() -> dict[str, int]:
+        return {"a": 1}
+
+    install_openapi_cache(app, root_router)
+    install_compression(app, default=RouteCompression(minimum_size=512))
+    return app
+
+
+@pytest.fixture
+def client(app: FastAPI, base_url: str) -> Iterator[TestClient]:
+    with TestClient(app, base_url=base_url) as client:
+        yield client
+
+
+def test_catalog_responses_are_compressed_once(client: TestClient) -> None:
+    hits = CACHE_REQUESTS.value(cache="compression", result="hit")
+    misses = CACHE_REQUESTS.value(cache="compression", result="miss")
+
+    responses = [
+        client.get("/products", headers={"Accept-Encoding": "gzip"}) for _ in range(3)
+    ]
+
+    for res in responses:
+        assert res.status_code == status.HTTP_200_OK
+        assert res.headers["Content-Encoding"] == "gzip"
+        assert "Accept-Encoding" in res.headers["Vary"]
+        assert res.json()["products"][0]["id"] == "test-spotlight"
+    assert CACHE_REQUESTS.value(cache="compression", result="miss") == misses + 1
+    assert CACHE_REQUESTS.value(cache="compression", result="hit") == hits + 2
+
+
+def test_compression_off_the_event_loop_and_cache_keys() -> None:
+    threads: list[int] = []
+
+    def compress(body: bytes, level: int) -> bytes:
+        threads.append(threading.get_ident())
+        return zlib.compress(body, level)
+
+    gzip = ENCODINGS["gzip"]
+    encoding = Encoding("gzip", compress, gzip.compressor, 6, 9)
+    middleware = CompressionMiddleware(app=FastAPI())
+    body = b"x" * 1000
+
+    async def main() -> int:
+        await middleware.compress(encoding, 6, body, cache=True)
+        await middleware.compress(encoding, 9, body, cache=True)
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(main())
+    # only compression above the default level leaves the event loop
+    assert threads[0] == loop_thread
+    assert threads[1] != loop_thread
+    # the cache does not hold on to the uncompressed bodies
+    assert all(len(key[2]) < len(body) for key in middleware._cache)
+
+
+def test_uncompressed_when_not_accepted(client: TestClient) -> None:
+    res = client.get("/products", headers={"Accept-Encoding": "identity"})
+
+    assert res.status_code == status.HTTP_200_OK
+    assert "Content-Encoding" not in res.headers
+    assert int(res.headers["Content-Length"]) == len(res.content)
+
+
+def test_small_responses_are_not_compressed(client: TestClient) -> None:
+    res = client.get("/small", headers={"Accept-Encoding": "gzip"})
+
+    assert res.json() == {"a": 1}
+    assert "Content-Encoding" not in res.headers
+
+
+def test_streamed_responses_are_compressed_per_chunk(app: FastAPI) -> None:
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/stream",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"accept-encoding", b"gzip")],
+    }
+    messages: list[Message] = []
+
+    async def run() -> None:
+        requested, sent = False, asyncio.Event()
+
+        async def receive() -> Message:
+            nonlocal requested
+            if not requested:
+                requested = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await sent.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message: Message) -> None:
+            messages.append(message)
+            if not message.get("more_body", True):
+                sent.set()
+
+        await app(scope, receive, send)
+
+    asyncio.run(run())
+
+    start, *bodies = messages
+    headers = dict(start["headers"])
+    assert headers[b"content-encoding"] == b"gzip"
+    assert b"content-length" not in headers
+    # each chunk is flushed, so it decodes without waiting for the next one
+    decompressor = zlib.decompressobj(31)
+    first = decompressor.decompress(bodies[0]["body"])
+    assert first == b'{"a":' + b"1" * 2000
+    rest = b"".join(decompressor.decompress(body["body"]) for body in bodies[1:])
+    assert rest == b',"b":2}'
+    assert decompressor.eof
+
+
+def test_precompressed_responses_are_not_compressed_again(client: TestClient) -> None:
+    res = client.get("/openapi.json", headers={"Accept-Encoding": "gzip"})
+
+    assert res.headers["Content-Encoding"] == "gzip"
+    assert "/products/test-spotlight/orders" in res.json()["paths"]
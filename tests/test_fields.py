@@ -0,0 +1,90 @@
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from stapi_fastapi.fields import Fields
+
+from .shared import create_mock_opportunity
+
+
+def test_parse() -> None:
+    fields = Fields.parse("id, +properties.datetime,-links")
+
+    assert fields.include == {"id", "properties.datetime"}
+    assert fields.exclude == {"links"}
+    assert fields.include_tree == {
+        "id": True,
+        "type": True,
+        "properties": {"datetime": True},
+    }
+    assert fields.exclude_tree == {"links": True}
+
+
+@pytest.mark.parametrize("value", ["", "id,", "-", "properties..datetime"])
+def test_parse_invalid(value: str) -> None:
+    with pytest.raises(ValueError):
+        Fields.parse(value)
+
+
+def test_includes() -> None:
+    fields = Fields.parse("properties.datetime,properties,-properties.product_id")
+
+    assert fields.include_tree == {"type": True, "properties": True}
+    assert fields.includes("type")
+    assert fields.includes("properties")
+    assert fields.includes("properties.datetime")
+    assert not fields.includes("properties.product_id")
+    assert not fields.includes("links")
+
+    only_excluded = Fields.parse("-geometry")
+    assert only_excluded.include_tree is None
+    assert only_excluded.includes("links")
+    assert not only_excluded.includes("geometry")
+
+
+def test_member() -> None:
+    fields = Fields.parse("id,properties.datetime,-properties.datetime.x")
+
+    assert fields.member("properties") == Fields(
+        frozenset({"datetime"}), frozenset({"datetime.x"})
+    )
+
+
+def test_search_opportunities_fields(
+    stapi_client: TestClient, opportunity_search
+) -> None:
+    stapi_client.app_state["_opportunities"] = [create_mock_opportunity()]
+
+    res = stapi_client.post(
+        "/products/test-spotlight/opportunities?fields=id,properties.datetime",
+        json=opportunity_search,
+    )
+
+    assert res.status_code == status.HTTP_200_OK
+    body = res.json()
+    [feature] = body["features"]
+    assert feature.keys() == {"type", "id", "properties"}
+    assert feature["properties"].keys() == {"datetime"}
+    # the links of the collection are kept
+    assert [link["rel"] for link in body["links"]] == ["create-order"]
+
+
+def test_get_orders_fields(stapi_client: TestClient, opportunity_search) -> None:
+    stapi_client.post(
+        "/products/test-spotlight/orders",
+        json={**opportunity_search, "order_parameters": {"s3_path": "s3://x"}},
+    )
+
+    res = stapi_client.get("/orders", params={"fields": "-links,-geometry"})
+
+    assert res.status_code == status.HTTP_200_OK
+    [order] = res.json()["features"]
+    assert "links" not in order
+    assert "geometry" not in order
+    assert order["properties"]["status"]["status_code"] == "received"
+
+
+def test_invalid_fields(stapi_client: TestClient) -> None:
+    res = stapi_client.get("/orders", params={"fields": "id,,links"})
+
+    assert res.status_code == status.HTTP_400_BAD_REQUEST
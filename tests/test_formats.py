@@ -0,0 +1,270 @@
+import json
+import threading
+from collections.abc import Iterator
+from functools import lru_cache
+
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+from geojson_pydantic import Feature, Point
+from geojson_pydantic.types import Position2D
+from pydantic import ValidationError
+from pydantic_core import to_json
+
+from stapi_fastapi import formats
+from stapi_fastapi.constants import TYPE_GEOJSON
+from stapi_fastapi.fields import ALL_FIELDS
+from stapi_fastapi.formats import (
+    FORMATS,
+    TYPE_ARROW_STREAM,
+    TYPE_GEOJSON_SEQ,
+    TYPE_MSGPACK,
+    TYPE_NDJSON,
+    TYPE_PARQUET,
+    Format,
+    chunked,
+    feature_row,
+    link_header,
+    negotiate,
+)
+from stapi_fastapi.geometry import wkb
+from stapi_fastapi.models.opportunity import OpportunityProperties
+from stapi_fastapi.models.shared import Link
+
+from .shared import create_mock_opportunity
+
+
+@pytest.mark.parametrize(
+    "accept, media_type",
+    [
+        (None, TYPE_GEOJSON),
+        ("*/*", TYPE_GEOJSON),
+        ("text/html", TYPE_GEOJSON),
+        (TYPE_NDJSON, TYPE_NDJSON),
+        ("application/ndjson", TYPE_NDJSON),
+        (f"{TYPE_GEOJSON_SEQ}, {TYPE_GEOJSON};q=0.5", TYPE_GEOJSON_SEQ),
+        (f"{TYPE_GEOJSON_SEQ};q=0.2, */*;q=0.8", TYPE_GEOJSON),
+        (f"text/html, {TYPE_NDJSON};q=0.1", TYPE_NDJSON),
+    ],
+)
+def test_negotiate(accept: str | None, media_type: str) -> None:
+    assert negotiate(accept).media_type == media_type
+
+
+def test_chunked() -> None:
+    assert list(chunked([b"ab", b"c", b"de", b"f"], size=3)) == [b"abc", b"def"]
+    assert list(chunked([b"abcd", b"e"], size=3)) == [b"abcd", b"e"]
+    assert list(chunked([], size=3)) == []
+
+
+def test_link_header() -> None:
+    links = [
+        Link(href="http://stapiserver/orders?next=x", rel="next", type="a/b"),
+        Link(href="http://stapiserver/orders", rel="create", method="POST"),
+    ]
+    assert link_header(links) == (
+        '<http://stapiserver/orders?next=x>; rel="next"; type="a/b", '
+        '<http://stapiserver/orders>; rel="create"; method="POST"'
+    )
+
+
+def test_feature_row() -> None:
+    opportunity = create_mock_opportunity()
+
+    row = feature_row(opportunity)
+
+    assert row["id"] == opportunity.id
+    assert opportunity.geometry is not None
+    assert row["geometry"] == wkb(opportunity.geometry)
+    assert row["product_id"] == "xyz123"
+    assert row["platform"] == "platform_id"
+    # objects and arrays are JSON encoded
+    assert json.loads(row["off_nadir"]) == {"minimum": 20, "maximum": 22}
+    assert json.loads(row["vehicle_id"]) == [1]
+
+
+@pytest.fixture
+def opportunities_client(stapi_client: TestClient) -> TestClient:
+    stapi_client.app_state["_opportunities"] = [
+        create_mock_opportunity() for _ in range(3)
+    ]
+    return stapi_client
+
+
+def test_streamed_opportunities_are_validated(
+    stapi_client: TestClient, opportunity_search
+) -> None:
+    opportunity = create_mock_opportunity()
+    assert opportunity.properties is not None
+    # a feature of the generic model, without the properties of the product
+    properties = OpportunityProperties(
+        product_id="xyz123", datetime=opportunity.properties.datetime
+    )
+    stapi_client.app_state["_opportunities"] = [
+        opportunity,
+        opportunity.model_copy(update={"properties": properties}),
+    ]
+
+    with pytest.raises(ValidationError, match="off_nadir"):
+        stapi_client.post(
+            "/products/test-spotlight/opportunities", json=opportunity_search
+        )
+
+
+def test_first_chunk_is_rendered_off_the_event_loop(
+    monkeypatch: pytest.MonkeyPatch,
+    opportunities_client: TestClient,
+    opportunity_search,
+) -> None:
+    threads: list[int] = []
+
+    def write(features, links, members, fields) -> Iterator[bytes]:
+        threads.append(threading.get_ident())
+        yield b"".join(to_json(feature) for feature in features)
+
+    media_type = "application/x-test"
+    monkeypatch.setitem(FORMATS, media_type, Format(media_type, write))
+    monkeypatch.setattr(formats, "negotiate", lru_cache(negotiate.__wrapped__))
+
+    res = opportunities_client.post(
+        "/products/test-spotlight/opportunities",
+        json=opportunity_search,
+        headers={"Accept": media_type},
+    )
+
+    assert res.status_code == status.HTTP_200_OK
+    assert res.headers["Content-Type"] == media_type
+    assert opportunities_client.portal is not None
+    loop_thread = opportunities_client.portal.call(threading.get_ident)
+    assert len(threads) == 1 and threads[0] != loop_thread
+
+
+def test_search_opportunities_feature_collection(
+    opportunities_client: TestClient, opportunity_search
+) -> None:
+    res = opportunities_client.post(
+        "/products/test-spotlight/opportunities", json=opportunity_search
+    )
+
+    assert res.status_code == status.HTTP_200_OK
+    assert res.headers["Content-Type"] == TYPE_GEOJSON
+    assert res.headers["Vary"] == "Accept"
+    body = res.json()
+    assert list(body) == ["type", "features", "links", "id"]
+    assert len(body["features"]) == 3
+    assert [link["rel"] for link in body["links"]] == ["create-order"]
+
+
+@pytest.mark.parametrize("limit", [2])
+def test_search_opportunities_ndjson(
+    opportunities_client: TestClient, opportunity_search
+) -> None:
+    res = opportunities_client.post(
+        "/products/test-spotlight/opportunities",
+        json=opportunity_search,
+        headers={"Accept": TYPE_NDJSON},
+    )
+
+    assert res.status_code == status.HTTP_200_OK
+    assert res.headers["Content-Type"] == TYPE_NDJSON
+    lines = res.text.splitlines()
+    assert [json.loads(line)["type"] for line in lines] == ["Feature", "Feature"]
+    # the links of the collection are in the header
+    assert 'rel="create-order"' in res.headers["Link"]
+    assert 'rel="next"; type="application/json"; method="POST"' in res.headers["Link"]
+
+
+def test_get_orders_geojson_seq(stapi_client: TestClient, opportunity_search) -> None:
+    for _ in range(2):
+        stapi_client.post(
+            "/products/test-spotlight/orders",
+            json={**opportunity_search, "order_parameters": {"s3_path": "s3://x"}},
+        )
+
+    res = stapi_client.get("/orders", headers={"Accept": TYPE_GEOJSON_SEQ})
+
+    assert res.status_code == status.HTTP_200_OK
+    assert res.headers["Content-Type"] == TYPE_GEOJSON_SEQ
+    records = res.content.split(b"\x1e")
+    assert records[0] == b""
+    orders = [json.loads(record) for record in records[1:]]
+    assert len(orders) == 2
+    # the links of each order are added as it is written
+    assert all(
+        {link["rel"] for link in order["links"]} == {"self", "monitor"}
+        for order in orders
+    )
+
+
+def test_search_opportunities_msgpack(
+    opportunities_client: TestClient, opportunity_search
+) -> None:
+    msgpack = pytest.importorskip("msgpack")
+
+    res = opportunities_client.post(
+        "/products/test-spotlight/opportunities",
+        json=opportunity_search,
+        headers={"Accept": TYPE_MSGPACK},
+    )
+
+    assert res.status_code == status.HTTP_200_OK
+    assert res.headers["Content-Type"] == TYPE_MSGPACK
+    unpacker = msgpack.Unpacker(timestamp=3)
+    unpacker.feed(res.content)
+    features = list(unpacker)
+    assert [feature["type"] for feature in features] == ["Feature"] * 3
+    assert 'rel="create-order"' in res.headers["Link"]
+
+
+@pytest.mark.parametrize("media_type", [TYPE_ARROW_STREAM, TYPE_PARQUET])
+def test_search_opportunities_arrow(
+    opportunities_client: TestClient, opportunity_search, media_type: str
+) -> None:
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+
+    res = opportunities_client.post(
+        "/products/test-spotlight/opportunities",
+        json=opportunity_search,
+        headers={"Accept": media_type},
+    )
+
+    assert res.status_code == status.HTTP_200_OK
+    assert res.headers["Content-Type"] == media_type
+    if media_type == TYPE_PARQUET:
+        table = pq.read_table(pa.BufferReader(res.content))
+        geo = json.loads(table.schema.metadata[b"geo"])
+        assert geo["columns"]["geometry"]["encoding"] == "WKB"
+    else:
+        table = pa.ipc.open_stream(res.content).read_all()
+    assert table.num_rows == 3
+    assert table.column_names[:2] == ["id", "geometry"]
+    assert "product_id" in table.column_names
+
+
+@pytest.mark.parametrize("media_type", [TYPE_ARROW_STREAM, TYPE_PARQUET])
+def test_arrow_schema_is_unified_across_batches(
+    media_type: str, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    monkeypatch.setattr(formats, "BATCH_SIZE", 1)
+
+    features = [
+        Feature(
+            type="Feature",
+            geometry=Point(type="Point", coordinates=Position2D(0.0, 0.0)),
+            properties=properties,
+        )
+        for properties in ({"a": None, "b": 1}, {"a": "x", "b": 1.5}, {"b": 2})
+    ]
+    body = b"".join(FORMATS[media_type].write(features, [], {}, ALL_FIELDS))
+
+    if media_type == TYPE_PARQUET:
+        table = pq.read_table(pa.BufferReader(body))
+    else:
+        table = pa.ipc.open_stream(body).read_all()
+    assert table.schema.field("a").type == pa.string()
+    assert table.schema.field("b").type == pa.float64()
+    assert table.column("a").to_pylist() == [None, "x", None]
+    assert table.column("b").to_pylist() == [1.0, 1.5, 2.0]
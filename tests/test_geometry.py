@@ -0,0 +1,212 @@
+import struct
+from typing import Any
+
+import pytest
+from geojson_pydantic import (
+    GeometryCollection,
+    LineString,
+    MultiPolygon,
+    Point,
+    Polygon,
+)
+from geojson_pydantic.geometries import Geometry
+from geojson_pydantic.types import Position2D, Position3D
+
+from stapi_fastapi.geometry import (
+    GeometryReducer,
+    bounds,
+    intersects,
+    quantize,
+    simplify,
+    wkb,
+)
+
+SQUARE: list[list[Position2D | Position3D]] = [
+    [
+        Position2D(0.0, 0.0),
+        Position2D(1.0, 0.0),
+        Position2D(1.0, 1.0),
+        Position2D(0.0, 0.0),
+    ]
+]
+
+
+def coordinates(geometry: Geometry) -> Any:
+    return geometry.model_dump()["coordinates"]
+
+
+def test_bounds() -> None:
+    polygon = Polygon(type="Polygon", coordinates=SQUARE)
+    assert bounds(polygon) == (0.0, 0.0, 1.0, 1.0)
+
+
+@pytest.mark.parametrize(
+    "geometry, expected",
+    [
+        (
+            Point(type="Point", coordinates=Position2D(1.0, 2.0)),
+            "0101000000000000000000f03f0000000000000040",
+        ),
+        (
+            Point(type="Point", coordinates=Position3D(1.0, 2.0, 3.0)),
+            "01e9030000000000000000f03f00000000000000400000000000000840",
+        ),
+        (
+            LineString(
+                type="LineString",
+                coordinates=[Position2D(0.0, 0.0), Position2D(1.0, 1.0)],
+            ),
+            "010200000002000000"
+            "00000000000000000000000000000000"
+            "000000000000f03f000000000000f03f",
+        ),
+    ],
+)
+def test_wkb(geometry: Geometry, expected: str) -> None:
+    assert wkb(geometry).hex() == expected
+
+
+def test_wkb_nested() -> None:
+    polygon = Polygon(type="Polygon", coordinates=SQUARE)
+    multi_polygon = MultiPolygon(type="MultiPolygon", coordinates=[SQUARE, SQUARE])
+    collection = GeometryCollection(
+        type="GeometryCollection", geometries=[polygon, multi_polygon]
+    )
+
+    encoded_polygon = wkb(polygon)
+    # header, ring count, position count and four positions
+    assert encoded_polygon[:13] == struct.pack("<BIII", 1, 3, 1, 4)
+    assert len(encoded_polygon) == 13 + 4 * 16
+    assert wkb(multi_polygon) == struct.pack("<BII", 1, 6, 2) + encoded_polygon * 2
+    assert wkb(collection) == (
+        struct.pack("<BII", 1, 7, 2) + encoded_polygon + wkb(multi_polygon)
+    )
+
+
+def test_quantize() -> None:
+    line = LineString(
+        type="LineString",
+        coordinates=[
+            Position2D(0.123456789, 1.987654321),
+            Position2D(0.1234, 1.9876),
+            Position2D(2.0, 3.0),
+        ],
+    )
+
+    point = Point(type="Point", coordinates=Position3D(1.26, 2.0, 3.04))
+
+    # the second position rounds to the first and is dropped
+    assert coordinates(quantize(line, 3)) == [(0.123, 1.988), (2.0, 3.0)]
+    assert coordinates(quantize(point, 1)) == (1.3, 2.0, 3.0)
+
+
+def test_quantize_keeps_rings_closed() -> None:
+    tiny: list[list[Position2D | Position3D]] = [
+        [
+            Position2D(0.0, 0.0),
+            Position2D(0.001, 0.0),
+            Position2D(0.001, 0.001),
+            Position2D(0.0, 0.0),
+        ]
+    ]
+    polygon = Polygon(type="Polygon", coordinates=tiny)
+
+    # collapsing the ring would make the polygon invalid
+    assert len(coordinates(quantize(polygon, 1))[0]) == 4
+
+
+def test_simplify() -> None:
+    line = LineString(
+        type="LineString",
+        coordinates=[
+            Position2D(0.0, 0.0),
+            Position2D(1.0, 0.01),
+            Position2D(2.0, -0.01),
+            Position2D(3.0, 1.0),
+            Position2D(4.0, 0.0),
+        ],
+    )
+
+    assert coordinates(simplify(line, 0.1)) == [
+        (0.0, 0.0),
+        (2.0, -0.01),
+        (3.0, 1.0),
+        (4.0, 0.0),
+    ]
+    assert coordinates(simplify(line, 2.0)) == [(0.0, 0.0), (4.0, 0.0)]
+    # rings are not simplified below four positions
+    polygon = Polygon(type="Polygon", coordinates=SQUARE)
+    assert simplify(polygon, 10.0) == polygon
+
+
+def test_geometry_reducer_reduces_shared_geometries_once() -> None:
+    reducer = GeometryReducer(precision=0, tolerance=None)
+    point = Point(type="Point", coordinates=Position2D(1.4, 2.6))
+
+    first, second = reducer.reduce(point), reducer.reduce(point)
+
+    assert coordinates(first) == (1.0, 3.0)
+    assert first is second
+
+
+DONUT = Polygon(
+    type="Polygon",
+    coordinates=[
+        [
+            Position2D(0.0, 0.0),
+            Position2D(10.0, 0.0),
+            Position2D(10.0, 10.0),
+            Position2D(0.0, 10.0),
+            Position2D(0.0, 0.0),
+        ],
+        [
+            Position2D(4.0, 4.0),
+            Position2D(6.0, 4.0),
+            Position2D(6.0, 6.0),
+            Position2D(4.0, 6.0),
+            Position2D(4.0, 4.0),
+        ],
+    ],
+)
+
+
+def point(x: float, y: float) -> Point:
+    return Point(type="Point", coordinates=Position2D(x, y))
+
+
+def line(*positions: tuple[float, float]) -> LineString:
+    return LineString(
+        type="LineString", coordinates=[Position2D(x, y) for x, y in positions]
+    )
+
+
+@pytest.mark.parametrize(
+    "geometry, expected",
+    [
+        (point(1.0, 1.0), True),
+        # on the boundary
+        (point(10.0, 5.0), True),
+        (point(11.0, 5.0), False),
+        # in the hole, and on its boundary
+        (point(5.0, 5.0), False),
+        (point(4.0, 5.0), True),
+        (line((5.0, 5.0), (5.5, 5.5)), False),
+        (line((5.0, 5.0), (20.0, 5.0)), True),
+        (line((-1.0, -1.0), (-1.0, 20.0)), False),
+        # touching at a corner
+        (line((10.0, 10.0), (20.0, 20.0)), True),
+        (Polygon.from_bounds(1.0, 1.0, 2.0, 2.0), True),
+        (Polygon.from_bounds(-5.0, -5.0, 20.0, 20.0), True),
+        (Polygon.from_bounds(4.5, 4.5, 5.5, 5.5), False),
+        (
+            GeometryCollection(
+                type="GeometryCollection",
+                geometries=[point(20.0, 20.0), point(5.0, 1.0)],
+            ),
+            True,
+        ),
+    ],
+)
+def test_intersects(geometry: Geometry, expected: bool) -> None:
+    assert intersects(geometry, DONUT) is expected
+    assert intersects(DONUT, geometry) is expected
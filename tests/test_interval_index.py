@@ -0,0 +1,58 @@
+import math
+import random
+
+import pytest
+
+from stapi_fastapi.indexes import IntervalIndex
+from stapi_fastapi.indexes.interval import Interval
+
+
+def random_intervals(count: int, seed: int = 0) -> dict[int, Interval]:
+    rng = random.Random(seed)
+    intervals = {}
+    for key in range(count):
+        start = rng.uniform(0, 1000)
+        intervals[key] = (start, start + rng.choice([0, 1, 10, 100]))
+    return intervals
+
+
+def brute_force(intervals: dict[int, Interval], start: float, end: float) -> set[int]:
+    return {key for key, (s, e) in intervals.items() if s <= end and e >= start}
+
+
+QUERIES = [(0.0, 10.0), (500.0, 500.0), (-math.inf, 100.0), (990.0, math.inf)]
+
+
+def test_overlapping() -> None:
+    intervals = random_intervals(1000)
+    index = IntervalIndex(intervals.items())
+
+    assert len(index) == 1000
+    for start, end in QUERIES:
+        found = index.overlapping(start, end)
+        assert set(found) == brute_force(intervals, start, end)
+        # ordered by start
+        assert found == sorted(found, key=lambda key: intervals[key][0])
+
+
+def test_insert_replace_and_remove() -> None:
+    intervals = random_intervals(200)
+    index = IntervalIndex(intervals.items())
+    rng = random.Random(1)
+
+    for key in rng.sample(sorted(intervals), 50):
+        intervals[key] = (0.0, 1000.0)
+        index.insert(key, intervals[key])
+    for key in rng.sample(sorted(intervals), 50):
+        del intervals[key]
+        assert index.remove(key)
+    assert not index.remove(-1)
+    index.insert(-2, (5.0, 5.0))
+    intervals[-2] = (5.0, 5.0)
+
+    assert all(index.get(key) == interval for key, interval in intervals.items())
+    for start, end in QUERIES:
+        assert set(index.overlapping(start, end)) == brute_force(intervals, start, end)
+
+    with pytest.raises(ValueError):
+        index.insert(-3, (2.0, 1.0))
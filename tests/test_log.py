@@ -0,0 +1,140 @@
+import atexit
+import io
+import json
+import logging
+import queue
+from collections.abc import Iterator
+
+import pytest
+
+from stapi_fastapi.log import (
+    LOG_RECORDS_DROPPED,
+    REDACTED,
+    ErrorStormFilter,
+    JSONFormatter,
+    NonBlockingQueueHandler,
+    install_logging,
+    redact,
+)
+
+
+def record(
+    level: int = logging.ERROR, msg: str = "failed: %s", **extra
+) -> logging.LogRecord:
+    record = logging.LogRecord("test", level, __file__, 1, msg, ("boom",), None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_redact() -> None:
+    payload = {
+        "Authorization": "api-key 1234",
+        "nested": {"api_key": "1234", "name": "x" * 20},
+        "coordinates": list(range(5)),
+    }
+    assert redact(payload) == {
+        "Authorization": REDACTED,
+        "nested": {"api_key": REDACTED, "name": "x" * 20},
+        "coordinates": [0, 1, 2, 3, 4],
+    }
+    assert redact(payload, max_length=5, max_items=2) == {
+        "Authorization": REDACTED,
+        "nested": {"api_key": REDACTED, "name": "xxxxx... (20 characters)"},
+        "coordinates": [0, 1, "... 3 more"],
+    }
+
+
+def test_json_formatter_truncates_above_debug() -> None:
+    formatter = JSONFormatter(max_length=5, max_items=1)
+    payload = {"items": [1, 2, 3], "token": "secret"}
+
+    entry = json.loads(formatter.format(record(payload=payload)))
+    assert entry["level"] == "ERROR"
+    assert entry["logger"] == "test"
+    assert entry["message"] == "faile... (12 characters)"
+    assert entry["payload"] == {"items": [1, "... 2 more"], "token": REDACTED}
+
+    entry = json.loads(formatter.format(record(logging.DEBUG, payload=payload)))
+    assert entry["message"] == "failed: boom"
+    assert entry["payload"] == {"items": [1, 2, 3], "token": REDACTED}
+
+
+def test_json_formatter_exception() -> None:
+    try:
+        raise ValueError("boom")
+    except ValueError as e:
+        exc_record = record(exc_info=None)
+        exc_record.exc_info = (type(e), e, e.__traceback__)
+    entry = json.loads(JSONFormatter().format(exc_record))
+    assert "ValueError: boom" in entry["exception"]
+
+
+def test_error_storm_filter(monkeypatch: pytest.MonkeyPatch) -> None:
+    now = 1000.0
+    monkeypatch.setattr("stapi_fastapi.log.time.monotonic", lambda: now)
+    storm = ErrorStormFilter(burst=2, window=10)
+    sampled = LOG_RECORDS_DROPPED.value(reason="sampled")
+
+    assert [storm.filter(record()) for _ in range(5)] == [
+        True,
+        True,
+        False,
+        False,
+        False,
+    ]
+    # other kinds of records, and records below the level, are not affected
+    assert storm.filter(record(msg="other"))
+    assert storm.filter(record(logging.INFO))
+    assert LOG_RECORDS_DROPPED.value(reason="sampled") == sampled + 3
+
+    now += 10
+    next_window = record()
+    assert storm.filter(next_window)
+    assert next_window.suppressed == 3  # type: ignore[attr-defined]
+
+
+def test_queue_handler_defers_formatting_and_drops_when_full() -> None:
+    records: queue.Queue[logging.LogRecord] = queue.Queue(maxsize=1)
+    handler = NonBlockingQueueHandler(records)
+    dropped = LOG_RECORDS_DROPPED.value(reason="queue_full")
+
+    first = record()
+    handler.emit(first)
+    handler.emit(record())
+
+    queued = records.get_nowait()
+    assert queued is first
+    assert queued.args == ("boom",)
+    assert LOG_RECORDS_DROPPED.value(reason="queue_full") == dropped + 1
+
+
+@pytest.fixture
+def restore_root_logger() -> Iterator[None]:
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    yield
+    root.handlers[:] = handlers
+    root.setLevel(level)
+
+
+@pytest.mark.usefixtures("restore_root_logger")
+def test_install_logging() -> None:
+    stream = io.StringIO()
+    install_logging(logging.INFO, stream=stream)
+    listener = install_logging(logging.INFO, stream=stream)
+    assert (
+        sum(
+            isinstance(handler, NonBlockingQueueHandler)
+            for handler in logging.getLogger().handlers
+        )
+        == 1
+    )
+
+    logging.getLogger("stapi_fastapi.test").info("hello %s", "world")
+    logging.getLogger("stapi_fastapi.test").debug("not logged")
+    # stopping flushes the queue
+    listener.stop()
+    atexit.unregister(listener.stop)
+
+    lines = stream.getvalue().splitlines()
+    assert [json.loads(line)["message"] for line in lines] == ["hello world"]
@@ -0,0 +1,55 @@
+import json
+import logging
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from stapi_fastapi.log import JSONFormatter
+from stapi_fastapi.loop_monitor import LOOP_BLOCKED, LOOP_LAG, install_loop_monitor
+
+
+@pytest.fixture
+def client() -> TestClient:
+    app = FastAPI()
+
+    @app.get("/blocking", name="blocking")
+    async def blocking() -> str:
+        time.sleep(0.3)
+        return "done"
+
+    @app.get("/sleeping", name="sleeping")
+    async def sleeping() -> str:
+        return "done"
+
+    install_loop_monitor(app, interval=0.01, threshold=0.1)
+    return TestClient(app)
+
+
+def test_blocking_call_is_logged(
+    client: TestClient, caplog: pytest.LogCaptureFixture
+) -> None:
+    blocked = LOOP_BLOCKED.value(route="blocking")
+    with caplog.at_level(logging.WARNING, logger="stapi_fastapi.loop_monitor"):
+        assert client.get("/blocking").status_code == 200
+
+    (record,) = caplog.records
+    assert record.route == "blocking"  # type: ignore[attr-defined]
+    # the innermost frame is the blocking call
+    assert "time.sleep(0.3)" in record.stack[0]  # type: ignore[attr-defined]
+    assert LOOP_BLOCKED.value(route="blocking") == blocked + 1
+
+    # and is kept when long extras are truncated
+    entry = json.loads(JSONFormatter(max_length=200, max_items=2).format(record))
+    assert "in blocking" in entry["stack"][0]
+
+
+def test_lag_is_measured(client: TestClient, caplog: pytest.LogCaptureFixture) -> None:
+    with client:
+        beats = LOOP_LAG.count()
+        with caplog.at_level(logging.WARNING, logger="stapi_fastapi.loop_monitor"):
+            assert client.get("/sleeping").status_code == 200
+            time.sleep(0.1)
+        assert LOOP_LAG.count() > beats
+    assert not caplog.records
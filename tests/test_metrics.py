@@ -0,0 +1,168 @@
+import json
+import os
+import threading
+from collections.abc import Iterator
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from stapi_fastapi.metrics import (
+    CONTENT_TYPE,
+    REQUEST_DURATION,
+    Counter,
+    Gauge,
+    Histogram,
+    Registry,
+    install_metrics,
+)
+from stapi_fastapi.routers.root_router import RootRouter
+
+from .backends import mock_get_order, mock_get_order_statuses, mock_get_orders
+from .shared import product_test_spotlight_sync_opportunity
+
+PRODUCT_ID = product_test_spotlight_sync_opportunity.id
+
+
+def test_exposition() -> None:
+    registry = Registry()
+    requests = Counter("requests_total", "Requests.", ["code"], registry=registry)
+    in_flight = Gauge("in_flight", "In flight.", registry=registry)
+    latency = Histogram(
+        "latency_seconds", "Latency.", ["route"], registry=registry, buckets=(0.1, 1)
+    )
+
+    requests.inc(code=200)
+    requests.inc(2, code=200)
+    requests.inc(code='5"00')
+    in_flight.inc()
+    in_flight.inc()
+    in_flight.dec()
+    latency.observe(0.05, route="a")
+    latency.observe(0.5, route="a")
+    latency.observe(5, route="a")
+
+    assert registry.exposition() == (
+        "# HELP in_flight In flight.\n"
+        "# TYPE in_flight gauge\n"
+        "in_flight 1.0\n"
+        "# HELP latency_seconds Latency.\n"
+        "# TYPE latency_seconds histogram\n"
+        'latency_seconds_bucket{route="a",le="0.1"} 1\n'
+        'latency_seconds_bucket{route="a",le="1.0"} 2\n'
+        'latency_seconds_bucket{route="a",le="+Inf"} 3\n'
+        'latency_seconds_sum{route="a"} 5.55\n'
+        'latency_seconds_count{route="a"} 3\n'
+        "# HELP requests_total Requests.\n"
+        "# TYPE requests_total counter\n"
+        'requests_total{code="200"} 3.0\n'
+        'requests_total{code="5\\"00"} 1.0\n'
+    )
+
+
+def test_labels_must_match() -> None:
+    registry = Registry()
+    counter = Counter("c", "C.", ["a"], registry=registry)
+    with pytest.raises(ValueError):
+        counter.inc()
+    with pytest.raises(ValueError):
+        Counter("c", "C again.", registry=registry)
+
+
+def test_workers_are_added_up(tmp_path) -> None:
+    registry = Registry(directory=tmp_path)
+    requests = Counter("requests_total", "Requests.", registry=registry)
+    in_flight = Gauge("in_flight", "In flight.", registry=registry)
+    latency = Histogram("latency", "Latency.", registry=registry, buckets=(1,))
+    requests.inc(3)
+    in_flight.inc(2)
+    latency.observe(0.5)
+
+    # another worker, which has exited since
+    other = Registry()
+    Counter("requests_total", "Requests.", registry=other).inc(4)
+    Gauge("in_flight", "In flight.", registry=other).inc(5)
+    Histogram("latency", "Latency.", registry=other, buckets=(1,)).observe(2)
+    (tmp_path / "metrics-999999999.json").write_text(json.dumps(other.snapshot()))
+
+    merged = registry.collect()
+    assert merged["requests_total"]["samples"] == [[[], 7]]
+    assert merged["in_flight"]["samples"] == [[[], 2]]
+    assert merged["latency"]["samples"] == [[[], [[1, 1], 2.5, 2]]]
+    assert (tmp_path / f"metrics-{os.getpid()}.json").exists()
+
+
+def test_snapshots_are_written_off_the_event_loop(tmp_path) -> None:
+    registry = Registry(directory=tmp_path, flush_interval=0)
+    threads: list[int] = []
+    flush, collect = registry.flush, registry.collect
+
+    def record_flush(force: bool = False) -> None:
+        threads.append(threading.get_ident())
+        flush(force)
+
+    def record_collect() -> dict:
+        threads.append(threading.get_ident())
+        return collect()
+
+    registry.flush = record_flush  # type: ignore[method-assign]
+    registry.collect = record_collect  # type: ignore[method-assign]
+    app = FastAPI()
+
+    @app.get("/loop")
+    async def loop() -> int:
+        return threading.get_ident()
+
+    install_metrics(app, registry=registry)
+
+    with TestClient(app) as client:
+        loop_thread = client.get("/loop").json()
+        assert client.get("/metrics").status_code == 200
+
+    assert threads and loop_thread not in threads
+    assert (tmp_path / f"metrics-{os.getpid()}.json").exists()
+
+
+@pytest.fixture
+def client(base_url: str) -> Iterator[TestClient]:
+    root_router = RootRouter(
+        get_orders=mock_get_orders,
+        get_order=mock_get_order,
+        get_order_statuses=mock_get_order_statuses,
+        collapse_product_routes=True,
+    )
+    root_router.add_product(product_test_spotlight_sync_opportunity)
+    app = FastAPI()
+    app.include_router(root_router)
+    install_metrics(app)
+
+    with TestClient(app, base_url=base_url) as client:
+        yield client
+
+
+def test_request_metrics(client: TestClient) -> None:
+    labels = dict(route="get-product", product=PRODUCT_ID, method="GET", status=200)
+    unknown = dict(route="get-product", product="", method="GET", status=404)
+    before = REQUEST_DURATION.count(**labels)
+    before_unknown = REQUEST_DURATION.count(**unknown)
+
+    assert client.get(f"/products/{PRODUCT_ID}").status_code == 200
+    assert client.get("/products/unknown").status_code == 404
+
+    assert REQUEST_DURATION.count(**labels) == before + 1
+    assert REQUEST_DURATION.count(**unknown) == before_unknown + 1
+
+    # unknown product ids are not used as labels whatever the status
+    invalid = dict(route="search-opportunities", product="", method="POST", status=422)
+    before_invalid = REQUEST_DURATION.count(**invalid)
+    res = client.post("/products/random/opportunities", json={})
+    assert res.status_code == 422
+    assert REQUEST_DURATION.count(**invalid) == before_invalid + 1
+
+    res = client.get("/metrics")
+    assert res.headers["Content-Type"] == CONTENT_TYPE
+    assert (
+        'stapi_request_duration_seconds_count{route="get-product",'
+        f'product="{PRODUCT_ID}",method="GET",status="200"}}'
+    ) in res.text
+    assert "stapi_requests_in_progress 1.0" in res.text
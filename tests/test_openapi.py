@@ -0,0 +1,171 @@
+import gzip
+import json
+from collections.abc import Iterator
+
+import pytest
+from fastapi import FastAPI, status
+from fastapi.testclient import TestClient
+
+from stapi_fastapi.openapi import (
+    OpenAPICache,
+    _reset_locks_after_fork,
+    install_openapi_cache,
+)
+from stapi_fastapi.routers.root_router import RootRouter
+
+from .backends import mock_get_order, mock_get_order_statuses, mock_get_orders
+from .shared import (
+    find_link,
+    product_test_satellite_provider_sync_opportunity,
+    product_test_spotlight_sync_opportunity,
+)
+
+
+@pytest.fixture
+def root_router() -> RootRouter:
+    root_router = RootRouter(
+        get_orders=mock_get_orders,
+        get_order=mock_get_order,
+        get_order_statuses=mock_get_order_statuses,
+    )
+    root_router.add_product(product_test_spotlight_sync_opportunity)
+    return root_router
+
+
+@pytest.fixture
+def app(root_router: RootRouter) -> FastAPI:
+    app = FastAPI()
+    app.include_router(root_router)
+    return app
+
+
+@pytest.fixture
+def cache(app: FastAPI, root_router: RootRouter) -> OpenAPICache:
+    return install_openapi_cache(app, root_router)
+
+
+@pytest.fixture
+def client(app: FastAPI, cache: OpenAPICache, base_url: str) -> Iterator[TestClient]:
+    with TestClient(app, base_url=base_url) as client:
+        yield client
+
+
+def test_document_is_generated_on_install(
+    app: FastAPI, cache: OpenAPICache, client: TestClient, monkeypatch
+) -> None:
+    def fail():
+        raise AssertionError("the document should not be generated per request")
+
+    monkeypatch.setattr(app, "openapi", fail)
+
+    res = client.get("/openapi.json", headers={"Accept-Encoding": "identity"})
+    assert res.status_code == status.HTTP_200_OK
+    assert res.headers["Content-Type"] == "application/json"
+    assert res.headers["ETag"] == cache.document().etag
+    assert "/products/test-spotlight/orders" in res.json()["paths"]
+
+
+def test_document_is_precompressed(client: TestClient, cache: OpenAPICache) -> None:
+    res = client.get("/openapi.json", headers={"Accept-Encoding": "gzip"})
+    assert res.headers["Content-Encoding"] == "gzip"
+    assert res.headers["Vary"] == "Accept-Encoding"
+    assert res.headers["ETag"] == cache.document().etag_for("gzip")
+    assert gzip.decompress(cache.document().encodings["gzip"]) == res.content
+
+    res = client.get("/openapi.json", headers={"Accept-Encoding": "gzip;q=0"})
+    assert "Content-Encoding" not in res.headers
+    assert res.headers["ETag"] == cache.document().etag
+    assert json.loads(res.content) == json.loads(cache.document().body)
+
+
+def test_conditional_request(client: TestClient) -> None:
+    etag = client.get("/openapi.json").headers["ETag"]
+
+    res = client.get("/openapi.json", headers={"If-None-Match": etag})
+    assert res.status_code == status.HTTP_304_NOT_MODIFIED
+    assert res.headers["ETag"] == etag
+    assert not res.content
+
+    res = client.get("/openapi.json", headers={"If-None-Match": f'W/{etag}, "x"'})
+    assert res.status_code == status.HTTP_304_NOT_MODIFIED
+
+    res = client.get("/openapi.json", headers={"If-None-Match": '"stale"'})
+    assert res.status_code == status.HTTP_200_OK
+
+
+def test_encodings_have_their_own_etags(client: TestClient) -> None:
+    gzipped = client.get("/openapi.json", headers={"Accept-Encoding": "gzip"})
+    identity_etag = client.get(
+        "/openapi.json", headers={"Accept-Encoding": "identity"}
+    ).headers["ETag"]
+    assert gzipped.headers["ETag"] == f'{identity_etag[:-1]}-gzip"'
+
+    # a cached representation in another encoding is still current
+    res = client.get(
+        "/openapi.json",
+        headers={
+            "Accept-Encoding": "identity",
+            "If-None-Match": gzipped.headers["ETag"],
+        },
+    )
+    assert res.status_code == status.HTTP_304_NOT_MODIFIED
+    assert res.headers["ETag"] == identity_etag
+
+
+def test_document_is_regenerated_when_products_change(
+    app: FastAPI, client: TestClient, root_router: RootRouter, monkeypatch
+) -> None:
+    builds = []
+    openapi = app.openapi
+
+    def counting_openapi():
+        builds.append(root_router.products_version)
+        return openapi()
+
+    monkeypatch.setattr(app, "openapi", counting_openapi)
+
+    client.get("/openapi.json")
+    assert builds == []
+
+    root_router.add_product(product_test_satellite_provider_sync_opportunity)
+    client.get("/openapi.json")
+    client.get("/openapi.json")
+    assert builds == [root_router.products_version]
+
+
+def test_service_description_link(client: TestClient, url_for) -> None:
+    link = find_link(client.get("/").json()["links"], "service-description")
+    assert link
+    assert link["href"] == url_for("/openapi.json")
+
+
+def test_root_path_is_added_to_servers(
+    app: FastAPI, cache: OpenAPICache, base_url: str
+) -> None:
+    with TestClient(app, base_url=base_url, root_path="/stapi") as client:
+        document = client.get("/stapi/openapi.json").json()
+
+    assert {"url": "/stapi"} in document["servers"]
+    assert cache.document("/stapi") is not cache.document()
+
+
+def test_document_is_generated_in_background(
+    app: FastAPI, root_router: RootRouter, base_url: str
+) -> None:
+    cache = install_openapi_cache(app, root_router, background=True)
+
+    with TestClient(app, base_url=base_url) as client:
+        res = client.get("/openapi.json", headers={"Accept-Encoding": "identity"})
+
+    assert res.status_code == status.HTTP_200_OK
+    assert res.headers["ETag"] == cache.document().etag
+
+
+def test_lock_held_at_fork_is_reset(cache: OpenAPICache) -> None:
+    # as if forked while the document was being generated in the background
+    cache._lock.acquire()
+    cache._documents.clear()
+    _reset_locks_after_fork()
+
+    assert not cache._lock.locked()
+    assert cache.document().body
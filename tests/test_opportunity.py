@@ -1,11 +1,33 @@
+from typing import Any
+
 import pytest
+from fastapi import FastAPI
 from fastapi.testclient import TestClient
 
+from planet import backends as planet_backends
+from planet.conversions import order_name
+from planet.models import (
+    PlanetOpportunityProperties,
+    PlanetOrderParameters,
+    PlanetProductConstraints,
+    provider_planet,
+)
+from stapi_fastapi import Product
+from stapi_fastapi.backends import SQLiteOrderStore
+from stapi_fastapi.models.conformance import CORE, OPPORTUNITIES
 from stapi_fastapi.models.opportunity import (
     OpportunityCollection,
 )
+from stapi_fastapi.routers.root_router import RootRouter
 
-from .shared import create_mock_opportunity, pagination_tester
+from .backends import mock_get_order, mock_get_order_statuses, mock_get_orders
+from .shared import (
+    create_mock_opportunity,
+    pagination_tester,
+    product_test_satellite_provider_sync_opportunity,
+    product_test_spotlight,
+    product_test_spotlight_deferred_opportunity,
+)
 
 
 def test_search_opportunities_response(
@@ -60,3 +82,298 @@ def test_search_opportunities_pagination(
         expected_returns=expected_returns,
         body=opportunity_search,
     )
+
+
+def test_search_opportunities_geometry_reduction(
+    stapi_client: TestClient, opportunity_search
+) -> None:
+    coordinates = [[[0.123456789, 0.0], [1.0, 0.0], [1.0, 1.0], [0.123456789, 0.0]]]
+    search = {
+        **opportunity_search,
+        "geometry": {"type": "Polygon", "coordinates": coordinates},
+    }
+
+    response = stapi_client.post(
+        "/products/test-spotlight/opportunities?precision=2&simplify=0.001",
+        json=search,
+    )
+
+    assert response.status_code == 200
+    geometry = response.json()["features"][0]["geometry"]
+    assert geometry["coordinates"] == [
+        [[0.12, 0.0], [1.0, 0.0], [1.0, 1.0], [0.12, 0.0]]
+    ]
+
+    response = stapi_client.post(
+        "/products/test-spotlight/opportunities?precision=16", json=search
+    )
+    assert response.status_code == 422
+
+
+@pytest.mark.conformances([CORE, OPPORTUNITIES])
+def test_search_products_opportunities(
+    stapi_client: TestClient, opportunity_search
+) -> None:
+    product_ids = ["test-spotlight", "test-satellite-provider"]
+    response = stapi_client.post(
+        "/opportunities", json={**opportunity_search, "product_ids": product_ids}
+    )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["errors"] == []
+    assert [x["properties"]["product_id"] for x in body["features"]] == product_ids
+    order_links = [x for x in body["links"] if x["rel"] == "create-order"]
+    assert [x["product_id"] for x in order_links] == product_ids
+    assert order_links[0]["href"].endswith("/products/test-spotlight/orders")
+    # orders are created from the search without the product ids
+    assert order_links[0]["body"].keys() == {"datetime", "geometry", "filter"}
+
+
+@pytest.mark.mock_products(
+    [product_test_spotlight, product_test_satellite_provider_sync_opportunity]
+)
+@pytest.mark.conformances([CORE, OPPORTUNITIES])
+def test_search_products_opportunities_errors(
+    stapi_client: TestClient, opportunity_search
+) -> None:
+    product_ids = ["test-spotlight", "unknown", "test-satellite-provider"]
+    response = stapi_client.post(
+        "/opportunities", json={**opportunity_search, "product_ids": product_ids}
+    )
+
+    assert response.status_code == 200
+    assert response.json()["errors"] == [
+        {
+            "product_id": "test-spotlight",
+            "status_code": 404,
+            "detail": "Product does not support opportunity search",
+        },
+        {"product_id": "unknown", "status_code": 404, "detail": "Product not found"},
+    ]
+    assert len(response.json()["features"]) == 1
+
+
+@pytest.mark.mock_products(
+    [
+        product_test_spotlight_deferred_opportunity,
+        product_test_satellite_provider_sync_opportunity,
+    ]
+)
+@pytest.mark.conformances([CORE, OPPORTUNITIES])
+def test_search_products_opportunities_deadline(
+    stapi_client: TestClient, opportunity_search
+) -> None:
+    product_ids = ["test-spotlight", "test-satellite-provider"]
+    response = stapi_client.post(
+        "/opportunities",
+        json={**opportunity_search, "product_ids": product_ids},
+        headers={"Prefer": "wait=0.05"},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["Preference-Applied"] == "wait=0.05"
+    body = response.json()
+    # the slow product is reported, the others' opportunities are returned
+    assert body["errors"] == [
+        {
+            "product_id": "test-spotlight",
+            "status_code": 504,
+            "detail": "Timed out searching opportunities",
+        }
+    ]
+    assert [x["properties"]["product_id"] for x in body["features"]] == [
+        "test-satellite-provider"
+    ]
+
+
+@pytest.mark.conformances([CORE, OPPORTUNITIES])
+def test_search_products_opportunities_rejects_next(
+    stapi_client: TestClient, opportunity_search
+) -> None:
+    response = stapi_client.post(
+        "/opportunities",
+        json={**opportunity_search, "product_ids": ["test-spotlight"], "next": "x"},
+    )
+    assert response.status_code == 422
+
+
+def test_search_products_opportunities_requires_conformance(
+    stapi_client: TestClient, opportunity_search
+) -> None:
+    response = stapi_client.post(
+        "/opportunities",
+        json={**opportunity_search, "product_ids": ["test-spotlight"]},
+    )
+    assert response.status_code == 404
+
+
+product_test_planet = Product(
+    id="PL-1:tasking",
+    title="Planet Tasking",
+    description="Planet tasking, with a fake Planet API",
+    license="proprietary",
+    keywords=["satellite"],
+    providers=[provider_planet],
+    create_order=planet_backends.create_order,
+    search_opportunities=planet_backends.search_opportunities,
+    search_opportunities_async=None,
+    get_opportunity_collection=None,
+    constraints=PlanetProductConstraints,
+    opportunity_properties=PlanetOpportunityProperties,
+    order_parameters=PlanetOrderParameters,
+)
+
+IMAGING_WINDOW = {
+    "id": "iw-1",
+    "start_time": "2025-01-01T10:00:00Z",
+    "end_time": "2025-01-01T10:05:00Z",
+    "off_nadir_angle_min": 5,
+    "off_nadir_angle_max": 10,
+    "satellite_type": "SKYSAT",
+    "cloud_forecast": [{"prediction": 0.2}],
+}
+
+
+@pytest.fixture
+def planet_orders(monkeypatch: pytest.MonkeyPatch, tmp_path) -> list[dict[str, Any]]:
+    """Fake the Planet API, returning the create order requests sent to it."""
+    orders: list[dict[str, Any]] = []
+
+    class Client:
+        def __init__(self, request) -> None:
+            pass
+
+        def get_imaging_windows(self, payload: dict) -> list[dict]:
+            return [IMAGING_WINDOW]
+
+        def create_order(self, payload: dict) -> dict:
+            orders.append(payload)
+            return {
+                **payload,
+                "id": f"order-{len(orders)}",
+                "original_geometry": payload["geometry"],
+                "start_time": IMAGING_WINDOW["start_time"],
+                "end_time": IMAGING_WINDOW["end_time"],
+                "created_time": "2024-12-01T00:00:00Z",
+                "status": "RECEIVED",
+            }
+
+    monkeypatch.setattr(planet_backends, "Client", Client)
+    monkeypatch.setattr(
+        planet_backends, "order_store", SQLiteOrderStore(tmp_path / "orders.sqlite3")
+    )
+    return orders
+
+
+def create_order_link(body: dict[str, Any]) -> dict[str, Any]:
+    # the links of Planet opportunities are titled rather than related create-order
+    return next(
+        link
+        for link in body["links"]
+        if "create-order" in (link["rel"], link.get("title"))
+    )
+
+
+@pytest.mark.mock_products([product_test_planet])
+def test_planet_create_order_links(
+    stapi_client: TestClient, planet_orders, opportunity_search
+) -> None:
+    url = f"/products/{product_test_planet.id}/opportunities"
+
+    compact = stapi_client.post(url, json=opportunity_search)
+    expanded = stapi_client.post(
+        f"{url}?create_order_links=expanded", json=opportunity_search
+    )
+
+    assert compact.status_code == expanded.status_code == 200
+    search_link = create_order_link(compact.json())
+    compact_body = create_order_link(compact.json()["features"][0])["body"]
+    expanded_body = create_order_link(expanded.json()["features"][0])["body"]
+    assert compact_body == {
+        "datetime": "2025-01-01T10:00:00+00:00/2025-01-01T10:05:00+00:00",
+        "order_parameters": {
+            "imaging_window_id": "iw-1",
+            "name": order_name("2025-01-01T10:00:00+00:00", "(0.0, 0.0)"),
+        },
+    }
+    assert {**search_link["body"], **compact_body} == expanded_body
+
+    # the merged compact body and the expanded body create the same order
+    for body in ({**search_link["body"], **compact_body}, expanded_body):
+        response = stapi_client.post(search_link["href"], json=body)
+        assert response.status_code == 201
+    assert planet_orders[0] == planet_orders[1]
+    assert planet_orders[0]["name"] == compact_body["order_parameters"]["name"]
+
+
+@pytest.mark.mock_products([product_test_planet])
+def test_planet_order_name_fallback(
+    stapi_client: TestClient, planet_orders, opportunity_search
+) -> None:
+    url = f"/products/{product_test_planet.id}/opportunities"
+    response = stapi_client.post(url, json=opportunity_search)
+    search_link = create_order_link(response.json())
+    body = create_order_link(response.json()["features"][0])["body"]
+    unnamed = {**body, "order_parameters": {"imaging_window_id": "iw-1"}}
+
+    response = stapi_client.post(
+        search_link["href"], json={**search_link["body"], **unnamed}
+    )
+
+    assert response.status_code == 201
+    # orders without a name are named after the start of their window
+    assert planet_orders[0]["name"] == body["order_parameters"]["name"]
+
+
+@pytest.mark.mock_products([product_test_planet])
+def test_planet_create_order_links_invalid(
+    stapi_client: TestClient, planet_orders, opportunity_search
+) -> None:
+    response = stapi_client.post(
+        f"/products/{product_test_planet.id}/opportunities?create_order_links=full",
+        json=opportunity_search,
+    )
+
+    assert response.status_code == 422
+    assert "create_order_links" in response.text
+
+
+@pytest.mark.mock_products([product_test_planet])
+def test_planet_opportunities_fields(
+    stapi_client: TestClient, planet_orders, opportunity_search
+) -> None:
+    response = stapi_client.post(
+        f"/products/{product_test_planet.id}/opportunities?fields=-links,-geometry",
+        json=opportunity_search,
+    )
+
+    assert response.status_code == 200
+    feature = response.json()["features"][0]
+    assert "links" not in feature
+    assert feature.get("geometry") is None
+    assert feature["properties"]["satellite_type"] == "SKYSAT"
+
+
+@pytest.mark.parametrize("collapse_product_routes", [False, True])
+def test_planet_create_order_links_documented(collapse_product_routes: bool) -> None:
+    root_router = RootRouter(
+        get_orders=mock_get_orders,
+        get_order=mock_get_order,
+        get_order_statuses=mock_get_order_statuses,
+        collapse_product_routes=collapse_product_routes,
+    )
+    root_router.add_product(product_test_planet)
+    planet_backends.document_create_order_links(root_router, product_test_planet)
+    app = FastAPI()
+    app.include_router(root_router)
+
+    paths = app.openapi()["paths"]
+    path = "/products/{product_id}/opportunities"
+    if not collapse_product_routes:
+        path = f"/products/{product_test_planet.id}/opportunities"
+    parameters = {x["name"]: x for x in paths[path]["post"]["parameters"]}
+    assert parameters["create_order_links"]["schema"]["enum"] == [
+        "compact",
+        "expanded",
+    ]
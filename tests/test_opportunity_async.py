@@ -1,3 +1,5 @@
+import asyncio
+import time
 from datetime import UTC, datetime, timedelta, timezone
 from typing import Any, Callable
 from uuid import uuid4
@@ -6,20 +8,32 @@ import pytest
 from fastapi import status
 from fastapi.testclient import TestClient
 
+from stapi_fastapi.models.conformance import ASYNC_OPPORTUNITIES, CORE, OPPORTUNITIES
 from stapi_fastapi.models.opportunity import (
     OpportunityCollection,
     OpportunitySearchRecord,
     OpportunitySearchStatus,
     OpportunitySearchStatusCode,
+    Prefer,
 )
 from stapi_fastapi.models.shared import Link
-
+from stapi_fastapi.routers.product_router import parse_prefer
+from stapi_fastapi.routers.root_router import RootRouter
+
+from .backends import (
+    mock_get_opportunity_search_record,
+    mock_get_opportunity_search_records,
+    mock_get_order,
+    mock_get_order_statuses,
+    mock_get_orders,
+)
 from .shared import (
     create_mock_opportunity,
     find_link,
     pagination_tester,
     product_test_spotlight,
     product_test_spotlight_async_opportunity,
+    product_test_spotlight_deferred_opportunity,
     product_test_spotlight_sync_async_opportunity,
     product_test_spotlight_sync_opportunity,
 )
@@ -220,15 +234,22 @@ def test_async_opportunity_search_to_completion(
     ].put_opportunity_collection(collection)
 
     # - the OpportunitySearchRecord links and status are updated in the database
-    search_record.links.append(
-        Link(
-            rel="opportunities",
-            href=url_for(f"/products/{product_id}/opportunities/{collection.id}"),
-        )
-    )
-    search_record.status = OpportunitySearchStatus(
-        timestamp=datetime.now(timezone.utc),
-        status_code=OpportunitySearchStatusCode.completed,
+    search_record = search_record.model_copy(
+        update={
+            "links": [
+                *search_record.links,
+                Link(
+                    rel="opportunities",
+                    href=url_for(
+                        f"/products/{product_id}/opportunities/{collection.id}"
+                    ),
+                ),
+            ],
+            "status": OpportunitySearchStatus(
+                timestamp=datetime.now(timezone.utc),
+                status_code=OpportunitySearchStatusCode.completed,
+            ),
+        }
     )
 
     stapi_client_async_opportunity.app_state["_opportunities_db"].put_search_record(
@@ -353,3 +374,131 @@ def test_get_search_records_pagination(
         target="search_records",
         expected_returns=expected_returns,
     )
+
+
+@pytest.mark.mock_products([product_test_spotlight_deferred_opportunity])
+def test_deferrable_search_completing_in_time(
+    stapi_client_async_opportunity: TestClient,
+    opportunity_search: dict[str, Any],
+) -> None:
+    url = "/products/test-spotlight/opportunities"
+    response = stapi_client_async_opportunity.post(
+        url, json=opportunity_search, headers={"Prefer": "respond-async, wait=5"}
+    )
+    assert response.status_code == 200
+    assert response.headers["Preference-Applied"] == "wait"
+    OpportunityCollection(**response.json())
+
+
+@pytest.mark.mock_products([product_test_spotlight_deferred_opportunity])
+def test_deferrable_search_deferred(
+    stapi_client_async_opportunity: TestClient,
+    opportunity_search: dict[str, Any],
+) -> None:
+    url = "/products/test-spotlight/opportunities"
+    response = stapi_client_async_opportunity.post(
+        url, json=opportunity_search, headers={"Prefer": "wait=0.01"}
+    )
+    assert response.status_code == 201
+    assert response.headers["Preference-Applied"] == "respond-async"
+    search_record = OpportunitySearchRecord(**response.json())
+    assert search_record.status.status_code == OpportunitySearchStatusCode.in_progress
+    assert response.headers["Location"] == str(
+        next(link.href for link in search_record.links if link.rel == "self")
+    )
+
+    # the search keeps running, and its result is stored once it completes
+    for _ in range(50):
+        time.sleep(0.05)
+        record = stapi_client_async_opportunity.get(response.headers["Location"]).json()
+        if record["status"]["status_code"] != "in_progress":
+            break
+    assert record["status"]["status_code"] == "completed"
+    link = find_link(record["links"], "opportunities")
+    assert link
+    collection = stapi_client_async_opportunity.get(link["href"])
+    assert collection.status_code == 200
+    assert len(collection.json()["features"]) == 1
+
+
+@pytest.mark.mock_products([product_test_spotlight_deferred_opportunity])
+def test_deferrable_search_without_wait(
+    stapi_client_async_opportunity: TestClient,
+    opportunity_search: dict[str, Any],
+) -> None:
+    url = "/products/test-spotlight/opportunities"
+    # without a preferred wait the search is async as before
+    response = stapi_client_async_opportunity.post(url, json=opportunity_search)
+    assert response.status_code == 201
+    assert "Preference-Applied" not in response.headers
+
+    response = stapi_client_async_opportunity.post(
+        url, json=opportunity_search, headers={"Prefer": "wait=later"}
+    )
+    assert response.status_code == 400
+
+
+deferring_searches: list[asyncio.Future] = []
+
+
+async def mock_fail_to_defer_opportunity_search(
+    product_router, search, search_result, request
+):
+    deferring_searches.append(search_result)
+    raise RuntimeError("Deferring failed")
+
+
+product_test_spotlight_failing_deferral = (
+    product_test_spotlight_deferred_opportunity.model_copy()
+)
+product_test_spotlight_failing_deferral._defer_opportunity_search = (
+    mock_fail_to_defer_opportunity_search
+)
+
+
+@pytest.mark.mock_products([product_test_spotlight_failing_deferral])
+def test_search_is_cancelled_when_deferring_raises(
+    stapi_client_async_opportunity: TestClient,
+    opportunity_search: dict[str, Any],
+) -> None:
+    deferring_searches.clear()
+    url = "/products/test-spotlight/opportunities"
+    with pytest.raises(RuntimeError, match="Deferring failed"):
+        stapi_client_async_opportunity.post(
+            url, json=opportunity_search, headers={"Prefer": "wait=0.01"}
+        )
+
+    (search_task,) = deferring_searches
+    for _ in range(20):
+        if search_task.done():
+            break
+        time.sleep(0.01)
+    assert search_task.cancelled()
+
+
+def test_opportunity_search_wait() -> None:
+    root_router = RootRouter(
+        get_orders=mock_get_orders,
+        get_order=mock_get_order,
+        get_order_statuses=mock_get_order_statuses,
+        get_opportunity_search_records=mock_get_opportunity_search_records,
+        get_opportunity_search_record=mock_get_opportunity_search_record,
+        conformances=[CORE, OPPORTUNITIES, ASYNC_OPPORTUNITIES],
+        max_opportunity_search_wait=10,
+    )
+    root_router.add_product(product_test_spotlight_deferred_opportunity)
+    product_router = root_router.product_routers["test-spotlight"]
+
+    assert product_router.opportunity_search_wait(None, None) is None
+    assert product_router.opportunity_search_wait(Prefer.respond_async, None) is None
+    assert product_router.opportunity_search_wait(Prefer.wait, None) == 10
+    assert product_router.opportunity_search_wait(Prefer.wait, 1) == 1
+    assert product_router.opportunity_search_wait(Prefer.respond_async, 60) == 10
+
+
+def test_parse_prefer() -> None:
+    assert parse_prefer("respond-async") == {"respond-async": None}
+    assert parse_prefer('Respond-Async, wait="5"; foo=bar, wait=1') == {
+        "respond-async": None,
+        "wait": "5",
+    }
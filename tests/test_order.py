@@ -1,3 +1,4 @@
+import json
 from datetime import UTC, datetime, timedelta, timezone
 
 import pytest
@@ -6,6 +7,7 @@ from fastapi.testclient import TestClient
 from geojson_pydantic import Point
 from geojson_pydantic.types import Position2D
 from httpx import Response
+from pydantic import ValidationError
 
 from stapi_fastapi.models.order import Order, OrderPayload, OrderStatus, OrderStatusCode
 
@@ -105,6 +107,21 @@ def get_order_response(
     return res
 
 
+@pytest.mark.parametrize("product_id", ["test-spotlight"])
+def test_stored_order_is_shared_not_modified(
+    stapi_client: TestClient, new_order_response: Response
+) -> None:
+    order_id = new_order_response.json()["id"]
+    for _ in range(2):
+        res = stapi_client.get(f"/orders/{order_id}")
+        assert len(res.json()["links"]) == 2
+
+    stored = stapi_client.app_state["_orders_db"].get_order(order_id)
+    assert stored.links == []
+    with pytest.raises(ValidationError):
+        stored.id = "another_id"
+
+
 @pytest.mark.parametrize("product_id", ["test-spotlight"])
 def test_get_order_properties(
     get_order_response: Response, create_order_payloads
@@ -248,3 +265,125 @@ def test_get_order_statuses_bad_token(
     order_id = "non_existing_order_id"
     res = stapi_client.get(f"/orders/{order_id}/statuses")
     assert res.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_get_orders_by_location(stapi_client: TestClient) -> None:
+    ids = {}
+    for longitude in (10.0, 20.0, 30.0):
+        res = stapi_client.post(
+            "/products/test-spotlight/orders",
+            json={
+                "geometry": {"type": "Point", "coordinates": [longitude, 50.0]},
+                "datetime": "2024-10-09T18:55:33Z/2024-10-12T18:55:33Z",
+                "order_parameters": {"s3_path": "s3://my-bucket"},
+            },
+        )
+        ids[longitude] = res.json()["id"]
+
+    def order_ids(**params: str) -> list[str]:
+        res = stapi_client.get("/orders", params=params)
+        assert res.status_code == status.HTTP_200_OK, res.text
+        return [order["id"] for order in res.json()["features"]]
+
+    assert order_ids(bbox="5,45,25,55") == [ids[10.0], ids[20.0]]
+    assert order_ids(bbox="5,45,0,25,55,100") == [ids[10.0], ids[20.0]]
+    triangle = {
+        "type": "Polygon",
+        "coordinates": [[[15, 40], [35, 40], [35, 60], [15, 40]]],
+    }
+    assert order_ids(intersects=json.dumps(triangle)) == [ids[30.0]]
+    assert order_ids(bbox="5,45,25,55", intersects=json.dumps(triangle)) == []
+
+    # the filter is kept by the link to the next page
+    res = stapi_client.get("/orders", params={"bbox": "5,45,25,55", "limit": 1})
+    next_link = find_link(res.json()["links"], "next")
+    assert next_link
+    res = stapi_client.get(next_link["href"])
+    assert [order["id"] for order in res.json()["features"]] == [ids[20.0]]
+
+
+def test_get_orders_by_datetime(
+    stapi_client: TestClient, create_order_payloads: list[OrderPayload]
+) -> None:
+    ids = []
+    for payload in create_order_payloads:
+        res = stapi_client.post(
+            "/products/test-spotlight/orders", json=payload.model_dump(mode="json")
+        )
+        ids.append(res.json()["id"])
+
+    def order_ids(datetime: str) -> list[str]:
+        res = stapi_client.get("/orders", params={"datetime": datetime})
+        assert res.status_code == status.HTTP_200_OK, res.text
+        return [order["id"] for order in res.json()["features"]]
+
+    assert order_ids("2024-10-16T00:00:00Z") == [ids[1]]
+    assert order_ids("2024-10-12T00:00:00Z/2024-10-16T00:00:00+00:00") == ids[:2]
+    assert order_ids("../2024-10-01T00:00:00Z") == []
+    assert order_ids("2024-10-18T18:55:33Z/..") == ids[1:]
+
+
+def test_get_orders_by_properties(
+    stapi_client: TestClient, create_order_payloads: list[OrderPayload]
+) -> None:
+    ids = []
+    for product_id in ("test-spotlight", "test-satellite-provider", "test-spotlight"):
+        res = stapi_client.post(
+            f"/products/{product_id}/orders",
+            json=create_order_payloads[0].model_dump(mode="json"),
+        )
+        ids.append(res.json()["id"])
+    orders_db = stapi_client.app_state["_orders_db"]
+    accepted = orders_db.get_order(ids[2])
+    orders_db.put_order(
+        accepted.model_copy(
+            update={
+                "properties": accepted.properties.model_copy(
+                    update={
+                        "status": OrderStatus(
+                            timestamp=NOW, status_code=OrderStatusCode.accepted
+                        )
+                    }
+                )
+            }
+        )
+    )
+
+    def order_ids(**params: str) -> list[str]:
+        res = stapi_client.get("/orders", params=params)
+        assert res.status_code == status.HTTP_200_OK, res.text
+        return [order["id"] for order in res.json()["features"]]
+
+    assert order_ids(product_id="test-spotlight") == [ids[0], ids[2]]
+    assert order_ids(product_id="test-spotlight,test-satellite-provider") == ids
+    assert order_ids(status="accepted") == [ids[2]]
+    assert order_ids(status="received,accepted", product_id="test-spotlight") == [
+        ids[0],
+        ids[2],
+    ]
+    yesterday = (NOW - timedelta(days=1)).isoformat()
+    assert order_ids(created=f"{yesterday}/..") == ids
+    assert order_ids(created=f"../{yesterday}") == []
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {"bbox": "1,2,3"},
+        {"bbox": "a,b,c,d"},
+        {"bbox": "3,0,1,1"},
+        {"intersects": '{"type": "Point"}'},
+        {"intersects": "not json"},
+        {"datetime": "2024-10-10"},
+        {"datetime": "2024-10-10T00:00:00"},
+        {"datetime": "../.."},
+        {"datetime": "2024-10-12T00:00:00Z/2024-10-10T00:00:00Z"},
+        {"status": "unknown"},
+        {"created": "yesterday"},
+    ],
+)
+def test_get_orders_invalid_filter(
+    stapi_client: TestClient, params: dict[str, str]
+) -> None:
+    res = stapi_client.get("/orders", params=params)
+    assert res.status_code == status.HTTP_400_BAD_REQUEST
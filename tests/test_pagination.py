@@ -0,0 +1,88 @@
+import pytest
+from returns.maybe import Nothing, Some
+
+from stapi_fastapi.pagination import InvalidPaginationToken, Paginator
+
+
+def collect(paginator: Paginator, items: list, limit: int, **kwargs) -> list[list]:
+    pages = []
+    next = None
+    while True:
+        page, maybe_token = paginator.paginate(items, next, limit, **kwargs)
+        pages.append(page)
+        match maybe_token:
+            case Some(token):
+                next = token
+            case _:
+                return pages
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 10])
+def test_paginate_by_position(limit: int) -> None:
+    items = list("abcdefg")
+    pages = collect(Paginator(), items, limit)
+    assert [x for page in pages for x in page] == items
+    assert all(len(page) <= limit for page in pages)
+
+
+def test_paginate_by_key_survives_inserts() -> None:
+    paginator = Paginator()
+    items = [1, 3, 5, 7]
+    page, maybe_token = paginator.paginate(items, None, 2, key=lambda x: x)
+    assert page == [1, 3]
+
+    # an insert before the cursor must neither be repeated nor shift the page
+    items.insert(0, 0)
+    page, maybe_token = paginator.paginate(
+        items, maybe_token.unwrap(), 2, key=lambda x: x
+    )
+    assert page == [5, 7]
+    assert maybe_token == Nothing
+
+
+def test_paginate_limit_zero() -> None:
+    assert Paginator().paginate([1, 2], None, 0) == ([], Nothing)
+
+
+def test_tuple_keys_round_trip() -> None:
+    paginator = Paginator()
+    token = paginator.encode(("2025-01-01T00:00:00+00:00", "abc"))
+    assert paginator.decode(token) == ("2025-01-01T00:00:00+00:00", "abc")
+
+
+def test_tampered_token_rejected() -> None:
+    paginator = Paginator()
+    token = paginator.encode(42)
+    tampered = token[:-2] + ("AA" if token[-2:] != "AA" else "BB")
+    with pytest.raises(InvalidPaginationToken):
+        paginator.decode(tampered)
+
+
+def test_token_from_other_secret_rejected() -> None:
+    token = Paginator(secret="one").encode(42)
+    with pytest.raises(InvalidPaginationToken):
+        Paginator(secret="two").decode(token)
+
+
+def test_shared_secret_accepted() -> None:
+    token = Paginator(secret="shared").encode(42)
+    assert Paginator(secret="shared").decode(token) == 42
+
+
+def test_token_for_other_scope_rejected() -> None:
+    paginator = Paginator()
+    token = paginator.encode(42, scope="order-1")
+    with pytest.raises(InvalidPaginationToken):
+        paginator.decode(token, scope="order-2")
+
+
+def test_stale_token_rejected() -> None:
+    paginator = Paginator(max_age=-1)
+    with pytest.raises(InvalidPaginationToken):
+        paginator.decode(paginator.encode(42))
+
+
+@pytest.mark.parametrize("token", ["", "a_token", "!" * 40, "A" * 2000])
+def test_malformed_token_rejected(token: str) -> None:
+    with pytest.raises(InvalidPaginationToken):
+        Paginator().decode(token)
@@ -0,0 +1,112 @@
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from stapi_fastapi.profiler import (
+    OUTPUT_HEADER,
+    SamplingProfiler,
+    collapse,
+    install_profiler,
+)
+
+TOKEN = "s3cret"
+
+
+def busy(seconds: float) -> int:
+    total = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        total += 1
+    return total
+
+
+@pytest.fixture
+def client(tmp_path: Path) -> TestClient:
+    app = FastAPI()
+
+    @app.get("/busy")
+    def busy_endpoint() -> int:
+        return busy(0.1)
+
+    install_profiler(app, TOKEN, tmp_path, interval=0.001)
+    return TestClient(app)
+
+
+def stacks(path: Path) -> dict[str, int]:
+    lines = path.read_text().splitlines()
+    return {
+        stack: int(count)
+        for stack, _, count in (line.rpartition(" ") for line in lines)
+    }
+
+
+def test_collapse() -> None:
+    stack = collapse(sys._getframe(), "main")
+    frames = stack.split(";")
+    assert frames[0] == "thread main"
+    assert frames[-1].startswith("test_collapse (")
+
+
+def test_sampling_profiler(tmp_path: Path) -> None:
+    profiler = SamplingProfiler(interval=0.001)
+    worker = threading.Thread(target=busy, args=(0.1,), name="worker")
+    profiler.start()
+    worker.start()
+    worker.join()
+    samples = profiler.stop()
+
+    assert any("thread worker" in stack and "busy" in stack for stack in samples)
+    assert all(not stack.startswith("thread sampling-profiler") for stack in samples)
+    path = profiler.write(tmp_path, "GET /x")
+    assert path.name.endswith("-GET__x.collapsed")
+    assert stacks(path) == samples
+
+
+def test_request_profile(client: TestClient, tmp_path: Path) -> None:
+    res = client.get("/busy", headers={"X-Profile": TOKEN})
+    assert res.status_code == 200
+    profile = stacks(tmp_path / res.headers[OUTPUT_HEADER])
+    assert any("busy_endpoint" in stack for stack in profile)
+
+
+@pytest.mark.parametrize("headers", [{}, {"X-Profile": "wrong"}])
+def test_request_not_profiled(
+    client: TestClient, tmp_path: Path, headers: dict[str, str]
+) -> None:
+    res = client.get("/busy", headers=headers)
+    assert res.status_code == 200
+    assert OUTPUT_HEADER not in res.headers
+    assert not list(tmp_path.iterdir())
+
+
+def test_window_profile(client: TestClient, tmp_path: Path) -> None:
+    res = client.post(
+        "/admin/profile",
+        params={"seconds": 0.05},
+        headers={"Authorization": f"Bearer {TOKEN}"},
+    )
+    assert res.status_code == 200
+    body = res.json()
+    assert body["samples"] > 0
+    assert (tmp_path / body["output"]).exists()
+
+
+def test_window_profile_unauthorized(client: TestClient) -> None:
+    res = client.post("/admin/profile", params={"seconds": 0.05})
+    assert res.status_code == 401
+    res = client.post(
+        "/admin/profile",
+        params={"seconds": 0.05},
+        headers={"Authorization": "Bearer wrong"},
+    )
+    assert res.status_code == 401
+
+
+def test_profiler_requires_token(tmp_path: Path) -> None:
+    with pytest.raises(ValueError):
+        install_profiler(FastAPI(), "", tmp_path)
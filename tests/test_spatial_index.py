@@ -0,0 +1,67 @@
+import random
+
+import pytest
+
+from stapi_fastapi.geometry import BBox, bbox_intersects
+from stapi_fastapi.indexes import RTree
+
+
+def random_boxes(count: int, seed: int = 0) -> dict[int, BBox]:
+    rng = random.Random(seed)
+    boxes = {}
+    for key in range(count):
+        x, y = rng.uniform(-180, 170), rng.uniform(-90, 80)
+        boxes[key] = (x, y, x + rng.uniform(0, 10), y + rng.uniform(0, 10))
+    return boxes
+
+
+def brute_force(boxes: dict[int, BBox], bbox: BBox) -> set[int]:
+    return {key for key, box in boxes.items() if bbox_intersects(box, bbox)}
+
+
+QUERIES: list[BBox] = [
+    (0.0, 0.0, 10.0, 10.0),
+    (-180.0, -90.0, 180.0, 90.0),
+    (100.0, 50.0, 100.0, 50.0),
+    (200.0, 100.0, 210.0, 110.0),
+]
+
+
+@pytest.mark.parametrize("count", [0, 1, 15, 16, 17, 1000])
+def test_search_bulk_loaded(count: int) -> None:
+    boxes = random_boxes(count)
+    tree = RTree(boxes.items())
+
+    assert len(tree) == count
+    for query in QUERIES:
+        assert set(tree.search(query)) == brute_force(boxes, query)
+
+
+def test_insert_replace_and_remove() -> None:
+    boxes = random_boxes(500)
+    tree = RTree(boxes.items(), node_size=4)
+    rng = random.Random(1)
+
+    # enough updates to repack the tree along the way
+    for key in range(500, 700):
+        boxes[key] = random_boxes(1, seed=key)[0]
+        tree.insert(key, boxes[key])
+    for key in rng.sample(sorted(boxes), 100):
+        boxes[key] = (0.0, 0.0, 1.0, 1.0)
+        tree.insert(key, boxes[key])
+    for key in rng.sample(sorted(boxes), 100):
+        del boxes[key]
+        assert tree.remove(key)
+    assert not tree.remove(-1)
+
+    assert len(tree) == len(boxes)
+    assert all(tree.get(key) == box for key, box in boxes.items())
+    for query in QUERIES:
+        found = tree.search(query)
+        assert len(found) == len(set(found))
+        assert set(found) == brute_force(boxes, query)
+
+
+def test_node_size() -> None:
+    with pytest.raises(ValueError):
+        RTree(node_size=1)
@@ -0,0 +1,325 @@
+from collections.abc import AsyncIterator, Generator
+from contextlib import asynccontextmanager
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+import pytest
+from fastapi import FastAPI, status
+from fastapi.testclient import TestClient
+from geojson_pydantic import LineString, Point, Polygon
+from geojson_pydantic.types import Position2D
+from returns.maybe import Nothing, Some
+
+from stapi_fastapi.backends import SQLiteOrderStore
+from stapi_fastapi.filters import OrderFilter
+from stapi_fastapi.models.conformance import CORE
+from stapi_fastapi.models.order import (
+    Order,
+    OrderProperties,
+    OrderSearchParameters,
+    OrderStatus,
+    OrderStatusCode,
+)
+from stapi_fastapi.routers.root_router import RootRouter
+
+from .shared import MyOrderParameters, pagination_tester, product_test_spotlight
+
+
+def make_order(order_id: str, status_code: OrderStatusCode) -> Order:
+    geometry = Polygon.from_bounds(0.0, 0.0, 2.0, 1.0)
+    return Order(
+        id=order_id,
+        geometry=geometry,
+        properties=OrderProperties(
+            product_id="test-spotlight",
+            created=datetime(2025, 1, 1, tzinfo=UTC),
+            status=OrderStatus(
+                timestamp=datetime(2025, 1, 1, tzinfo=UTC), status_code=status_code
+            ),
+            search_parameters=OrderSearchParameters(
+                geometry=geometry,
+                datetime=(
+                    datetime(2025, 1, 1, tzinfo=UTC),
+                    datetime(2025, 1, 2, tzinfo=UTC),
+                ),
+            ),
+            opportunity_properties={},
+            order_parameters={},
+        ),
+    )
+
+
+@pytest.fixture
+def store(tmp_path: Path) -> Generator[SQLiteOrderStore, None, None]:
+    store = SQLiteOrderStore(tmp_path / "orders.sqlite3")
+    yield store
+    store.close()
+
+
+def test_put_and_load_order(store: SQLiteOrderStore) -> None:
+    order = make_order("a", OrderStatusCode.received)
+    store.put_order(order)
+    assert store.load_order("a") == order
+    assert store.load_order("missing") is None
+
+
+def test_orders_survive_reopening(tmp_path: Path) -> None:
+    path = tmp_path / "orders.sqlite3"
+    writer = SQLiteOrderStore(path)
+    writer.put_order(make_order("a", OrderStatusCode.received))
+    writer.close()
+
+    reader = SQLiteOrderStore(path)
+    loaded = reader.load_order("a")
+    assert loaded is not None
+    assert loaded.id == "a"
+    assert reader.connection.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+
+
+def test_concurrent_reader_sees_writes(tmp_path: Path) -> None:
+    path = tmp_path / "orders.sqlite3"
+    writer = SQLiteOrderStore(path)
+    reader = SQLiteOrderStore(path)
+    assert reader.load_orders(None, 10) == ([], Nothing)
+
+    writer.put_order(make_order("a", OrderStatusCode.received))
+    orders, _ = reader.load_orders(None, 10)
+    assert [o.id for o in orders] == ["a"]
+
+
+def test_status_updates_order(store: SQLiteOrderStore) -> None:
+    store.put_order(make_order("a", OrderStatusCode.received))
+    accepted = OrderStatus(
+        timestamp=datetime(2025, 1, 2, tzinfo=UTC),
+        status_code=OrderStatusCode.accepted,
+    )
+    store.put_order_status("a", accepted)
+
+    order = store.load_order("a")
+    assert order is not None
+    assert order.properties.status == accepted
+    assert store.load_order_statuses("a", None, 10) == ([accepted], Nothing)
+    assert store.load_order_statuses("missing", None, 10) is None
+    row = store.connection.execute(
+        "SELECT status_code FROM orders WHERE id = 'a'"
+    ).fetchone()
+    assert row == ("accepted",)
+
+
+def test_sync_order_records_status_changes(store: SQLiteOrderStore) -> None:
+    received = make_order("a", OrderStatusCode.received)
+    accepted = make_order("a", OrderStatusCode.accepted)
+    assert store.sync_order(received)
+    assert not store.sync_order(received)
+    assert store.sync_order(accepted)
+
+    assert store.load_order("a") == accepted
+    statuses = store.load_order_statuses("a", None, 10)
+    assert statuses is not None
+    assert [s.status_code for s in statuses[0]] == [
+        OrderStatusCode.received,
+        OrderStatusCode.accepted,
+    ]
+
+
+def test_orders_are_indexed(store: SQLiteOrderStore) -> None:
+    indexes = {
+        row[0]
+        for row in store.connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index'"
+        )
+    }
+    assert {
+        "orders_product_id",
+        "orders_status_code",
+        "orders_created",
+        "orders_bbox",
+    } <= indexes
+
+    store.put_order(make_order("a", OrderStatusCode.received))
+    row = store.connection.execute(
+        "SELECT min_x, min_y, max_x, max_y FROM orders WHERE id = 'a'"
+    ).fetchone()
+    assert row == (0.0, 0.0, 2.0, 1.0)
+
+
+def test_keyset_pagination(store: SQLiteOrderStore) -> None:
+    for i in range(5):
+        store.put_order(make_order(str(i), OrderStatusCode.received))
+
+    orders, maybe_token = store.load_orders(None, 2)
+    assert [o.id for o in orders] == ["0", "1"]
+    assert isinstance(maybe_token, Some)
+
+    # updating an order must not move it to another page
+    store.put_order(make_order("0", OrderStatusCode.accepted))
+    orders, maybe_token = store.load_orders(maybe_token.unwrap(), 2)
+    assert [o.id for o in orders] == ["2", "3"]
+    orders, maybe_token = store.load_orders(maybe_token.unwrap(), 2)
+    assert [o.id for o in orders] == ["4"]
+    assert maybe_token == Nothing
+
+
+def test_token_from_other_order_rejected(store: SQLiteOrderStore) -> None:
+    token = store.paginator.encode(1, "other-order")
+    with pytest.raises(ValueError):
+        store.load_order_statuses("a", token, 10)
+
+
+@pytest.fixture
+def store_client(
+    store: SQLiteOrderStore, base_url: str
+) -> Generator[TestClient, None, None]:
+    @asynccontextmanager
+    async def lifespan(app: FastAPI) -> AsyncIterator[dict[str, Any]]:
+        yield {"_orders_db": store}
+
+    root_router = RootRouter(
+        get_orders=store.get_orders,
+        get_order=store.get_order,
+        get_order_statuses=store.get_order_statuses,
+        conformances=[CORE],
+    )
+    root_router.add_product(product_test_spotlight)
+    app = FastAPI(lifespan=lifespan)
+    app.include_router(root_router, prefix="")
+
+    with TestClient(app, base_url=base_url) as client:
+        yield client
+
+
+@pytest.mark.parametrize("limit", [0, 1, 2, 4])
+def test_store_as_root_backend(limit: int, store_client: TestClient) -> None:
+    orders = []
+    for _ in range(3):
+        res = store_client.post(
+            "/products/test-spotlight/orders",
+            json={
+                "geometry": Point(
+                    type="Point",
+                    coordinates=Position2D(longitude=14.4, latitude=56.5),
+                ).model_dump(),
+                "datetime": "2024-10-09T18:55:33Z/2024-10-12T18:55:33Z",
+                "order_parameters": MyOrderParameters(s3_path="s3://b").model_dump(),
+            },
+        )
+        assert res.status_code == status.HTTP_201_CREATED, res.text
+        orders.append(res.json())
+
+    pagination_tester(
+        stapi_client=store_client,
+        url="/orders",
+        method="GET",
+        limit=limit,
+        target="features",
+        expected_returns=orders if limit else [],
+    )
+
+    order_id = orders[0]["id"]
+    res = store_client.get(f"/orders/{order_id}")
+    assert res.status_code == status.HTTP_200_OK
+    assert res.json() == orders[0]
+
+    res = store_client.get(f"/orders/{order_id}/statuses")
+    assert res.status_code == status.HTTP_200_OK
+    assert len(res.json()["statuses"]) == 1
+
+    res = store_client.get("/orders", params={"next": "a_token"})
+    assert res.status_code == status.HTTP_404_NOT_FOUND
+
+
+def make_located_order(order_id: str, x: float, y: float) -> Order:
+    order = make_order(order_id, OrderStatusCode.received)
+    return order.model_copy(
+        update={"geometry": Polygon.from_bounds(x, y, x + 1, y + 1)}
+    )
+
+
+def test_load_orders_by_location(tmp_path: Path) -> None:
+    path = tmp_path / "orders.sqlite3"
+    store, other = SQLiteOrderStore(path), SQLiteOrderStore(path)
+    for i in range(10):
+        store.put_order(make_located_order(str(i), i * 10, 0))
+    near_origin = OrderFilter(bbox=(0, 0, 25, 5))
+
+    orders, maybe_token = store.load_orders(None, 2, near_origin)
+    assert [o.id for o in orders] == ["0", "1"]
+    orders, maybe_token = store.load_orders(maybe_token.unwrap(), 2, near_origin)
+    assert [o.id for o in orders] == ["2"]
+    assert maybe_token == Nothing
+
+    # the index follows orders moved by this store and added by others
+    store.put_order(make_located_order("0", 50, 0))
+    other.put_order(make_located_order("10", 5, 0))
+    orders, _ = store.load_orders(None, 10, near_origin)
+    assert [o.id for o in orders] == ["1", "2", "10"]
+
+    # candidates are tested against the geometry exactly
+    line = LineString(
+        type="LineString",
+        coordinates=[Position2D(0.0, 3.0), Position2D(25.0, 3.0)],
+    )
+    orders, _ = store.load_orders(None, 10, OrderFilter(intersects=line))
+    assert orders == []
+
+
+def test_load_orders_by_datetime(store: SQLiteOrderStore) -> None:
+    # the search datetime interval of every order is 2025-01-01/2025-01-02
+    for i in range(3):
+        store.put_order(make_located_order(str(i), i * 10, 0))
+    january = OrderFilter(
+        datetime=(datetime(2025, 1, 2, tzinfo=UTC), datetime(2025, 2, 1, tzinfo=UTC))
+    )
+    orders, _ = store.load_orders(None, 10, january)
+    assert [o.id for o in orders] == ["0", "1", "2"]
+
+    near_origin_in_january = OrderFilter(
+        bbox=(0, 0, 15, 5), datetime=(datetime(2025, 1, 2, tzinfo=UTC), None)
+    )
+    orders, _ = store.load_orders(None, 10, near_origin_in_january)
+    assert [o.id for o in orders] == ["0", "1"]
+
+    february = OrderFilter(datetime=(datetime(2025, 2, 1, tzinfo=UTC), None))
+    assert store.load_orders(None, 10, february) == ([], Nothing)
+
+
+def test_load_orders_by_properties(store: SQLiteOrderStore) -> None:
+    for i in range(6):
+        order = make_located_order(str(i), i * 10, 0)
+        properties = order.properties.model_copy(
+            update={
+                "product_id": "a" if i % 2 else "b",
+                "created": datetime(2025, 1, 1 + i, tzinfo=UTC),
+            }
+        )
+        store.put_order(order.model_copy(update={"properties": properties}))
+    store.put_order_status(
+        "3",
+        OrderStatus(
+            timestamp=datetime(2025, 1, 9, tzinfo=UTC),
+            status_code=OrderStatusCode.accepted,
+        ),
+    )
+
+    def order_ids(order_filter: OrderFilter, limit: int = 10) -> list[str]:
+        ids: list[str] = []
+        next = None
+        while True:
+            orders, maybe_token = store.load_orders(next, limit, order_filter)
+            ids.extend(o.id for o in orders)
+            if maybe_token == Nothing:
+                return ids
+            next = maybe_token.unwrap()
+
+    assert order_ids(OrderFilter(product_id=frozenset({"a"})), limit=2) == [
+        "1",
+        "3",
+        "5",
+    ]
+    assert order_ids(OrderFilter(status=frozenset({OrderStatusCode.accepted}))) == ["3"]
+    since_third = OrderFilter(created=(datetime(2025, 1, 3, tzinfo=UTC), None))
+    assert order_ids(since_third, limit=1) == ["2", "3", "4", "5"]
+    # combined with the in-process indexes
+    near_origin_of_a = OrderFilter(bbox=(0, 0, 35, 5), product_id=frozenset({"a"}))
+    assert order_ids(near_origin_of_a) == ["1", "3"]
@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+from stapi_fastapi.routers.root_router import RootRouter
+from stapi_fastapi.startup import (
+    StartupProfile,
+    main,
+    parse_importtime,
+    record_products,
+)
+
+from .backends import mock_get_order, mock_get_order_statuses, mock_get_orders
+from .shared import product_test_spotlight_sync_opportunity
+
+IMPORTTIME = """\
+import time: self [us] | cumulative | imported package
+import time:       150 |        150 |   _io
+import time:      2000 |       2500 |     fastapi.routing
+import time:      1000 |       3500 |   fastapi
+import time:       500 |       4000 | stapi_fastapi
+"""
+
+
+def test_parse_importtime() -> None:
+    modules = parse_importtime(IMPORTTIME)
+    assert modules == {
+        "_io": 0.00015,
+        "fastapi.routing": 0.002,
+        "fastapi": 0.001,
+        "stapi_fastapi": 0.0005,
+    }
+
+    profile = StartupProfile(total=0.1, modules=modules, products={})
+    assert profile.packages == pytest.approx(
+        {"_io": 0.00015, "fastapi": 0.003, "stapi_fastapi": 0.0005}
+    )
+
+
+def test_record_products(monkeypatch) -> None:
+    # restore the original method after the test
+    monkeypatch.setattr(RootRouter, "add_product", RootRouter.add_product)
+    timings = record_products()
+
+    root_router = RootRouter(
+        get_orders=mock_get_orders,
+        get_order=mock_get_order,
+        get_order_statuses=mock_get_order_statuses,
+    )
+    root_router.add_product(product_test_spotlight_sync_opportunity)
+
+    assert list(timings) == [product_test_spotlight_sync_opportunity.id]
+    assert timings[product_test_spotlight_sync_opportunity.id] > 0
+    assert product_test_spotlight_sync_opportunity.id in root_router.product_routers
+
+
+def test_main_enforces_budget(capsys) -> None:
+    assert main(["stapi_fastapi", "--json", "--budget", "0"]) == 1
+
+    out, err = capsys.readouterr()
+    profile = json.loads(out)
+    assert profile["total"] > 0
+    assert "stapi_fastapi" in profile["packages"]
+    assert "stapi_fastapi.routers.root_router" in profile["modules"]
+    assert "over the budget" in err
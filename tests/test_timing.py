@@ -0,0 +1,100 @@
+import logging
+from collections.abc import AsyncIterator, Callable, Iterator
+from contextlib import asynccontextmanager
+from typing import Any
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from stapi_fastapi.routers.root_router import RootRouter
+from stapi_fastapi.timing import (
+    ServerTimingMiddleware,
+    server_timing,
+    summarize,
+    timed,
+)
+
+from .backends import mock_get_order, mock_get_order_statuses, mock_get_orders
+from .shared import InMemoryOrderDB
+
+type ClientFactory = Callable[..., TestClient]
+
+
+@pytest.fixture
+def make_client(base_url: str) -> Iterator[ClientFactory]:
+    clients: list[TestClient] = []
+
+    def make_client(**middleware_args: Any) -> TestClient:
+        @asynccontextmanager
+        async def lifespan(app: FastAPI) -> AsyncIterator[dict[str, Any]]:
+            yield {"_orders_db": InMemoryOrderDB()}
+
+        root_router = RootRouter(
+            get_orders=mock_get_orders,
+            get_order=mock_get_order,
+            get_order_statuses=mock_get_order_statuses,
+        )
+        app = FastAPI(lifespan=lifespan)
+        app.include_router(root_router)
+        app.add_middleware(ServerTimingMiddleware, **middleware_args)
+
+        client = TestClient(app, base_url=base_url)
+        client.__enter__()
+        clients.append(client)
+        return client
+
+    yield make_client
+
+    for client in clients:
+        client.__exit__(None, None, None)
+
+
+def test_timed_does_nothing_outside_requests() -> None:
+    with timed("phase"):
+        pass
+
+
+def test_server_timing() -> None:
+    summary = summarize([("backend", 0.002), ("render", 0.0005), ("backend", 0.001)])
+    assert summary == pytest.approx({"backend": 3.0, "render": 0.5})
+    assert server_timing(summary) == "backend;dur=3.0, render;dur=0.5"
+    assert server_timing({"a phase/x": 1.0}) == "a_phase_x;dur=1.0"
+
+
+def test_server_timing_header(make_client: ClientFactory, caplog) -> None:
+    client = make_client()
+
+    with caplog.at_level(logging.INFO, logger="stapi_fastapi.timing"):
+        res = client.get("/orders")
+
+    assert res.status_code == 200
+    phases = [phase.split(";")[0] for phase in res.headers["Server-Timing"].split(", ")]
+    assert phases == ["backend.get_orders", "render", "total"]
+
+    (record,) = [r for r in caplog.records if r.name == "stapi_fastapi.timing"]
+    assert record.getMessage() == "GET /orders 200"
+    assert set(record.timings) == {"backend.get_orders", "render", "total"}  # type: ignore[attr-defined]
+
+
+def test_server_timing_disabled(make_client: ClientFactory, caplog) -> None:
+    client = make_client(enabled=False)
+
+    with caplog.at_level(logging.INFO, logger="stapi_fastapi.timing"):
+        res = client.get("/orders")
+
+    assert "Server-Timing" not in res.headers
+    assert not [r for r in caplog.records if r.name == "stapi_fastapi.timing"]
+
+
+def test_server_timing_header_off(make_client: ClientFactory, caplog) -> None:
+    client = make_client(header=False)
+
+    with caplog.at_level(logging.INFO, logger="stapi_fastapi.timing"):
+        res = client.get("/orders/unknown")
+
+    assert res.status_code == 404
+    assert "Server-Timing" not in res.headers
+    (record,) = [r for r in caplog.records if r.name == "stapi_fastapi.timing"]
+    assert record.getMessage() == "GET /orders/unknown 404"
+    assert "backend.get_order" in record.timings  # type: ignore[attr-defined]
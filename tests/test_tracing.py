@@ -0,0 +1,129 @@
+from collections.abc import AsyncIterator, Iterator
+from contextlib import asynccontextmanager
+from typing import Any
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from stapi_fastapi.routers.root_router import RootRouter
+from stapi_fastapi.tracing import (
+    TRACER,
+    RingBufferExporter,
+    Tracer,
+    current_span,
+    extract,
+    inject,
+    install_tracing,
+)
+
+from .backends import mock_get_order, mock_get_order_statuses, mock_get_orders
+from .shared import InMemoryOrderDB
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+TOKEN = "secret"
+
+
+def test_extract() -> None:
+    assert extract({"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"}) == (
+        TRACE_ID,
+        PARENT_ID,
+    )
+    assert extract({}) is None
+    assert extract({"traceparent": "garbage"}) is None
+    assert extract({"traceparent": f"00-{'0' * 32}-{PARENT_ID}-01"}) is None
+
+
+def test_disabled_tracer() -> None:
+    tracer = Tracer()
+    with tracer.span("anything") as span:
+        assert span is None
+        assert inject({}) == {}
+
+
+def test_nested_spans() -> None:
+    exporter = RingBufferExporter(capacity=2)
+    tracer = Tracer(exporter)
+
+    with pytest.raises(ValueError):
+        with tracer.span("outer", parent=(TRACE_ID, PARENT_ID)) as outer:
+            assert current_span() is outer
+            with tracer.span("inner", key="value") as inner:
+                assert inner
+                assert inject({}) == {"traceparent": inner.traceparent}
+            raise ValueError("boom")
+
+    assert current_span() is None
+    inner, outer = exporter.spans()
+    assert (inner.name, outer.name) == ("inner", "outer")
+    assert inner.trace_id == outer.trace_id == TRACE_ID
+    assert inner.parent_id == outer.span_id
+    assert outer.parent_id == PARENT_ID
+    assert inner.attributes == {"key": "value"}
+    assert (inner.status, outer.status) == ("ok", "error")
+    assert outer.duration_ms is not None and outer.duration_ms >= inner.duration_ms  # type: ignore[operator]
+
+    with tracer.span("third"):
+        pass
+    assert [span.name for span in exporter.spans()] == ["outer", "third"]
+
+
+@pytest.fixture
+def traced_client(base_url: str, monkeypatch) -> Iterator[TestClient]:
+    # restore the global tracer after the test
+    monkeypatch.setattr(TRACER, "exporter", None)
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI) -> AsyncIterator[dict[str, Any]]:
+        yield {"_orders_db": InMemoryOrderDB()}
+
+    root_router = RootRouter(
+        get_orders=mock_get_orders,
+        get_order=mock_get_order,
+        get_order_statuses=mock_get_order_statuses,
+    )
+    app = FastAPI(lifespan=lifespan)
+    app.include_router(root_router)
+    install_tracing(app, path="/debug/traces", token=TOKEN)
+
+    with TestClient(app, base_url=base_url) as client:
+        yield client
+
+
+def test_traces_require_token(traced_client: TestClient) -> None:
+    assert traced_client.get("/debug/traces").status_code == 401
+    res = traced_client.get("/debug/traces", headers={"Authorization": "Bearer wrong"})
+    assert res.status_code == 401
+
+
+def test_request_spans(traced_client: TestClient) -> None:
+    res = traced_client.get(
+        "/orders", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"}
+    )
+    assert res.status_code == 200
+
+    spans = traced_client.get(
+        "/debug/traces",
+        params={"trace_id": TRACE_ID},
+        headers={"Authorization": f"Bearer {TOKEN}"},
+    ).json()
+    by_name = {span["name"]: span for span in spans}
+    assert set(by_name) == {"root:list-orders", "backend.get_orders", "render"}
+
+    server = by_name["root:list-orders"]
+    assert server["parent_id"] == PARENT_ID
+    assert server["attributes"]["http.status_code"] == 200
+    assert server["attributes"]["http.route"] == "/orders"
+    assert by_name["backend.get_orders"]["parent_id"] == server["span_id"]
+    assert by_name["render"]["parent_id"] == server["span_id"]
+
+
+def test_request_starts_new_trace(traced_client: TestClient) -> None:
+    traced_client.get("/orders/unknown")
+    exporter = TRACER.exporter
+    assert isinstance(exporter, RingBufferExporter)
+
+    (server,) = [span for span in exporter.spans() if span.name == "root:get-order"]
+    assert server.parent_id is None
+    assert server.attributes["http.status_code"] == 404